@@ -0,0 +1,61 @@
+import argparse
+
+from convassist.utilities.ngram.arpa import import_arpa
+from convassist.utilities.ngram.ngramutil import NGramUtil
+
+
+def configure():
+    # Create top-level parser
+    parser = argparse.ArgumentParser(
+        description="Import an ARPA language model into an NGram Database for ConvAssist"
+    )
+
+    parser.add_argument(
+        "database",
+        type=str,
+        help="The database file to import the language model into. Must be a path to a db file.",
+    )
+
+    parser.add_argument(
+        "arpa_file",
+        type=str,
+        help="The ARPA file (optionally .gz) to import.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--cardinality",
+        type=int,
+        default=0,
+        help="Only import n-grams up to this cardinality (default: all)",
+    )
+
+    parser.add_argument(
+        "-l",
+        "--lowercase",
+        action="store_true",
+        help="Whether to convert all tokens to lowercase",
+    )
+
+    return parser
+
+
+def main(argv=None):
+    parser = configure()
+    args = parser.parse_args(argv)
+
+    with NGramUtil(args.database) as ngramutil:
+        ngramutil.connection.execute_query("PRAGMA synchronous = OFF;")
+        counts = import_arpa(ngramutil, args.arpa_file, args.cardinality, args.lowercase)
+        ngramutil.connection.execute_query("PRAGMA synchronous = FULL;")
+
+    for cardinality, count in counts.items():
+        print(f"{cardinality}-grams: {count}")
+    print(
+        f"Imported {args.arpa_file} into {args.database}. "
+        "Set 'smoothing = kneser_ney' in the predictor's section to use it."
+    )
+
+
+if __name__ == "__main__":
+    main()
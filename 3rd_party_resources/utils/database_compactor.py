@@ -0,0 +1,212 @@
+import argparse
+import math
+import os
+from typing import Dict, List, Set, Tuple
+
+from tqdm import tqdm
+
+from convassist.utilities.ngram.ngramutil import SCHEMA_TEXT, SCHEMA_VOCAB, NGramUtil
+
+Counts = Dict[Tuple[str, ...], int]
+
+
+def configure():
+    # Create top-level parser
+    parser = argparse.ArgumentParser(
+        description="Prune an NGram Database for ConvAssist and write it in the compact schema"
+    )
+
+    parser.add_argument("source", type=str, help="The n-gram database to compact.")
+
+    parser.add_argument("target", type=str, help="The compact database file to create.")
+
+    parser.add_argument(
+        "-c",
+        "--cardinality",
+        type=int,
+        default=3,
+        help="The number of tokens to consider in the n-gram model",
+    )
+
+    parser.add_argument(
+        "--cutoffs",
+        type=int,
+        nargs="+",
+        default=[0],
+        help=(
+            "Drop n-grams with this count or lower, one value per cardinality starting "
+            "with unigrams. The last value is used for all higher cardinalities."
+        ),
+    )
+
+    parser.add_argument(
+        "--prune",
+        type=float,
+        default=0.0,
+        help=(
+            "Drop n-grams whose removal changes the model's entropy by less than this "
+            "threshold (e.g. 1e-8). 0 disables entropy pruning."
+        ),
+    )
+
+    parser.add_argument(
+        "--quantize",
+        type=float,
+        default=0.0,
+        help=(
+            "Store counts as logarithms in this base (e.g. 1.1) to shrink the database. "
+            "Quantized databases are read-only. 0 stores exact counts."
+        ),
+    )
+
+    parser.add_argument(
+        "--force", action="store_true", help="Overwrite the target database if it exists"
+    )
+
+    return parser
+
+
+def load_counts(ngramutil: NGramUtil, cardinality: int) -> List[Counts]:
+    counts = []
+    for card in range(1, cardinality + 1):
+        rows = ngramutil.connection.fetch_all(f"SELECT * FROM _{card}_gram;")  # nosec
+        counts.append({tuple(row[:-1]): int(row[-1]) for row in rows})
+    return counts
+
+
+def entropy_loss(counts: List[Counts], ngram: Tuple[str, ...], count: int, total: int) -> float:
+    """
+    Estimates how much removing ngram changes the model, as the weighted
+    difference between its own log-probability and the one the model falls
+    back to without it (Seymore & Rosenfeld 1996; Stolcke 1998 without
+    renormalizing backoff weights).
+
+    Returns inf, i.e. keep the n-gram, when a count needed for the estimate is
+    missing.
+    """
+    n = len(ngram)
+    history_count = counts[n - 2].get(ngram[:-1], 0)
+    suffix_count = counts[n - 2].get(ngram[1:], 0)
+    if n > 2:
+        lower_history_count = counts[n - 3].get(ngram[1:-1], 0)
+    else:
+        lower_history_count = sum(counts[0].values())
+
+    if not (history_count and suffix_count and lower_history_count):
+        return math.inf
+
+    probability = count / history_count
+    lower_probability = suffix_count / lower_history_count
+    return (count / total) * (math.log(probability) - math.log(lower_probability))
+
+
+def prune(counts: List[Counts], cutoffs: List[int], threshold: float) -> List[Counts]:
+    """
+    Applies count cutoffs and entropy pruning, from the highest cardinality down.
+
+    The history and the lower order suffix of every n-gram that is kept are
+    kept as well, so that the model can still compute its probability.
+    """
+    cardinality = len(counts)
+    pruned: List[Counts] = [dict() for _ in range(cardinality)]
+    protected: Set[Tuple[str, ...]] = set()
+
+    for n in range(cardinality, 0, -1):
+        table = counts[n - 1]
+        cutoff = cutoffs[min(n, len(cutoffs)) - 1]
+        total = sum(table.values())
+
+        kept = pruned[n - 1]
+        for ngram, count in tqdm(
+            table.items(), desc=f"Pruning {n}-grams", unit=" n-grams", leave=False
+        ):
+            if ngram not in protected:
+                if count <= cutoff:
+                    continue
+                if threshold and n > 1 and entropy_loss(counts, ngram, count, total) < threshold:
+                    continue
+            kept[ngram] = count
+
+        protected = {ngram[:-1] for ngram in kept} | {ngram[1:] for ngram in kept}
+
+        print(f"{n}-grams: kept {len(kept)} of {len(table)}")
+
+    return pruned
+
+
+def quantize(count: int, base: float) -> int:
+    if not base:
+        return count
+    return max(0, int(round(math.log(count) / math.log(base))))
+
+
+def write_compact(target: str, counts: List[Counts], base: float):
+    cardinality = len(counts)
+
+    # frequent words get the small ids, which SQLite stores in fewer bytes
+    unigrams = counts[0]
+    words = {word for table in counts for ngram in table for word in ngram}
+    vocab = sorted(words, key=lambda word: (-unigrams.get((word,), 0), word))
+    word_ids = {word: index for index, word in enumerate(vocab, start=1)}
+
+    with NGramUtil(target, cardinality) as ngramutil:
+        connection = ngramutil.connection
+        ngramutil._create_meta_table()
+        ngramutil._create_vocab_table()
+        for card in range(1, cardinality + 1):
+            ngramutil._create_vocab_ngram_table(card)
+
+        connection.begin_transaction()
+        connection.execute_many(
+            "INSERT INTO vocab (id, word) VALUES (?, ?);",
+            ((index, word) for word, index in word_ids.items()),
+            commit=False,
+        )
+
+        for card in tqdm(range(1, cardinality + 1), desc="Writing n-grams", unit=" tables"):
+            table = counts[card - 1]
+            placeholders = ", ".join(["?"] * (card + 1))
+            connection.execute_many(
+                f"INSERT INTO _{card}_gram VALUES ({placeholders});",
+                (
+                    (*[word_ids[word] for word in ngram], quantize(count, base))
+                    for ngram, count in sorted(table.items())
+                ),
+                commit=False,
+            )
+            ngramutil._set_meta(f"count_sum_{card}", sum(table.values()), commit=False)
+
+        ngramutil._set_meta("schema_version", SCHEMA_VOCAB, commit=False)
+        ngramutil._set_meta("cardinality", cardinality, commit=False)
+        ngramutil._set_meta("quantization_base", base, commit=False)
+        connection.commit()
+
+
+def main(argv=None):
+    parser = configure()
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.target):
+        if not args.force:
+            print(f"{args.target} already exists, use --force to overwrite it.")
+            return
+        os.remove(args.target)
+
+    with NGramUtil(args.source, args.cardinality) as ngramutil:
+        if ngramutil.schema_version != SCHEMA_TEXT:
+            print(f"{args.source} is already compact.")
+            return
+        counts = load_counts(ngramutil, args.cardinality)
+
+    counts = prune(counts, args.cutoffs, args.prune)
+    write_compact(args.target, counts, args.quantize)
+
+    source_size = os.path.getsize(args.source)
+    target_size = os.path.getsize(args.target)
+    print(
+        f"{args.source}: {source_size / 1024:.0f} KB -> {args.target}: {target_size / 1024:.0f} KB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 import argparse
 import os
-from typing import List
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 from tqdm import tqdm
-from convassist.utilities.ngram.ngramutil import NGramUtil
-from convassist.utilities.ngram.ngram_map import NgramMap
-
-# from multiprocessing import Process, Thread
-from threading import Thread
+from convassist.utilities.ngram.ngramutil import SCHEMA_VOCAB, NGramUtil
 
 
 def configure():
@@ -49,6 +48,29 @@ def configure():
         help="Whether to normalize the database"
     )
 
+    parser.add_argument(
+        '-j',
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of worker processes counting n-grams (default: all cores)"
+    )
+
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=20000,
+        help="The number of input lines each worker counts at a time"
+    )
+
+    parser.add_argument(
+        "--max-ngrams",
+        type=int,
+        default=5000000,
+        help="The number of distinct n-grams held in memory before partial counts are "
+             "spilled to a temporary table on disk"
+    )
+
     #flag to clean the database
 
     parser.add_argument(
@@ -60,20 +82,208 @@ def configure():
     return parser
 
 
-def insertngrambycardinality(ngramutil: NgramMap, phrases: List, cardinality: int):
+def read_shards(input_file: str, shard_size: int) -> Iterator[List[str]]:
+    """Yields the non-empty lines of input_file in lists of at most shard_size lines."""
+    with open(input_file) as f:
+        lines = (line.strip() for line in f)
+        lines = (line for line in lines if line)
+        while True:
+            shard = list(islice(lines, shard_size))
+            if not shard:
+                return
+            yield shard
+
+
+def count_shard(args: Tuple[List[str], int]) -> List[Counter]:
+    """
+    Counts the n-grams of every cardinality in one shard of input lines.
+
+    Runs in a worker process, so it only touches its arguments.
+    Returns one Counter per cardinality, keyed on the n-gram's tokens.
+    """
+    phrases, cardinality = args
+    return [NGramUtil.count_ngrams(phrases, card) for card in range(1, cardinality + 1)]
+
+
+class NgramDatabaseBuilder:
+    """
+    Merges partial n-gram counts and bulk loads them into the n-gram tables.
+
+    Partial counts are merged in memory; once more than max_ngrams distinct
+    n-grams are held they are spilled to a temporary staging table and summed
+    with GROUP BY when the load is finished.  Everything is written in a single
+    transaction, and the indexes on new tables are only built after the load.
+
+    On a SCHEMA_VOCAB database the words are added to the vocabulary and the
+    n-grams are stored as vocab ids, as NGramUtil.insert_ngram_counts() does.
+    """
+
+    def __init__(self, ngramutil: NGramUtil, cardinality: int, max_ngrams: int):
+        self.ngramutil = ngramutil
+        self.connection = ngramutil.connection
+        self.cardinality = cardinality
+        self.max_ngrams = max_ngrams
+        self.counts: List[Dict[tuple, int]] = [dict() for _ in range(cardinality)]
+        self.spilled = False
+        self.vocab = ngramutil.schema_version == SCHEMA_VOCAB
+
+        self.new_tables = [
+            not ngramutil._table_exists(f"_{card}_gram") for card in range(1, cardinality + 1)
+        ]
 
-    query = ngramutil.generate_ngram_insert_query(cardinality, True)
+    def __enter__(self):
+        # bulk loading: the database is rebuilt from the corpus if anything goes wrong
+        self.connection.execute_query("PRAGMA synchronous = OFF;")
+        self.connection.execute_query("PRAGMA journal_mode = MEMORY;")
 
-    data = []
-    for phrase in tqdm(phrases, desc=f"Processing {cardinality}-grams", unit=" phrases", leave=False):
-        ngram_map = NgramMap(cardinality, phrase)
-        for ngram, count in ngram_map.items():
-            data.append((*ngram, count))
+        self.ngramutil._check_writable()
+        if self.vocab:
+            self.ngramutil._create_vocab_table()
 
-    batch_size = 3000
-    for i in tqdm(range(0, len(data), batch_size), desc=f"Inserting {cardinality}-grams", unit=" batches", leave=True):
-        batch = data[i:i + batch_size]
-        ngramutil.connection.execute_many(query, batch)
+        for card in range(1, self.cardinality + 1):
+            if self.vocab:
+                # the primary key of a vocab table is its only index
+                self.ngramutil._create_vocab_ngram_table(card)
+            elif self.new_tables[card - 1]:
+                self.ngramutil._create_ngram_table(card, unique=False)
+            else:
+                self.ngramutil._check_upgrade_table(card)
+
+        self.connection.begin_transaction()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.connection.rollback()
+            self.connection.execute_query("PRAGMA synchronous = FULL;")
+            return
+
+        self.connection.commit()
+
+        # Build the indexes of new tables once, after all their rows are in
+        for card in range(1, self.cardinality + 1):
+            if self.new_tables[card - 1] and not self.vocab:
+                self.ngramutil._create_unique_index(card)
+                self.ngramutil._create_index(card)
+
+        self.connection.execute_query("PRAGMA synchronous = FULL;")
+
+    def _columns(self, card: int) -> str:
+        return ", ".join([f"word_{i}" for i in reversed(range(1, card))] + ["word"])
+
+    def add(self, partial_counts: List[Counter]):
+        size = 0
+        for counts, partial in zip(self.counts, partial_counts):
+            for ngram, count in partial.items():
+                counts[ngram] = counts.get(ngram, 0) + count
+            size += len(counts)
+
+        if size > self.max_ngrams:
+            self._spill()
+
+    def _spill(self):
+        for card in range(1, self.cardinality + 1):
+            counts = self.counts[card - 1]
+            if not self.spilled:
+                columns = ", ".join(
+                    [f"word_{i} TEXT" for i in reversed(range(1, card))] + ["word TEXT"]
+                )
+                self.connection.execute_query(
+                    f"CREATE TEMP TABLE _{card}_gram_stage ({columns}, count INTEGER);",
+                    commit=False,
+                )
+
+            placeholders = ", ".join(["?"] * (card + 1))
+            self.connection.execute_many(
+                f"INSERT INTO _{card}_gram_stage VALUES ({placeholders});",
+                ((*ngram, count) for ngram, count in counts.items()),
+                commit=False,
+            )
+            counts.clear()
+        self.spilled = True
+
+    def _word_ids(self) -> Dict[str, int]:
+        words = {word for counts in self.counts for ngram in counts for word in ngram}
+        self.connection.execute_many(
+            "INSERT OR IGNORE INTO vocab (word) VALUES (?);",
+            ((word,) for word in words),
+            commit=False,
+        )
+        return dict(self.connection.fetch_all("SELECT word, id FROM vocab;"))
+
+    def _stage_source(self, card: int) -> str:
+        columns = self._columns(card)
+        if not self.vocab:
+            # WHERE true avoids the parsing ambiguity of INSERT ... SELECT ... ON CONFLICT
+            return (
+                f"SELECT {columns}, SUM(count) FROM _{card}_gram_stage "
+                f"WHERE true GROUP BY {columns}"
+            )
+
+        words = columns.split(", ")
+        for word in words:
+            self.connection.execute_query(
+                f"INSERT OR IGNORE INTO vocab (word) SELECT DISTINCT {word} "
+                f"FROM _{card}_gram_stage;",
+                commit=False,
+            )
+        ids = ", ".join([f"v_{word}.id" for word in words])
+        joins = " ".join([f"JOIN vocab v_{word} ON v_{word}.word = s.{word}" for word in words])
+        return (
+            f"SELECT {ids}, SUM(s.count) FROM _{card}_gram_stage s {joins} "
+            f"WHERE true GROUP BY {ids}"
+        )
+
+    def _insert_query(self, card: int, source: str) -> str:
+        columns = self._columns(card)
+        query = f"INSERT INTO _{card}_gram ({columns}, count) {source}"
+        if not self.new_tables[card - 1]:
+            # merging into an existing database: add to the counts already there
+            query += f" ON CONFLICT ({columns}) DO UPDATE SET count = count + excluded.count"
+        return query + ";"
+
+    def load(self):
+        if self.spilled:
+            self._spill()
+        word_ids = self._word_ids() if self.vocab and not self.spilled else {}
+
+        for card in tqdm(range(1, self.cardinality + 1), desc="Loading n-grams", unit=" tables"):
+            if self.spilled:
+                source = self._stage_source(card)
+                self.connection.execute_query(self._insert_query(card, source), commit=False)
+                self.connection.execute_query(f"DROP TABLE _{card}_gram_stage;", commit=False)
+            else:
+                counts = self.counts[card - 1]
+                placeholders = ", ".join(["?"] * (card + 1))
+                if self.vocab:
+                    rows = (
+                        (*[word_ids[word] for word in ngram], count)
+                        for ngram, count in counts.items()
+                    )
+                else:
+                    rows = ((*ngram, count) for ngram, count in counts.items())
+                self.connection.execute_many(
+                    self._insert_query(card, f"VALUES ({placeholders})"), rows, commit=False
+                )
+                counts.clear()
+
+
+def build_database(
+    ngramutil: NGramUtil,
+    shards: Iterable[List[str]],
+    cardinality: int,
+    jobs: int,
+    max_ngrams: int,
+):
+    with NgramDatabaseBuilder(ngramutil, cardinality, max_ngrams) as builder:
+        tasks = ((shard, cardinality) for shard in shards)
+        with Pool(processes=jobs) as pool:
+            for partial_counts in tqdm(
+                pool.imap_unordered(count_shard, tasks), desc="Counting n-grams", unit=" shards"
+            ):
+                builder.add(partial_counts)
+
+        builder.load()
 
 
 def main(argv=None):
@@ -92,25 +302,11 @@ def main(argv=None):
         else:
             print("Cleaning database...")
             os.remove(args.database)
-    
-    phrases = []
-
-    with open(args.input_file) as f:
-        for line in f:
-            phrases.append(line.strip())
 
+    shards = read_shards(args.input_file, args.shard_size)
 
     with NGramUtil(args.database, args.cardinality, args.lowercase, args.normalize) as ngramutil:
-        ngramutil.create_update_ngram_tables()
-        
-        threads = []
-        for i in range(args.cardinality):
-            p = Thread(target=insertngrambycardinality, args=(ngramutil, phrases, i + 1))
-            threads.append(p)
-            p.start()
-
-        for p in threads:
-            p.join()
+        build_database(ngramutil, shards, args.cardinality, max(1, args.jobs), args.max_ngrams)
 
 
 if __name__ == "__main__":
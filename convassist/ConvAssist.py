@@ -2,13 +2,13 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+import os
 from configparser import ConfigParser
 
-import nltk
-
 from convassist.context_tracker import ContextTracker
 from convassist.predictor_activator import PredictorActivator
 from convassist.predictor_registry import PredictorRegistry
+from convassist.utilities.learn_queue import LearnQueue
 from convassist.utilities.logging_utility import LoggingUtility
 
 
@@ -31,6 +31,7 @@ class ConvAssist:
         self.initialized = False
         self.name = name
         self.ini_file = ini_file
+        self.learn_queue: LearnQueue | None = None
 
         if self.config:
             self.initialize(self.config, self.log_file, self.log_level)
@@ -65,9 +66,44 @@ class ConvAssist:
         )
         self.predictor_activator.combination_policy = "meritocracy"
 
+        self._start_learn_queue()
+
         self.initialized = True
 
+    def _start_learn_queue(self):
+        """
+        Starts the background learning configured in the [LearnQueue] section.
+        When it is disabled, which is the default, learn_text() learns
+        synchronously.
+        """
+        if self.learn_queue is not None:
+            self.learn_queue.stop()
+            self.learn_queue = None
+
+        if not self.config.getboolean("LearnQueue", "enabled", fallback=False):
+            return
+
+        database = self.config.get(
+            "LearnQueue", "database", fallback=f"{self.name}_learn_queue.db"
+        )
+        personalized_resources_path = self.config.get(
+            "Common", "personalized_resources_path", fallback=""
+        )
+        database = os.path.join(personalized_resources_path, database)
+
+        self.learn_queue = LearnQueue(
+            database,
+            self._learn_texts,
+            self.config.getint("LearnQueue", "batch_size", fallback=32),
+            self.logger,
+        )
+        self.learn_queue.start()
+        self.logger.info(f"Learning in the background, queued in {database}")
+
     def _verify_nltk_files(self):
+        # nltk is imported where it is needed; importing it costs over a second.
+        import nltk
+
         try:
             # Check if punkt is already downloaded
             nltk.data.find("tokenizers/punkt")
@@ -128,21 +164,54 @@ class ConvAssist:
     def learn_text(self, text):
         """
         Learns a sentence, word, or phrase.
+        With background learning enabled the text is only queued, and learned
+        by the learn queue's worker thread.
         Args:
             text (str): The text to learn.
         """
         if not self.initialized:
             raise AttributeError(f"ConvAssist {self.name} not initialized.")
 
+        if self.learn_queue is not None:
+            self.learn_queue.put(text)
+            return
+
+        import nltk
+
         sentences = nltk.sent_tokenize(text)
         for eachSent in sentences:
             self.predictor_activator.learn_text(eachSent)
 
+    def _learn_texts(self, texts):
+        """Learns a batch of texts taken from the learn queue."""
+        import nltk
+
+        sentences = [sentence for text in texts for sentence in nltk.sent_tokenize(text)]
+        self.predictor_activator.learn_texts(sentences, wait=True)
+
+    def wait_for_learning(self, timeout: float | None = None) -> bool:
+        """
+        Waits until the texts queued for background learning have been learned.
+        Returns False if the timeout expired first.
+        """
+        if self.learn_queue is None:
+            return True
+        return self.learn_queue.join(timeout)
+
+    def close(self):
+        """
+        Stops background learning. Texts that have not been learned yet are
+        kept in the queue's database and learned on the next start.
+        """
+        if self.learn_queue is not None:
+            self.learn_queue.stop()
+            self.learn_queue = None
+
     def check_model(self):
         """
         Checks if models associated with a predictor are loaded.
         Returns:
-            Any: The status of the model.
+            bool: True once every predictor has loaded its models.
         """
         if not self.initialized:
             raise AttributeError(f"ConvAssist {self.name} not initialized.")
@@ -150,6 +219,17 @@ class ConvAssist:
         status = self.predictor_registry.model_status()
         return status
 
+    def predictor_status(self):
+        """
+        Checks which predictors have loaded their models.
+        Returns:
+            dict[str, bool]: The load status of each predictor, keyed by name.
+        """
+        if not self.initialized:
+            raise AttributeError(f"ConvAssist {self.name} not initialized.")
+
+        return self.predictor_registry.predictor_status()
+
     def set_log_level(self, log_level):
         self.logger.setLevel(log_level)
 
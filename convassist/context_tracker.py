@@ -1,7 +1,12 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from nltk import RegexpTokenizer
+import re
+
+# tokenize the context into words with punctuation and spaces
+# reg = r"\w+(?:['-]\w+)*|\s"  # with spaces
+# Same pattern and flags nltk's RegexpTokenizer would use, without importing nltk.
+_TOKEN_RE = re.compile(r"\w+(?:['-]\w+)*", re.UNICODE | re.MULTILINE | re.DOTALL)  # without spaces
 
 
 class ContextTracker:
@@ -16,12 +21,7 @@ class ContextTracker:
         self._context = ""
 
     def _update_context(self):
-        # tokenize the context into words with punctuation and spaces
-        # reg = r"\w+(?:['-]\w+)*|\s"  # with spaces
-        reg = r"\w+(?:['-]\w+)*"  # without spaces
-
-        tokenizer = RegexpTokenizer(reg)
-        self.tokens = tokenizer.tokenize(self._context.lower())
+        self.tokens = _TOKEN_RE.findall(self._context.lower())
 
         if self._context and self._context[-1] == " ":  # if the last character is a space
             self.tokens.append("")
@@ -10,14 +10,20 @@ import joblib
 import numpy
 import torch
 from nltk import word_tokenize
-from nltk.stem import PorterStemmer
-from sentence_transformers import SentenceTransformer
 
 from convassist.predictor.predictor import Predictor
 from convassist.predictor.utilities.canned_data import cannedData
+from convassist.predictor.utilities.cpu_inference import configure_torch_threads
+from convassist.predictor.utilities.embedding_cache import EmbeddingCache
+from convassist.predictor.utilities.exact_index import ExactIndex
 from convassist.predictor.utilities.prediction import Prediction
+from convassist.predictor.utilities.sentence_encoder import SentenceEncoderRegistry
+from convassist.predictor.utilities.stemmer import Stemmer
 from convassist.predictor.utilities.suggestion import Suggestion
 
+# number of phrases the semantic search suggests
+SEMANTIC_HITS = 10
+
 
 class CannedPhrasesPredictor(Predictor):
     """
@@ -25,6 +31,8 @@ class CannedPhrasesPredictor(Predictor):
     to find matching next words and sentences based on a given context.
     """
 
+    loads_models = True
+
     def __init__(
         self,
         config,
@@ -43,26 +51,36 @@ class CannedPhrasesPredictor(Predictor):
             self.device = "cpu"
             self.n_gpu = 0
 
+        self._model_loaded = False
+
         super().__init__(config, context_tracker, predictor_name, logger)
 
     def configure(self):
         self.corpus_phrases = []
         self.corpus_embeddings = []
+        self.index: ExactIndex | hnswlib.Index | None = None
 
         self._model_loaded = False
-        self.stemmer = PorterStemmer()
+        self.stemmer = Stemmer()
 
         if os.path.exists(os.path.join(self._static_resources_path, self.sbertmodel)):
             localfiles = True
         else:
             localfiles = False
 
-        self.embedder = SentenceTransformer(
+        configure_torch_threads(self.torch_num_threads, self.torch_interop_threads, self.logger)
+
+        self.embedder = SentenceEncoderRegistry().get_encoder(
             self.sbertmodel,
-            device=self.device,
+            self.device,
+            quantize=self.quantize_int8,
+            backend=self.encoder_backend,
+            export_dir=os.path.dirname(self.embedding_cache_path),
             local_files_only=localfiles,
             tokenizer_kwargs={"clean_up_tokenization_spaces": True},
         )
+        self.embedding_cache = EmbeddingCache()
+        self.embedding_cache.reserve(self.embedding_lru_size, self.embedding_lru_mb)
 
         self.cannedData = cannedData(self.sentences_db_path, self.personalized_cannedphrases)
 
@@ -83,21 +101,7 @@ class CannedPhrasesPredictor(Predictor):
             self.corpus_phrases = cache_data["sentences"]
             self.corpus_embeddings = cache_data["embeddings"]
 
-            self.embedding_size = (
-                self.corpus_embeddings[0].shape[0] if len(self.corpus_embeddings) > 0 else 0
-            )
-            self.index = hnswlib.Index(space="cosine", dim=self.embedding_size)
-
-            # CHECK IF INDEX IS PRESENT
-            if os.path.exists(self.index_path):
-                self.logger.info("Loading index at ..." + self.index_path)
-                self.index.load_index(self.index_path)
-            else:
-                # Create the HNSWLIB index
-                self.logger.info("Start creating HNSWLIB index")
-                self.index.init_index(max_elements=10000, ef_construction=400, M=64)
-                self.index = self._create_index(self.index)
-            self.index.set_ef(50)
+            self.index = self._build_index()
 
         else:
             self.logger.warning("No canned phrases present.")
@@ -106,11 +110,57 @@ class CannedPhrasesPredictor(Predictor):
         self.logger.debug(f"cannedPhrases count: {len(self.corpus_phrases)}")
         self.logger.info(f"Loaded {self.predictor_name} predictor.")
 
-    def _create_index(self, ind):
-        ind.add_items(self.corpus_embeddings, list(range(len(self.corpus_embeddings))))
+    def _build_index(self) -> ExactIndex | hnswlib.Index:
+        """
+        Returns the index to search the canned phrases with: exact search for
+        fewer than exact_search_threshold phrases, an HNSW index for more.
+        """
+        self.embedding_size = self.corpus_embeddings.shape[1]
+        count = len(self.corpus_embeddings)
+
+        if count < self.exact_search_threshold:
+            self.logger.info(f"Searching {count} canned phrases exactly")
+            return ExactIndex(self.embedding_size, self.corpus_embeddings)
+
+        index = hnswlib.Index(space="cosine", dim=self.embedding_size)
+
+        # CHECK IF INDEX IS PRESENT
+        if os.path.exists(self.index_path):
+            self.logger.info("Loading index at ..." + self.index_path)
+            index.load_index(self.index_path)
+        else:
+            # Create the HNSWLIB index
+            self.logger.info("Start creating HNSWLIB index")
+            index.init_index(
+                max_elements=count, ef_construction=self.hnsw_ef_construction, M=self.hnsw_m
+            )
+        index.set_ef(max(self.hnsw_ef, SEMANTIC_HITS))  # ef should always be > k
+
+        return self._update_index(index)
+
+    def _update_index(self, index: ExactIndex | hnswlib.Index) -> ExactIndex | hnswlib.Index:
+        """
+        Adds the phrases the index is missing to it.  An HNSW index is grown
+        when it is full and saved.
+        """
+        count = index.get_current_count()
+        total = len(self.corpus_embeddings)
+        if count >= total:
+            return index
+
+        if isinstance(index, ExactIndex):
+            if total < self.exact_search_threshold:
+                index.add_items(self.corpus_embeddings[count:], range(count, total))
+                return index
+            # the phrases have outgrown exact search
+            return self._build_index()
+
+        if total > index.get_max_elements():
+            index.resize_index(max(total, 2 * index.get_max_elements()))
+        index.add_items(self.corpus_embeddings[count:], numpy.arange(count, total), num_threads=-1)
         self.logger.info("Saving index to:" + self.index_path)
-        ind.save_index(self.index_path)
-        return ind
+        index.save_index(self.index_path)
+        return index
 
     @property
     def sentences_db_path(self):
@@ -125,10 +175,12 @@ class CannedPhrasesPredictor(Predictor):
         self.logger.debug("Finding semantic matches")
         try:
             direct_matchedSentences = [s.word for s in sent_prediction]
-            question_embedding = self.embedder.encode(context)
+            question_embedding = self.embedding_cache.encode(
+                self.embedder, self.sbertmodel, context
+            )
 
             # We use hnswlib knn_query method to find the top_k_hits
-            corpus_ids, distances = self.index.knn_query(question_embedding, k=10)
+            corpus_ids, distances = self.index.knn_query(question_embedding, k=SEMANTIC_HITS)
 
             # We extract corpus ids and scores for the first query
             hits = [
@@ -160,11 +212,9 @@ class CannedPhrasesPredictor(Predictor):
 
             rows = []
             for k, _ in canned_phrases.items():
-                matchfound = 0
-                sentence_StemmedWords = [self.stemmer.stem(w) for w in word_tokenize(k)]
-                for c in context_StemmedWords:
-                    if c in sentence_StemmedWords:
-                        matchfound = matchfound + 1
+                # the stems of a phrase are cached across predictions
+                sentence_StemmedWords = self.stemmer.text_stems(k)
+                matchfound = sum(1 for c in context_StemmedWords if c in sentence_StemmedWords)
                 new_row = {
                     "sentence": k,
                     "matches": matchfound,
@@ -246,14 +296,22 @@ class CannedPhrasesPredictor(Predictor):
                 phrase = phrase.strip()
 
                 if phrase not in self.corpus_phrases:
-                    phrase_emb = self.embedder.encode(phrase)
-                    self.corpus_embeddings = numpy.vstack((self.corpus_embeddings, phrase_emb))
+                    phrase_emb = self.embedding_cache.encode(
+                        self.embedder, self.sbertmodel, phrase
+                    )
+                    if len(self.corpus_embeddings):
+                        self.corpus_embeddings = numpy.vstack((self.corpus_embeddings, phrase_emb))
+                    else:
+                        self.corpus_embeddings = numpy.atleast_2d(phrase_emb)
                     self.corpus_phrases.append(phrase)
                     joblib.dump(
                         {"sentences": self.corpus_phrases, "embeddings": self.corpus_embeddings},
                         self.embedding_cache_path,
                     )
-                    self.index = self._create_index(self.index)
+                    if self.index is None:
+                        self.index = self._build_index()
+                    else:
+                        self.index = self._update_index(self.index)
 
                 # ADD THE NEW PHRASE TO THE DATABASE
                 self.cannedData.learn(phrase)
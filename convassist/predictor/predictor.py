@@ -6,6 +6,7 @@
 
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
 from configparser import ConfigParser
 
@@ -15,6 +16,10 @@ from convassist.utilities.logging_utility import LoggingUtility
 
 
 class Predictor(ABC):
+    # Predictors that load large models (transformers, sentence encoders, ...)
+    # set this so they can be configured on a background thread.
+    loads_models: bool = False
+
     def __init__(
         self,
         config: ConfigParser,
@@ -38,25 +43,47 @@ class Predictor(ABC):
 
         self.logger.info(f"Initializing {self.predictor_name} predictor")
 
+        # Held while predicting, learning or recreating the databases, which the
+        # learn queue's worker thread does concurrently with the caller's thread.
+        self.lock = threading.RLock()
+
         self._aac_dataset: str = ""  # Path
+        self._background_load: bool = False
         self._blacklist_file: str = ""  # Path
         self._database: str = ""  # Path
+        self._decoding: str = "beam"  # beam | diverse_beam | greedy | sample
         self._deltas: str = "0.01 0.1 0.89"
         self._embedding_cache_path: str = ""  # Path
+        self._embedding_lru_mb: int = 32
+        self._embedding_lru_size: int = 1024
+        self._encoder_backend: str = "torch"  # torch | onnx
+        self._exact_search_threshold: int = 1000  # smaller corpora are searched without HNSW
         self._generic_phrases: str = ""  # Path
+        self._hnsw_ef: int = 50  # search breadth, raised to at least the hits asked for
+        self._hnsw_ef_construction: int = 400
+        self._hnsw_m: int = 64  # links per node
         self._index_path: str = ""  # Path
+        self._kv_cache_reuse: bool = True
         self._learn: bool = False
+        self._lm_rebuild_delay: int = 5  # seconds without learning before the LM is updated
+        self._lm_rebuild_max_mb: int = 100  # larger databases are only rebuilt on request
+        self._max_new_tokens: int = 20
         self._modelname: str = ""  # Path
+        self._ngram_schema: int = 1  # 1: TEXT columns, 2: vocab ids
+        self._num_beams: int = 10  # beams searched, or sequences sampled
         self._personalized_allowed_toxicwords_file: str = ""  # Path
         self._personalized_cannedphrases: str = ""  # Path
         self._personalized_resources_path: str = ""
         self._predictor_class: str = ""
+        self._prefix_cache_rows: int = 256  # 0 disables the n-gram prefix cache
+        self._quantize_int8: bool = False  # CPU only
         self._retrieve_database: str = ""  # Path
         self._retrieveaac: bool = True
         self._sbertmodel: str = ""
         self._sent_database: str = ""  # Path
         self._sentence_transformer_model: str = ""  # Path
         self._sentences_db: str = ""  # Path
+        self._smoothing: str = "interpolated"  # interpolated | kneser_ney
         self._spellingdatabase: str = ""  # Path
         self._startsents: str = "start_sentences.txt"  # Filename
         self._startwords: str = "start_words.txt"  # Filename
@@ -64,18 +91,105 @@ class Predictor(ABC):
         self._stopwords: str = ""  # Path
         self._test_generalsentenceprediction: bool = False
         self._tokenizer: str = ""  # Path
+        self._top_k: int = 10
+        self._torch_interop_threads: int = 0  # 0: torch default
+        self._torch_num_threads: int = 0  # 0: torch default
 
         self._read_config()
 
         self.logger.info(f"Finished initializing {self.predictor_name} predictor")
 
+        # _ready is True once configure() has completed and the predictor can be
+        # used; _loaded is set when configure() has finished, successfully or not.
+        self._ready = False
+        self._loaded = threading.Event()
+        self._loader: threading.Thread | None = None
+        # phrases learned while loading in the background, see learn_when_ready()
+        self._pending_phrases: list[str] = []
+
         # TODO: FIXME - Change functionality to force a call to configure.
-        self.configure()
+        if self.background_load and self.loads_models:
+            self._loader = threading.Thread(
+                target=self._configure_in_background,
+                name=f"{self.predictor_name}-loader",
+                daemon=True,
+            )
+            self._loader.start()
+        else:
+            self.configure()
+            self._ready = True
+            self._loaded.set()
+
+    def _configure_in_background(self):
+        self.logger.info(f"Loading {self.predictor_name} in the background")
+        try:
+            self.configure()
+            self._ready = True
+            self.logger.info(f"{self.predictor_name} is ready")
+        except Exception as e:
+            self.logger.error(f"Exception loading {self.predictor_name} in the background: {e}")
+        finally:
+            # under the lock, so learn_when_ready() either holds its phrases
+            # before they are learned here or learns them itself
+            with self.lock:
+                self._loaded.set()
+                self._learn_pending()
+
+    def _learn_pending(self):
+        phrases, self._pending_phrases = self._pending_phrases, []
+        if not phrases:
+            return
+        if not self.ready:
+            self.logger.warning(
+                f"Dropping {len(phrases)} phrases learned while {self.predictor_name} was loading"
+            )
+            return
+
+        self.logger.info(f"Learning {len(phrases)} phrases held while loading")
+        try:
+            self.learn_many(phrases)
+        except Exception as e:
+            self.logger.error(f"Exception learning the phrases held while loading: {e}")
+
+    @property
+    def ready(self) -> bool:
+        """True once the predictor has been configured and can make predictions."""
+        return self._ready
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """
+        Blocks until the predictor has finished loading or timeout expires.
+        Returns:
+            bool: True if the predictor is ready, False if loading failed or timed out
+        """
+        self._loaded.wait(timeout)
+        return self.ready
+
+    def learn_when_ready(self, phrases):
+        """
+        Learns phrases now, or, while the predictor is still loading in the
+        background, holds them and learns them once it has loaded, so that
+        the caller never waits for a model to load.  Held phrases are dropped
+        if loading fails.
+        """
+        with self.lock:
+            if not self._loaded.is_set():
+                self._pending_phrases.extend(phrases)
+            elif self.ready:
+                self.learn_many(phrases)
+
+    @property
+    def model_loaded(self) -> bool:
+        return self.ready
 
     @property
     def predictor_name(self):
         return self._predictor_name
 
+    @property
+    def background_load(self):
+        return self._background_load
+
     @property
     def aac_dataset(self):
         return self._aac_dataset
@@ -96,18 +210,66 @@ class Predictor(ABC):
     def cardinality(self):
         return len(self.deltas)
 
+    @property
+    def exact_search_threshold(self) -> int:
+        return self._exact_search_threshold
+
     @property
     def generic_phrases(self):
         return os.path.join(self._personalized_resources_path, self._generic_phrases)
 
+    @property
+    def hnsw_ef(self) -> int:
+        return self._hnsw_ef
+
+    @property
+    def hnsw_ef_construction(self) -> int:
+        return self._hnsw_ef_construction
+
+    @property
+    def hnsw_m(self) -> int:
+        return self._hnsw_m
+
     @property
     def learn_enabled(self):
         return self._learn
 
+    @property
+    def lm_rebuild_delay(self) -> int:
+        return self._lm_rebuild_delay
+
+    @property
+    def lm_rebuild_max_mb(self) -> int:
+        return self._lm_rebuild_max_mb
+
     @property
     def modelname(self):
         return self._modelname
 
+    @property
+    def ngram_schema(self) -> int:
+        return self._ngram_schema
+
+    @property
+    def decoding(self) -> str:
+        return self._decoding
+
+    @property
+    def kv_cache_reuse(self) -> bool:
+        return self._kv_cache_reuse
+
+    @property
+    def max_new_tokens(self) -> int:
+        return self._max_new_tokens
+
+    @property
+    def num_beams(self) -> int:
+        return self._num_beams
+
+    @property
+    def top_k(self) -> int:
+        return self._top_k
+
     @property
     def personalized_cannedphrases(self):
         return os.path.join(self._personalized_resources_path, self._personalized_cannedphrases)
@@ -116,6 +278,22 @@ class Predictor(ABC):
     def predictor_class(self):
         return self._predictor_class
 
+    @property
+    def prefix_cache_rows(self) -> int:
+        return self._prefix_cache_rows
+
+    @property
+    def quantize_int8(self) -> bool:
+        return self._quantize_int8
+
+    @property
+    def torch_interop_threads(self) -> int:
+        return self._torch_interop_threads
+
+    @property
+    def torch_num_threads(self) -> int:
+        return self._torch_num_threads
+
     @property
     def retrieveaac(self):
         return self._retrieveaac
@@ -128,6 +306,10 @@ class Predictor(ABC):
     def sbertmodel(self, value):
         self._sbertmodel = value
 
+    @property
+    def smoothing(self) -> str:
+        return self._smoothing
+
     @property
     def sentence_transformer_model(self):
         return self._sentence_transformer_model
@@ -148,6 +330,18 @@ class Predictor(ABC):
     def embedding_cache_path(self):
         return os.path.join(self._personalized_resources_path, self._embedding_cache_path)
 
+    @property
+    def embedding_lru_size(self):
+        return self._embedding_lru_size
+
+    @property
+    def embedding_lru_mb(self):
+        return self._embedding_lru_mb
+
+    @property
+    def encoder_backend(self) -> str:
+        return self._encoder_backend
+
     @property
     def index_path(self):
         return os.path.join(self._personalized_resources_path, self._index_path)
@@ -205,6 +399,11 @@ class Predictor(ABC):
         # Not all predictors need this, but define it here for those that do
         pass
 
+    def learn_many(self, phrases):  # pragma: no cover
+        # Predictors that can learn a batch faster than phrase by phrase override this
+        for phrase in phrases:
+            self.learn(phrase)
+
     def recreate_database(self):  # pragma: no cover
         # Not all predictors need this, but define it here for those that do
         pass
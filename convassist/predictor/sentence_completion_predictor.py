@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import collections
+import copy
+import os
 import re
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -12,22 +14,110 @@ import nltk
 import numpy
 import torch
 import transformers
-import tqdm
 from nltk import word_tokenize
-from nltk.stem.porter import PorterStemmer
-from sentence_transformers import SentenceTransformer
+from packaging import version
 
 from convassist.predictor.predictor import Predictor
+from convassist.predictor.utilities.cpu_inference import (
+    configure_torch_threads,
+    quantize_int8,
+)
+from convassist.predictor.utilities.embedding_cache import EmbeddingCache
 from convassist.predictor.utilities.prediction import Prediction, Suggestion
+from convassist.predictor.utilities.sentence_encoder import SentenceEncoderRegistry
+from convassist.predictor.utilities.stemmer import Stemmer
+from convassist.predictor.utilities.svo_util import SVOUtil
+from convassist.predictor.utilities.toxic_word_filter import ToxicWordFilter
 from convassist.utilities.databaseutils.sqllite_dbconnector import (
     SQLiteDatabaseConnector,
 )
-from convassist.predictor.utilities.svo_util import SVOUtil
 from convassist.utilities.utils import smart_readlines
 
 
+# values of the decoding option
+DIVERSE_BEAM = "diverse_beam"
+BEAM = "beam"
+GREEDY = "greedy"
+SAMPLE = "sample"
+
+# transformers 5 moved group (diverse) beam search out of generate(), to code
+# on the hub that only runs with trust_remote_code
+GROUP_BEAM_SEARCH_BUILTIN = version.parse(transformers.__version__).major < 5
+
+# generated text ending a sentence
+re_sentence_end = re.compile(r"[.?!]|<eos>")
+
+
+class SentenceEndCriteria(transformers.StoppingCriteria):
+    """
+    Stops generating a sequence as soon as the text generated after the prompt
+    ends a sentence.  Only the first sentence of a completion is suggested, so
+    nothing generated after it is needed.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        generated = self.tokenizer.batch_decode(input_ids[:, self.prompt_length :])
+        done = [bool(re_sentence_end.search(text)) for text in generated]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class PromptCache:
+    """
+    The attention key/value cache of the last prompt given to the model.
+
+    While the user types, each prompt mostly extends the previous one, so the
+    cache is cropped to the tokens both prompts share and only the rest of the
+    new prompt is run through the model.  The last token of a prompt is left
+    out, generate() needs at least one token to start from.
+    """
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.cache: Optional[transformers.DynamicCache] = None
+        self.reused = 0
+
+    def clear(self):
+        self.ids = []
+        self.cache = None
+
+    def extend(self, model, ids: List[int]) -> transformers.DynamicCache:
+        """
+        Returns a copy of the cache of ids[:-1], which generate() may modify.
+        """
+        prefix = ids[:-1]
+
+        common = 0
+        for cached, new in zip(self.ids, prefix):
+            if cached != new:
+                break
+            common += 1
+
+        with torch.inference_mode():
+            if self.cache is None or common == 0:
+                self.cache = transformers.DynamicCache()
+            elif common < len(self.ids):
+                # the context was edited: drop what follows the shared tokens
+                self.cache.crop(common - len(self.ids))
+            self.reused += common
+
+            if common < len(prefix):
+                input_ids = torch.tensor([prefix[common:]], device=model.device)
+                self.cache = model(
+                    input_ids=input_ids, past_key_values=self.cache, use_cache=True
+                ).past_key_values
+            self.ids = prefix
+
+            return copy.deepcopy(self.cache)
+
+
 class SentenceCompletionPredictor(Predictor):
 
+    loads_models = True
+
     def __init__(self, *args, **kwargs):
         import os
 
@@ -46,34 +136,37 @@ class SentenceCompletionPredictor(Predictor):
         self.corpus_sentences = []
         self.sentence_generator: transformers.Pipeline | None = None
         self._model_loaded = False
+        self.prompt_cache = PromptCache()
 
         super().__init__(*args, **kwargs)
 
     def configure(self):
 
+        configure_torch_threads(self.torch_num_threads, self.torch_interop_threads, self.logger)
+
         # check if saved torch model exists
         self.load_model()
-        self.stemmer = PorterStemmer()
+        self.stemmer = Stemmer()
 
         # CREATE INDEX TO QUERY DATABASE
-        self.embedder = SentenceTransformer(
+        self.embedder = SentenceEncoderRegistry().get_encoder(
             str(self.sentence_transformer_model),
-            device=self.device,
-            tokenizer_kwargs={"clean_up_tokenization_spaces": "True"},
+            self.device,
+            quantize=self.quantize_int8,
+            backend=self.encoder_backend,
+            export_dir=os.path.dirname(self.embedding_cache_path),
+            tokenizer_kwargs={"clean_up_tokenization_spaces": True},
         )
-        self.embedding_size = 384  # Size of embeddings
+        self.embedding_cache = EmbeddingCache()
+        self.embedding_cache.reserve(self.embedding_lru_size, self.embedding_lru_mb)
         self.top_k_hits = 2  # Output k hits
         self.n_clusters = 350
 
-        # We use Inner Product (dot-product) as Index.
-        # We will normalize our vectors to unit length, then is Inner Product equal to cosine similarity
-        self.index = hnswlib.Index(space="cosine", dim=self.embedding_size)
-
         self.corpus_sentences = smart_readlines(self.retrieve_database)
 
-        self.blacklist_words = smart_readlines(self.blacklist_file)
+        self.blacklist_words = [word.strip() for word in smart_readlines(self.blacklist_file)]
 
-        self.personalized_allowed_toxicwords = self._read_personalized_toxic_words()
+        self.read_personalized_toxic_words()
 
         self.svo_util = SVOUtil(self.stopwordsFile, nlp_path=self._personalized_resources_path)
 
@@ -91,11 +184,30 @@ class SentenceCompletionPredictor(Predictor):
             self.corpus_sentences = cache_data["sentences"]
             self.corpus_embeddings = cache_data["embeddings"]
 
+        # Size of embeddings
+        self.embedding_size = (
+            self.embedder.get_sentence_embedding_dimension() or self.corpus_embeddings.shape[1]
+        )
+
+        # We use Inner Product (dot-product) as Index.
+        # We will normalize our vectors to unit length, then is Inner Product equal to
+        # cosine similarity
+        self.index = hnswlib.Index(space="cosine", dim=self.embedding_size)
+
         # LOAD INDEX IF EXISTS, ELSE CREATE INDEX
         if Path.exists(Path(self.index_path)):
             self.logger.debug("Loading index...")
             self.index.load_index(str(self.index_path))
 
+            # index the sentences added to the corpus since the index was saved
+            count = self.index.get_current_count()
+            if count < len(self.corpus_embeddings):
+                self.logger.debug(
+                    f"Adding {len(self.corpus_embeddings) - count} sentences to the index"
+                )
+                self._add_to_index(self.corpus_embeddings[count:], count)
+                self.index.save_index(self.index_path)
+
         else:
             # creating the embeddings pkl file
             self.logger.debug(" index does not exist, creating index")
@@ -103,20 +215,18 @@ class SentenceCompletionPredictor(Predictor):
             # Create the HNSWLIB index
             self.logger.debug("Start creating HNSWLIB index")
             self.logger.debug(f"len(corpus_sentences) = {len(self.corpus_sentences)}")
-            max_elements = 20000 if len(self.corpus_sentences) > 20000 else len(self.corpus_sentences)
-            self.index.init_index(max_elements=max_elements, ef_construction=400, M=64)
-
-            # Then we train the index to find a suitable clustering
-            with tqdm.tqdm(total=max_elements) as pbar:
-                for idx, emb in enumerate(self.corpus_embeddings[:max_elements]):
-                    self.index.add_items(emb, idx)
-                    pbar.update(1)
+            self.index.init_index(
+                max_elements=max(len(self.corpus_embeddings), 1),
+                ef_construction=self.hnsw_ef_construction,
+                M=self.hnsw_m,
+            )
+            self._add_to_index(self.corpus_embeddings, 0)
 
             self.logger.debug(f"Saving index to: {self.index_path}")
             self.index.save_index(self.index_path)
 
         # Controlling the recall by setting ef:
-        self.index.set_ef(50)  # ef should always be > top_k_hits
+        self.index.set_ef(max(self.hnsw_ef, self.top_k_hits))  # ef should always be > top_k_hits
 
         if not Path.is_file(Path(self.sent_database)):
             self.logger.debug(f"{self.sent_database} not found, creating it")
@@ -126,6 +236,19 @@ class SentenceCompletionPredictor(Predictor):
             conn.create_table("sentences", columns)
             conn.close()
 
+    def _add_to_index(self, embeddings: numpy.ndarray, start: int):
+        """
+        Adds embeddings to the retrieval index with ids from start on, all
+        cores building the graph, and grows the index when it is full.
+        """
+        embeddings = numpy.atleast_2d(embeddings)
+        needed = start + len(embeddings)
+        capacity = self.index.get_max_elements()
+        if needed > capacity:
+            # grow by at least half, so learning sentence by sentence seldom resizes
+            self.index.resize_index(max(needed, capacity + capacity // 2))
+        self.index.add_items(embeddings, numpy.arange(start, needed), num_threads=-1)
+
     def load_model(self) -> None:
         self.logger.debug(f"{__name__} loading model {str(self._modelname)}")
 
@@ -141,6 +264,9 @@ class SentenceCompletionPredictor(Predictor):
             assert tokenizer is not None
             model = transformers.GPT2LMHeadModel.from_pretrained(self.modelname)
             assert model is not None
+            if self.quantize_int8 and self.device == "cpu":
+                self.logger.debug("Quantizing gpt2 model to int8")
+                quantize_int8(model, self.logger)
 
             tokenizer.pad_token_id = tokenizer.eos_token_id
 
@@ -151,6 +277,7 @@ class SentenceCompletionPredictor(Predictor):
                 device=device,
             )
             assert self.sentence_generator is not None
+            self.prompt_cache.clear()
             self._model_loaded = True
         except Exception as e:
             self.logger.error(f"Exception in SentenceCompletionPredictor load_model = {e}")
@@ -166,6 +293,17 @@ class SentenceCompletionPredictor(Predictor):
     def retrieve(self, value):
         self._retrieveaac = value
 
+    def read_personalized_toxic_words(self):
+        self._read_personalized_toxic_words()
+        self._update_toxic_word_filter()
+
+    def _update_toxic_word_filter(self):
+        # The blocklist only changes with the allowed toxic words, so _filter_text
+        # reuses this filter until they are read or learned again
+        self.toxic_word_filter = ToxicWordFilter(
+            self.blacklist_words, self.personalized_allowed_toxicwords
+        )
+
     def _read_personalized_toxic_words(self):
 
         path = Path(self.personalized_allowed_toxicwords_file)
@@ -190,33 +328,47 @@ class SentenceCompletionPredictor(Predictor):
 
     def _filter_text(self, text):
         res = False
-        words = []
-        toxicwordsList = list(
-            set(self.blacklist_words) - set(self.personalized_allowed_toxicwords)
-        )
+        words = self.toxic_word_filter.find(text)
 
-        if any(x in text.lower().split() for x in toxicwordsList):
-            words = list(set(text.lower().split()) & set(toxicwordsList))
+        if words:
             self.logger.warning("blacklisted word is present!!")
             res = True
         return (res, words)
 
     def _textInCorpus(self, text):
-        query_embedding = self.embedder.encode(text)
+        return self._textsInCorpus([text])[0]
 
-        # We use hnswlib knn_query method to find the top_k_hits
-        corpus_ids, distances = self.index.knn_query(query_embedding, k=self.top_k_hits)
-        hits = [
-            {"corpus_id": id, "score": 1 - score} for id, score in zip(corpus_ids[0], distances[0])
-        ]
-        hits = sorted(hits, key=lambda x: x["score"], reverse=True)
-        self.logger.debug(
-            f"score = {hits[0]['score']}, corpus_id = {hits[0]['corpus_id']}, len(corpus_sentences) = {len(self.corpus_sentences)}, corpus_embeddings.shape = {self.corpus_embeddings[0].shape}"
-        )
-        self.logger.debug(
-            f"text = {text}, score = {hits[0]['score']}, sentence = {self.corpus_sentences[hits[0]['corpus_id']]}"
+    def _textsInCorpus(self, texts: List[str]) -> List[float]:
+        """
+        Scores each text by its similarity to the closest sentence in the corpus.
+
+        All texts are encoded in one batch and looked up with a single multi-vector
+        knn_query, so the per-call tokenizer and model overhead is paid only once.
+
+        Args:
+            texts: List[str]: the texts to score
+        Returns:
+            List[float]: one score per text, in the same order as texts
+        """
+        if not texts:
+            return []
+
+        query_embeddings = self.embedding_cache.encode(
+            self.embedder, self.sentence_transformer_model, texts
         )
-        return hits[0]["score"]
+
+        # We use hnswlib knn_query method to find the top_k_hits for every text at once
+        corpus_ids, distances = self.index.knn_query(query_embeddings, k=self.top_k_hits)
+
+        scores = []
+        for text, ids, dists in zip(texts, corpus_ids, distances):
+            hits = [{"corpus_id": id, "score": 1 - score} for id, score in zip(ids, dists)]
+            hits = sorted(hits, key=lambda x: x["score"], reverse=True)
+            sentence = self.corpus_sentences[hits[0]["corpus_id"]]
+            self.logger.debug(f"text = {text}, score = {hits[0]['score']}, sentence = {sentence}")
+            scores.append(hits[0]["score"])
+
+        return scores
 
     def _retrieve_fromDataset(self, context):
         pred = Prediction()
@@ -311,16 +463,7 @@ class SentenceCompletionPredictor(Predictor):
             if gen_context.endswith((".", "!", "?")):
                 gen_context = gen_context + " <eos>"
 
-            result = self.sentence_generator(
-                gen_context,
-                do_sample=False,
-                max_new_tokens=20,
-                num_return_sequences=10,
-                num_beams=10,
-                num_beam_groups=10,
-                diversity_penalty=1.5,
-                repetition_penalty=1.1,
-            )
+            result = self._run_generator(gen_context)
 
             if isinstance(result, List) and all(isinstance(item, dict) for item in result):
                 generated_text: List[Dict[str, Any]] = result
@@ -328,9 +471,15 @@ class SentenceCompletionPredictor(Predictor):
                 raise TypeError(f"Unexpected type for result: {type(result)}")
 
             allsent: list[str] = []
+            # the stems of the completion of each sentence in allsent
+            allsent_stems: list[frozenset[str]] = []
             counts: Dict[str, float] = {}
             totalsent = 0
 
+            # First pass: clean and filter the generated beams so that the
+            # remaining candidates can be scored against the corpus in one batch.
+            candidates: list[tuple[str, str, str]] = []
+
             for text in generated_text:
                 sentence = text["generated_text"]
                 self.logger.debug(f"Generated Text: {sentence}")
@@ -353,40 +502,48 @@ class SentenceCompletionPredictor(Predictor):
                 remainderText = clean_sentence[len(context) :]
                 remainderTextForFilter = re.sub(r"[?,!.\n]", "", remainderText.strip())
 
+                # Empty completions are never suggested, so don't bother scoring them
+                if remainderTextForFilter == "":
+                    continue
+
                 filtered, _ = self._filter_text(remainderTextForFilter)
 
                 if not filtered:
-                    score = self._textInCorpus(clean_sentence.strip())
-
-                    # TODO: DO WE THRESHOLD SCORES?
-                    # TODO: DETOXIFY
-
-                    if remainderTextForFilter != "":
-                        if clean_sentence not in allsent:
-                            imp_tokens = self.svo_util.extract_svo(clean_sentence)
-                            imp_tokens_reminder = []
-                            # get important tokens only of the generated completion
-                            for imp in imp_tokens:
-                                if imp in word_tokenize(remainderTextForFilter):
-                                    imp_tokens_reminder.append(imp)
-                            present = False
-                            for a in allsent:
-                                for it in imp_tokens_reminder:
-                                    if self.stemmer.stem(it) in [
-                                        self.stemmer.stem(w)
-                                        for w in word_tokenize(a[len(context) :])
-                                    ]:
-                                        present = True
-                                        break
-                            if not present:
-                                allsent.append(clean_sentence)
-                                counts[remainderText] = 1 * score
-                                totalsent = totalsent + 1
-                        else:
-                            counts[remainderTextForFilter] = (
-                                counts[remainderTextForFilter] + 1 * score
-                            )
-                            totalsent = totalsent + 1
+                    candidates.append((clean_sentence, remainderText, remainderTextForFilter))
+
+            # Score all candidates against the corpus with one batched encode/knn_query
+            scores = self._textsInCorpus([c[0].strip() for c in candidates])
+
+            # Extract the important tokens of every distinct candidate in one spaCy batch
+            distinct = list(dict.fromkeys(c[0] for c in candidates))
+            svo_tokens = dict(zip(distinct, self.svo_util.extract_svo_many(distinct)))
+
+            # TODO: DO WE THRESHOLD SCORES?
+            # TODO: DETOXIFY
+
+            for (clean_sentence, remainderText, remainderTextForFilter), score in zip(
+                candidates, scores
+            ):
+                if clean_sentence not in allsent:
+                    # get important tokens only of the generated completion
+                    remainder_tokens = set(word_tokenize(remainderTextForFilter))
+                    imp_stems = self.stemmer.stems(
+                        imp for imp in svo_tokens[clean_sentence] if imp in remainder_tokens
+                    )
+                    # skip completions sharing an important word with one already accepted
+                    present = any(imp_stems & stems for stems in allsent_stems)
+                    if not present:
+                        allsent.append(clean_sentence)
+                        allsent_stems.append(
+                            self.stemmer.text_stems(clean_sentence[len(context) :])
+                        )
+                        counts[remainderText] = 1 * score
+                        totalsent = totalsent + 1
+                else:
+                    # The same sentence always yields the same remainderText,
+                    # which is the key it was first counted under.
+                    counts[remainderText] = counts[remainderText] + 1 * score
+                    totalsent = totalsent + 1
 
             # toxic_filtered_sent = self.detoxify(allsent)
             self.logger.warning("toxic_filtered_sent not called.")
@@ -412,6 +569,99 @@ class SentenceCompletionPredictor(Predictor):
 
         return predictions
 
+    def _run_generator(self, gen_context: str) -> List[Dict[str, Any]]:
+        """
+        Generates completions of gen_context, as the text generation pipeline
+        returns them.
+
+        Greedy, sampled and beam search generation reuse the key/value cache of
+        the previous prompt, so only the tokens typed since are run through the
+        model before generating.  The cache is copied for each beam or sampled
+        sequence, which all continue the same prompt.  Diverse beam search
+        starts from the whole prompt.
+        """
+        assert self.sentence_generator is not None
+        model = self.sentence_generator.model
+        tokenizer = self.sentence_generator.tokenizer
+        ids = tokenizer(gen_context)["input_ids"]
+        decoding = self._decoding_mode()
+        kwargs = self._generation_kwargs(decoding, len(ids))
+        input_ids = torch.tensor([ids], device=model.device)
+
+        past_key_values = None
+        if self.kv_cache_reuse and decoding != DIVERSE_BEAM:
+            past_key_values = self.prompt_cache.extend(model, ids)
+
+        with torch.inference_mode():
+            if past_key_values is not None:
+                num_beams = kwargs.get("num_beams", 1)
+                copies = num_beams if num_beams > 1 else kwargs["num_return_sequences"]
+                if copies > 1:
+                    past_key_values.batch_repeat_interleave(copies)
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                pad_token_id=tokenizer.pad_token_id,
+                **kwargs,
+            )
+
+        return [
+            {
+                "generated_text": gen_context
+                + tokenizer.decode(sequence[len(ids) :], skip_special_tokens=True)
+            }
+            for sequence in output
+        ]
+
+    def _generation_kwargs(self, decoding: str, prompt_length: int) -> Dict[str, Any]:
+        """
+        The arguments of generate() for decoding a prompt of prompt_length tokens.
+        """
+        assert self.sentence_generator is not None
+        tokenizer = self.sentence_generator.tokenizer
+
+        kwargs: Dict[str, Any] = {
+            "max_new_tokens": self.max_new_tokens,
+            "repetition_penalty": 1.1,
+            "stopping_criteria": transformers.StoppingCriteriaList(
+                [SentenceEndCriteria(tokenizer, prompt_length)]
+            ),
+        }
+
+        num_beams = max(1, self.num_beams)
+        if decoding == GREEDY:
+            kwargs.update(do_sample=False, num_beams=1, num_return_sequences=1)
+        elif decoding == SAMPLE:
+            kwargs.update(do_sample=True, top_k=self.top_k, num_return_sequences=num_beams)
+        elif decoding == BEAM:
+            kwargs.update(do_sample=False, num_beams=num_beams, num_return_sequences=num_beams)
+        else:
+            kwargs.update(
+                do_sample=False,
+                num_beams=num_beams,
+                num_beam_groups=num_beams,
+                diversity_penalty=1.5,
+                num_return_sequences=num_beams,
+            )
+        return kwargs
+
+    def _decoding_mode(self) -> str:
+        """
+        The configured decoding, or beam search when it is unknown or not
+        available in the installed transformers.
+        """
+        if self.decoding not in (DIVERSE_BEAM, BEAM, GREEDY, SAMPLE):
+            self.logger.warning(f"Unknown decoding {self.decoding}, using {BEAM}")
+            return BEAM
+        if self.decoding == DIVERSE_BEAM and not GROUP_BEAM_SEARCH_BUILTIN:
+            self.logger.warning(
+                f"transformers {transformers.__version__} has no built-in {DIVERSE_BEAM} "
+                f"search, using {BEAM}"
+            )
+            return BEAM
+        return self.decoding
+
     def _clean_generated_text(self, gentext):
         # Just clean the generated text of all the potential rubbish
         # return re.sub(r"[<>\[\]\d\n\t]|<bos>|<eos>|bos|eos", "", gentext)
@@ -559,7 +809,9 @@ class SentenceCompletionPredictor(Predictor):
                             change_tokens
                         )
                     )
-                    phrase_emb = self.embedder.encode(change_tokens.strip())
+                    phrase_emb = self.embedding_cache.encode(
+                        self.embedder, self.sentence_transformer_model, change_tokens.strip()
+                    )
                     phrase_id = len(self.corpus_embeddings)
                     self.corpus_embeddings = numpy.vstack((self.corpus_embeddings, phrase_emb))
                     self.corpus_sentences.append(change_tokens.strip())
@@ -575,7 +827,7 @@ class SentenceCompletionPredictor(Predictor):
                             str(phrase_emb[0].shape), str(len(self.corpus_embeddings))
                         )
                     )
-                    self.index.add_items(phrase_emb, phrase_id)
+                    self._add_to_index(phrase_emb, phrase_id)
 
                     self.logger.debug(f"Saving index to:{self.index_path}")
                     self.index.save_index(self.index_path)
@@ -597,6 +849,7 @@ class SentenceCompletionPredictor(Predictor):
                                 for tox_word in self.personalized_allowed_toxicwords:
                                     fout.write(tox_word + "\n")
                                 fout.close()
+                        self._update_toxic_word_filter()
 
                 # ELSE, IF SENTENCE EXIST, ADD INTO DATABASE WITH UPDATED COUNT
                 else:
@@ -5,7 +5,6 @@ import os
 
 from tqdm import tqdm
 
-from convassist.utilities.ngram.ngram_map import NgramMap
 from convassist.utilities.ngram.ngramutil import NGramUtil
 
 from convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor import SmoothedNgramPredictor
@@ -22,6 +21,9 @@ class CannedWordPredictor(SmoothedNgramPredictor):
     def extract_svo(self, sent) -> str:
         return " ".join(self.svo_utils.extract_svo(sent))
 
+    def extract_svo_many(self, sents) -> list[str]:
+        return [" ".join(tokens) for tokens in self.svo_utils.extract_svo_many(sents)]
+
     def recreate_database(self):
         """
         Recreates the sentence and n-gram databases by adding new phrases and removing outdated ones.
@@ -30,22 +32,19 @@ class CannedWordPredictor(SmoothedNgramPredictor):
             with open(self.personalized_cannedphrases) as f:
                 phrases = f.read().splitlines()
 
-            for cardinality in range(1, self.cardinality + 1):
-
-                with NGramUtil(self.database, self.cardinality) as ngramutil:
-
-                    query = ngramutil.generate_ngram_insert_query(cardinality, False)
-
-                    data = []
-                    for phrase in tqdm(phrases, desc=f"Processing {cardinality}-grams", unit=" phrases", leave=False):
-                        ngram_map = NgramMap(cardinality, phrase)
-                        for ngram, count in ngram_map.items():
-                            data.append((*ngram, count))
-
-                    batch_size = 3000
-                    for i in tqdm(range(0, len(data), batch_size), desc=f"Inserting {cardinality}-grams", unit=" batches", leave=True):
-                        batch = data[i:i + batch_size]
-                        ngramutil.connection.execute_many(query, batch)
+            with NGramUtil(self.database, self.cardinality) as ngramutil:
+                for cardinality in tqdm(
+                    range(1, self.cardinality + 1),
+                    desc="Inserting n-grams",
+                    unit=" tables",
+                    leave=False,
+                ):
+                    # Count across all phrases first, so every n-gram is written once
+                    # with its total count. Existing n-grams are left as they are.
+                    counts = ngramutil.count_ngrams(phrases, cardinality)
+                    ngramutil.insert_ngram_counts(cardinality, counts, update_on_conflict=False)
+
+                self._rebuild_language_model(ngramutil)
 
         except Exception as e:
             self.logger.error(f"exception in creating personalized db : {e}")
@@ -1,16 +1,28 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import heapq
 import json
 import os
 import string
+import threading
 from abc import ABC
-from typing import List
+from typing import Dict, List
 
 from convassist.predictor.predictor import Predictor
 from convassist.predictor.utilities.prediction import Prediction, Suggestion
+from convassist.predictor.utilities.prefix_cache import PrefixCache
+from convassist.utilities.ngram.kneser_ney import (
+    KneserNeyModel,
+    build_language_model,
+    update_language_model,
+)
 from convassist.utilities.ngram.ngramutil import NGramUtil
 
+# values of the smoothing option
+INTERPOLATED = "interpolated"
+KNESER_NEY = "kneser_ney"
+
 
 class SmoothedNgramPredictor(Predictor):
     """
@@ -23,15 +35,41 @@ class SmoothedNgramPredictor(Predictor):
         return os.path.join(self._personalized_resources_path, self._startwords)
 
     def configure(self) -> None:
+        # candidates of the word being typed, reused while it is typed
+        self.prefix_cache = PrefixCache(self.prefix_cache_rows)
+
+        # learning only marks the Kneser-Ney model stale and records the
+        # histories it learned n-grams after; a timer updates the model for
+        # them once learning has paused for lm_rebuild_delay seconds
+        self._lm_timer_lock = threading.Lock()
+        self._lm_build_lock = threading.Lock()
+        self._lm_timer: threading.Timer | None = None
+        self._lm_stale = False
+        self._lm_rebuild = False
+        self._lm_histories: List[set] = [set() for _ in range(self.cardinality)]
+        self._has_language_model = False
+
         with NGramUtil(self.database, self.cardinality) as ngramutil:
             try:
-                ngramutil.create_update_ngram_tables()
+                ngramutil.create_update_ngram_tables(self.ngram_schema)
+
+                if self.smoothing == KNESER_NEY:
+                    if not ngramutil.lm_order:
+                        self._rebuild_language_model(ngramutil, automatic=True)
+                    elif ngramutil.lm_stale:
+                        # learned from before the last update could run, what
+                        # was learned is not known, so the model is rebuilt
+                        self._schedule_language_model_update()
+                    self._has_language_model = bool(ngramutil.lm_order)
 
             except Exception as e:
                 self.logger.error(f"Error creating ngram tables: {e}")
 
     def extract_svo(self, sent):
         return sent
+
+    def extract_svo_many(self, sents: List[str]) -> List[str]:
+        return [self.extract_svo(sent) for sent in sents]
     
     def get_frequent_start_words(self, max_count=10) -> Prediction:
         word_predictions = Prediction()
@@ -57,7 +95,6 @@ class SmoothedNgramPredictor(Predictor):
 
         # get self.cardinality tokens from the context tracker
         actual_tokens, tokens = self.context_tracker.get_tokens(self.cardinality)
-        prefix_completion_candidates: List[str] = []
 
         if actual_tokens == 0:
             self.logger.info(
@@ -67,70 +104,12 @@ class SmoothedNgramPredictor(Predictor):
 
         else:
             self.logger.debug(f"Actual tokens: {actual_tokens}, tokens: {tokens}")
-            try:
-                partial = None
-                prefix_ngram = None
-
-                for ngram_len in range(actual_tokens, 0, -1):
-                    if len(prefix_completion_candidates) >= max_partial_prediction_size:
-                        break
-
-                    with NGramUtil(self.database, ngram_len) as ngramutil:
-
-                        if ngram_len:
-                            prefix_ngram = tokens[-(ngram_len):]
-                        else:
-                            # just get the last token
-                            prefix_ngram = tokens[-1:]
-
-                        if prefix_ngram:
-                            try:
-                                partial = ngramutil.fetch_like(
-                                    prefix_ngram,
-                                    max_partial_prediction_size - len(prefix_completion_candidates),
-                                )
-                            except Exception as e:
-                                self.logger.error(f"Error fetching ngrams for {prefix_ngram}: {e}")
-                                continue
-                        for p in partial:
-                            prefix_completion_candidates.append(p[-2])
-
-                        # smoothing
-                        unigram_counts_sum = ngramutil.unigram_counts_sum()
-
-                        candidate_tokens = prefix_ngram.copy()
-
-                        for j, candidate in enumerate(prefix_completion_candidates):
-                            candidate_tokens[-1] = candidate
-                            probability = 0.0
-                            for k in range(len(candidate_tokens)):
-                                numerator = ngramutil.count(candidate_tokens, 0, k + 1)
-
-                                denominator = unigram_counts_sum
-                                if numerator > 0:
-                                    denominator = ngramutil.count(candidate_tokens, -1, k)
-                                frequency = 0
-                                if denominator > 0:
-                                    frequency = float(numerator) / denominator
-                                probability += float(self.deltas[k]) * frequency
-                            if probability > 0:
-                                if all(
-                                    char in string.punctuation
-                                    for char in candidate_tokens[ngram_len - 1]
-                                ):
-                                    self.logger.debug(
-                                        candidate_tokens[ngram_len - 1] + " contains punctuations "
-                                    )
-                                else:
-                                    word_prediction.add_suggestion(
-                                        Suggestion(
-                                            candidate_tokens[ngram_len - 1],
-                                            probability,
-                                            self.predictor_name,
-                                        )
-                                    )
-            except Exception as e:
-                self.logger.error(f"Exception in {self.predictor_name} predict function: {e}")
+            if self.smoothing == KNESER_NEY and self._has_language_model:
+                word_prediction = self._predict_kneser_ney(tokens, max_partial_prediction_size)
+            else:
+                word_prediction = self._predict_interpolated(
+                    actual_tokens, tokens, max_partial_prediction_size
+                )
 
             self.logger.info(
                 f"End prediction. got {len(word_prediction)} word suggestions and {len(sentence_prediction)} sentence suggestions"
@@ -138,20 +117,261 @@ class SmoothedNgramPredictor(Predictor):
 
         return sentence_prediction, word_prediction
 
+    def _predict_interpolated(
+        self, actual_tokens: int, tokens: List[str], max_partial_prediction_size: int
+    ) -> Prediction:
+        """
+        Scores candidates by interpolating the relative frequencies of every
+        cardinality with the configured deltas.
+        """
+        word_prediction = Prediction()
+
+        try:
+            with NGramUtil(self.database, actual_tokens) as ngramutil:
+                candidates = self._gather_candidates(
+                    ngramutil, tokens, actual_tokens, max_partial_prediction_size
+                )
+                scores = self._interpolated_scores(ngramutil, tokens, candidates)
+
+            best = heapq.nlargest(
+                max_partial_prediction_size, scores.items(), key=lambda item: item[1]
+            )
+            for candidate, probability in best:
+                if probability > 0:
+                    word_prediction.add_suggestion(
+                        Suggestion(candidate, probability, self.predictor_name)
+                    )
+        except Exception as e:
+            self.logger.error(f"Exception in {self.predictor_name} predict function: {e}")
+
+        return word_prediction
+
+    def _gather_candidates(
+        self, ngramutil: NGramUtil, tokens: List[str], actual_tokens: int, limit: int
+    ) -> List[str]:
+        """
+        Collects the words completing the last token after every length of
+        context, longest first, without duplicates.
+        """
+        candidates: Dict[str, None] = {}
+        for ngram_len in range(actual_tokens, 0, -1):
+            prefix_ngram = tokens[-ngram_len:]
+            try:
+                partial = self.prefix_cache.fetch_like(ngramutil.fetch_like, prefix_ngram, limit)
+            except Exception as e:
+                self.logger.error(f"Error fetching ngrams for {prefix_ngram}: {e}")
+                continue
+
+            for word, _ in partial:
+                if all(char in string.punctuation for char in word):
+                    self.logger.debug(word + " contains punctuations ")
+                else:
+                    candidates.setdefault(word)
+
+        return list(candidates)
+
+    def _interpolated_scores(
+        self, ngramutil: NGramUtil, tokens: List[str], candidates: List[str]
+    ) -> Dict[str, float]:
+        """
+        Scores every candidate once, in place of the last token, with the full
+        context. The counts for each cardinality are fetched for all candidates
+        in one query, and only for candidates not scored after this context yet.
+        """
+        history = tokens[:-1]
+        cached_scores = self.prefix_cache.scores(history)
+        pending = [candidate for candidate in candidates if candidate not in cached_scores]
+        if not pending:
+            return {candidate: cached_scores[candidate] for candidate in candidates}
+
+        scores = dict.fromkeys(pending, 0.0)
+
+        for k in range(len(tokens)):
+            context = history[len(history) - k :] if k else []
+            numerators = ngramutil.count_many(context, pending)
+            if not numerators:
+                continue
+
+            # the count of the context, or the unigram counts sum for k == 0
+            denominator = ngramutil.count(tokens, -1, k)
+            if denominator <= 0:
+                continue
+
+            for candidate, numerator in numerators.items():
+                if numerator > 0:
+                    scores[candidate] += float(self.deltas[k]) * numerator / denominator
+
+        cached_scores.update(scores)
+        return {candidate: cached_scores[candidate] for candidate in candidates}
+
+    def _predict_kneser_ney(
+        self, tokens: List[str], max_partial_prediction_size: int
+    ) -> Prediction:
+        """
+        Scores candidates with the Kneser-Ney model precomputed in the database.
+        """
+        word_prediction = Prediction()
+
+        try:
+            with NGramUtil(self.database, self.cardinality) as ngramutil:
+                model = KneserNeyModel(ngramutil, self.cardinality)
+                history, prefix = tokens[:-1], tokens[-1]
+
+                def fetch_lm_like(ngram, limit):
+                    return self.prefix_cache.fetch_like(
+                        ngramutil.fetch_lm_like, ngram, limit, kind="lm"
+                    )
+
+                candidates = [
+                    candidate
+                    for candidate in model.candidates(
+                        history, prefix, max_partial_prediction_size, fetch_lm_like
+                    )
+                    if not all(char in string.punctuation for char in candidate)
+                ]
+
+                cached_scores = self.prefix_cache.scores(history)
+                pending = [candidate for candidate in candidates if candidate not in cached_scores]
+                cached_scores.update(model.score(history, pending))
+                scores = {candidate: cached_scores[candidate] for candidate in candidates}
+
+            best = heapq.nlargest(
+                max_partial_prediction_size, scores.items(), key=lambda item: item[1]
+            )
+            for candidate, score in best:
+                word_prediction.add_suggestion(
+                    Suggestion(candidate, 10**score, self.predictor_name)
+                )
+        except Exception as e:
+            self.logger.error(f"Exception in {self.predictor_name} predict function: {e}")
+
+        return word_prediction
+
+    def _rebuild_language_model(self, ngramutil: NGramUtil, automatic: bool = False):
+        if self.smoothing == KNESER_NEY:
+            if ngramutil.lm_source.startswith("arpa"):
+                # imported models have no counts to rebuild them from
+                return
+
+            size_mb = os.path.getsize(self.database) / 2**20
+            if automatic and 0 < self.lm_rebuild_max_mb < size_mb:
+                self.logger.warning(
+                    f"Not rebuilding the language model of {self.database}: the database "
+                    f"is over lm_rebuild_max_mb ({self.lm_rebuild_max_mb} MB). "
+                    "Call rebuild_language_model() or import an ARPA model to build it."
+                )
+                return
+
+            self.logger.debug(f"Rebuilding the language model of {self.database}")
+            build_language_model(ngramutil, self.cardinality)
+            self._has_language_model = True
+        # the cached rows came from the previous model
+        with self.lock:
+            self.prefix_cache.clear()
+
+    def _schedule_language_model_update(self, phrases: List[str] | None = None):
+        """
+        Marks the language model stale and (re)starts the timer that updates
+        it, so a burst of learning is followed by a single update.  The model
+        is updated for the histories of the n-grams of the learned phrases, or
+        rebuilt if they are not given.
+        """
+        histories = []
+        if phrases is not None:
+            histories = [
+                {ngram[:-1] for ngram in NGramUtil.count_ngrams(phrases, cardinality)}
+                for cardinality in range(1, self.cardinality + 1)
+            ]
+
+        with self._lm_timer_lock:
+            self._lm_stale = True
+            if phrases is None:
+                self._lm_rebuild = True
+            for learned, new in zip(self._lm_histories, histories):
+                learned.update(new)
+
+            if self._lm_timer is not None:
+                self._lm_timer.cancel()
+            self._lm_timer = threading.Timer(self.lm_rebuild_delay, self.update_language_model)
+            self._lm_timer.name = f"{self.predictor_name}-lm-rebuild"
+            self._lm_timer.daemon = True
+            self._lm_timer.start()
+
+    def _take_language_model_changes(self) -> tuple[bool, List[set]]:
+        # what learning changed since the last update, and whether there was any
+        with self._lm_timer_lock:
+            stale, histories = self._lm_stale, self._lm_histories
+            rebuild = self._lm_rebuild
+            self._lm_stale = False
+            self._lm_rebuild = False
+            self._lm_histories = [set() for _ in range(self.cardinality)]
+            if self._lm_timer is not None:
+                self._lm_timer.cancel()
+                self._lm_timer = None
+
+        # rebuilding: what was learned is not (all) known
+        return stale, [] if rebuild else histories
+
+    def update_language_model(self):
+        """
+        Updates the language model if learning made it stale, re-estimating
+        only the contexts of the learned n-grams (see
+        kneser_ney.update_language_model).  The model is rebuilt from all the
+        counts instead if what was learned is not known, as after a restart,
+        unless the database is over lm_rebuild_max_mb.  Predictions use the
+        previous model until the new one is stored.
+        """
+        with self._lm_build_lock:
+            stale, histories = self._take_language_model_changes()
+            if not stale:
+                return
+
+            try:
+                with NGramUtil(self.database, self.cardinality) as ngramutil:
+                    if histories and update_language_model(ngramutil, histories):
+                        self.logger.debug(f"Updated the language model of {self.database}")
+                        with self.lock:
+                            self.prefix_cache.clear()
+                    else:
+                        self._rebuild_language_model(ngramutil, automatic=True)
+            except Exception as e:
+                self.logger.error(f"Exception updating the language model of {self.database}: {e}")
+
+    def rebuild_language_model(self):
+        """
+        Rebuilds the language model from all the n-gram counts, however large
+        the database, which folds the drift of the updates after learning back
+        into the model.
+        """
+        with self._lm_build_lock:
+            self._take_language_model_changes()
+            try:
+                with NGramUtil(self.database, self.cardinality) as ngramutil:
+                    self._rebuild_language_model(ngramutil)
+            except Exception as e:
+                self.logger.error(
+                    f"Exception rebuilding the language model of {self.database}: {e}"
+                )
+
     def learn(self, phrase):
-        # build up ngram map for all cardinalities
-        # i.e. learn all ngrams and counts in memory
+        self.learn_many([phrase])
+
+    def learn_many(self, phrases: List[str]):
+        # count the ngrams of all phrases for all cardinalities in memory,
+        # then write them; the language model is rebuilt later, in the background
         if self.learn_enabled:
             with NGramUtil(self.database, self.cardinality) as ngramutil:
                 try:
+                    table = str.maketrans("", "", string.punctuation)
+                    phrases = [phrase.lower().translate(table) for phrase in phrases]
+                    phrases = self.extract_svo_many(phrases)
+                    self.logger.debug(f"learning ... {phrases}")
 
-                    phrase = phrase.lower().translate(str.maketrans("", "", string.punctuation))
-                    phrase = self.extract_svo(phrase)
-                    self.logger.debug(f"learning ... {phrase}")
-
-                    ngramutil.learn(phrase)
+                    ngramutil.update(phrases_toAdd=phrases, update_on_conflict=True)
+                    self.prefix_cache.clear()
+                    if self.smoothing == KNESER_NEY and ngramutil.lm_source == KNESER_NEY:
+                        ngramutil.mark_lm_stale()
+                        self._schedule_language_model_update(phrases)
 
                 except Exception as e:
                     self.logger.error(f"{self.predictor_name} learn function: {e}")
-
-        pass
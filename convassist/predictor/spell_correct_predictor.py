@@ -1,9 +1,6 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-# from spellchecker import SpellChecker
-from spellchecker import SpellChecker
-
 from convassist.predictor.predictor import Predictor
 from convassist.predictor.utilities.prediction import Prediction, Suggestion
 
@@ -15,7 +12,7 @@ class SpellCorrectPredictor(Predictor):
     for the last token in the context.
     Methods:
         configure():
-            Placeholder method for configuration. Currently does nothing.
+            Loads the spell checker's word frequency list.
         predict(max_partial_prediction_size=None, filter=None):
             Generates spell correction suggestions for the last token in the context.
             Args:
@@ -33,7 +30,10 @@ class SpellCorrectPredictor(Predictor):
     """
 
     def configure(self):
-        pass
+        from spellchecker import SpellChecker
+
+        # Loading the frequency list is the expensive part, so do it once.
+        self.spell = SpellChecker()
 
     def predict(self, max_partial_prediction_size=None, filter=None):
         token = self.context_tracker.get_last_token()
@@ -41,11 +41,10 @@ class SpellCorrectPredictor(Predictor):
         word_predictions = Prediction()
 
         if token:
-            spell = SpellChecker()
-            suggestions = spell.candidates(token)
+            suggestions = self.spell.candidates(token)
             if suggestions:
                 for suggestion in suggestions:
-                    prob = spell.word_usage_frequency(suggestion)
+                    prob = self.spell.word_usage_frequency(suggestion)
                     word_predictions.add_suggestion(
                         Suggestion(suggestion, prob, self.predictor_name)
                     )
@@ -0,0 +1,148 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+from collections import OrderedDict
+
+import numpy
+
+from convassist.utilities.singleton import Singleton
+
+
+class EmbeddingCache(metaclass=Singleton):
+    """
+    A bounded, thread-safe LRU cache of sentence embeddings shared by all predictors.
+
+    Entries are keyed on (model name, normalized text) so that predictors using
+    different SentenceTransformer models never see each other's vectors.  The cache
+    is bounded both by the number of entries and by the memory held by the cached
+    arrays; the least recently used entries are evicted first.
+
+    A max_entries of 0 disables caching and passes every call through to the model.
+
+    Being a singleton, the cache is only created with the limits given to the first
+    call; predictors configure it through reserve() instead.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_mb: int = 32):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], numpy.ndarray] = OrderedDict()
+        self._nbytes = 0
+        self._reserved = (0, 0)
+        self.hits = 0
+        self.misses = 0
+        self.resize(max_entries, max_mb)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resize(self, max_entries: int, max_mb: int):
+        with self._lock:
+            self._set_limits(max_entries, max_mb)
+
+    def reserve(self, max_entries: int, max_mb: int):
+        """
+        Sets the limits to the largest reserved so far, so that the cache is as
+        large as the most demanding of the predictors sharing it.
+        """
+        with self._lock:
+            self._reserved = (
+                max(self._reserved[0], int(max_entries)),
+                max(self._reserved[1], int(max_mb)),
+            )
+            self._set_limits(*self._reserved)
+
+    def _set_limits(self, max_entries: int, max_mb: int):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_mb)) * 1024 * 1024
+        self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Collapsing whitespace does not change what the tokenizer sees, but it lets
+        # "i am " and "i am" share an entry.
+        return " ".join(text.split())
+
+    def get(self, model_name: str, text: str) -> numpy.ndarray | None:
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: numpy.ndarray):
+        if self.max_entries == 0:
+            return
+
+        key = (model_name, self.normalize(text))
+        embedding = numpy.array(embedding, copy=True)
+        # cached arrays are handed out to every caller, so they must not be modified
+        embedding.setflags(write=False)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[key] = embedding
+            self._nbytes += embedding.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._nbytes > self.max_bytes
+        ):
+            _, embedding = self._entries.popitem(last=False)
+            self._nbytes -= embedding.nbytes
+
+    def encode(self, embedder, model_name: str, sentences: str | list[str]) -> numpy.ndarray:
+        """
+        Encodes sentences with embedder, only running the model for texts not cached.
+
+        Args:
+            embedder: the SentenceTransformer (or compatible) model used on a miss
+            model_name: str: name of the model, used as part of the cache key
+            sentences: str | list[str]: a single sentence or a list of sentences
+        Returns:
+            numpy.ndarray: a single embedding for a str, or one row per sentence
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if self.max_entries == 0:
+            return embedder.encode(sentences, convert_to_numpy=True)
+
+        results = [self.get(model_name, text) for text in texts]
+
+        # Encode every distinct missing text once, in a single batch
+        missing = list(
+            dict.fromkeys(
+                self.normalize(text) for text, result in zip(texts, results) if result is None
+            )
+        )
+        if missing:
+            embeddings = embedder.encode(missing, convert_to_numpy=True)
+            encoded = dict(zip(missing, embeddings))
+            for text, embedding in encoded.items():
+                self.put(model_name, text, embedding)
+
+            results = [
+                encoded[self.normalize(text)] if result is None else result
+                for text, result in zip(texts, results)
+            ]
+
+        if single:
+            return results[0]
+        return numpy.vstack(results) if results else numpy.empty((0, 0), dtype=numpy.float32)
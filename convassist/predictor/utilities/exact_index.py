@@ -0,0 +1,73 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from typing import Iterable, Tuple
+
+import numpy
+
+
+class ExactIndex:
+    """
+    Exact nearest neighbour search by cosine distance, with the methods of
+    hnswlib.Index the predictors use.
+
+    The embeddings are kept as the rows of a normalized float32 matrix, so a
+    query is one matrix-vector product followed by an argpartition for the k
+    best rows.  For a few thousand embeddings this is as fast as an HNSW
+    search, never misses a neighbour, and there is no index to build or save.
+    """
+
+    def __init__(self, dim: int, embeddings=None):
+        self.dim = dim
+        self._vectors = numpy.empty((0, dim), dtype=numpy.float32)
+        self._labels = numpy.empty(0, dtype=numpy.uint64)
+        if embeddings is not None and len(embeddings):
+            self.add_items(embeddings)
+
+    def _normalize(self, embeddings) -> numpy.ndarray:
+        vectors = numpy.atleast_2d(numpy.asarray(embeddings, dtype=numpy.float32))
+        norms = numpy.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / numpy.where(norms == 0, 1, norms)
+
+    def get_current_count(self) -> int:
+        return len(self._labels)
+
+    def add_items(self, data, ids: int | Iterable[int] | None = None):
+        """
+        Adds the embeddings in data, labelled with ids, or with their
+        positions in the index if ids is None.
+        """
+        vectors = self._normalize(data)
+        if ids is None:
+            start = len(self._labels)
+            labels = numpy.arange(start, start + len(vectors), dtype=numpy.uint64)
+        else:
+            labels = numpy.atleast_1d(numpy.asarray(ids, dtype=numpy.uint64))
+
+        # labels first: a query never finds a row without its label
+        self._labels = numpy.concatenate((self._labels, labels))
+        self._vectors = numpy.vstack((self._vectors, vectors))
+
+    def knn_query(self, data, k: int = 1) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Returns the labels of the k nearest embeddings of every query in data
+        and their cosine distances, nearest first, as hnswlib does.  Fewer than
+        k are returned when the index holds fewer embeddings.
+        """
+        queries = self._normalize(data)
+        k = min(k, len(self._labels))
+        if k == 0:
+            return (
+                numpy.empty((len(queries), 0), dtype=numpy.uint64),
+                numpy.empty((len(queries), 0), dtype=numpy.float32),
+            )
+
+        similarities = queries @ self._vectors.T
+        nearest = numpy.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        nearest_similarities = numpy.take_along_axis(similarities, nearest, axis=1)
+
+        order = numpy.argsort(-nearest_similarities, axis=1)
+        nearest = numpy.take_along_axis(nearest, order, axis=1)
+        nearest_similarities = numpy.take_along_axis(nearest_similarities, order, axis=1)
+
+        return self._labels[nearest], 1 - nearest_similarities
@@ -11,13 +11,16 @@ class NLP(metaclass=Singleton):
         self.path = path
         self.nlp = self.load_nlp()
 
+    # Pipeline components no caller uses; not loading them saves startup time and memory
+    EXCLUDE = ["ner", "lemmatizer"]
+
     def load_nlp(self):
         nlp_model = "en_core_web_sm"
 
         try:
             if not spacy.util.is_package(nlp_model):
                 download(nlp_model)
-            nlp = spacy.load(nlp_model)
+            nlp = spacy.load(nlp_model, exclude=self.EXCLUDE)
             return nlp
         except Exception as e:
             raise RuntimeError(f"Failed to load spaCy model '{nlp_model}': {e}")
@@ -0,0 +1,92 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from convassist.utilities.ngram.ngramutil import ascii_lower
+
+Rows = List[Tuple[str, int]]
+
+
+class PrefixCache:
+    """
+    Remembers the candidates fetched for the word being typed, so that the
+    next keystrokes of the same word can be answered without the database.
+
+    For every n-gram order the last (history, prefix) query is kept with up to
+    `rows` of its (word, count) rows, best first.  When the user types one more
+    letter, the new candidates are the kept rows that start with the longer
+    prefix, ignoring the case of ASCII letters as the database does.  The
+    database is only queried again when the history changes, the prefix does
+    not extend the kept one, or the kept rows were truncated and too few of
+    them match.
+
+    The scores of the words already seen after the current history are kept as
+    well; they do not depend on the prefix.
+
+    A rows of 0 disables caching.
+    """
+
+    def __init__(self, rows: int = 256):
+        self.rows = max(0, int(rows))
+        # order -> (history, prefix, rows, complete)
+        self._entries: Dict[Tuple[str, int], Tuple[tuple, str, Rows, bool]] = {}
+        self._history: Optional[tuple] = None
+        self._scores: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """Forgets everything, e.g. after the database was written to."""
+        self._entries.clear()
+        self._history = None
+        self._scores = {}
+
+    def fetch_like(
+        self, fetch: Callable[[list, int], Rows], ngram: List[str], limit: int, kind: str = "ngram"
+    ) -> Rows:
+        """
+        Returns fetch(ngram, limit), the rows of the words completing the last
+        token of ngram after the tokens before it, from memory when possible.
+
+        Args:
+            fetch: the query to run on a miss, e.g. NGramUtil.fetch_like
+            ngram: the history followed by the prefix of the word being typed
+            limit: the number of rows to return, -1 for all
+            kind: keeps the rows of different queries on the same orders apart
+        """
+        if not self.rows:
+            return fetch(ngram, limit)
+
+        history, prefix = tuple(ngram[:-1]), ngram[-1]
+        key = (kind, len(ngram))
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            cached_history, cached_prefix, cached_rows, complete = entry
+            lowered = ascii_lower(prefix)
+            if cached_history == history and lowered.startswith(ascii_lower(cached_prefix)):
+                rows = [row for row in cached_rows if ascii_lower(row[0]).startswith(lowered)]
+                if complete or (limit >= 0 and len(rows) >= limit):
+                    self.hits += 1
+                    return rows if limit < 0 else rows[:limit]
+
+        self.misses += 1
+        # fetch more than asked for, so that longer prefixes can be filtered from it
+        size = -1 if limit < 0 else max(limit, self.rows)
+        rows = list(fetch(ngram, size))
+        complete = size < 0 or len(rows) < size
+        self._entries[key] = (history, prefix, rows, complete)
+
+        return rows if limit < 0 else rows[:limit]
+
+    def scores(self, history: List[str]) -> Dict[str, float]:
+        """
+        The scores of the words already seen after history.  The returned dict
+        is the cache itself; callers add the scores they compute to it.
+        """
+        history_key = tuple(history)
+        if history_key != self._history:
+            self._history = history_key
+            self._scores = {}
+        return self._scores
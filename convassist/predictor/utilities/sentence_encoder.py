@@ -0,0 +1,210 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+from convassist.predictor.utilities.cpu_inference import quantize_int8
+from convassist.utilities.logging_utility import LoggingUtility
+from convassist.utilities.singleton import Singleton
+
+# values of the encoder_backend option
+TORCH = "torch"
+ONNX = "onnx"
+
+# arguments of SentenceTransformer that only change where a model is loaded
+# from, not the model, so they are left out of the registry's keys
+SOURCE_KWARGS = frozenset({"local_files_only", "cache_folder", "token"})
+
+
+def _freeze(value):
+    """A hashable copy of value, with the items of dicts sorted by key."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class SentenceEncoder:
+    """
+    A thread-safe wrapper around a SentenceTransformer model.
+
+    One SentenceEncoder is shared by every predictor (and every ConvAssist instance)
+    that uses the same model on the same device, so calls into the model are
+    serialized with a lock.
+
+    With quantize set, the model's Linear layers are quantized to int8 if
+    torchao is installed; this only applies to PyTorch on the CPU.
+
+    With the onnx backend, the model is exported to ONNX once, into export_dir,
+    and then run with onnxruntime on the CPU.  Its embeddings are the same as
+    PyTorch's.  If onnxruntime is not installed (pip install
+    sentence-transformers[onnx]) or the model cannot be exported, the encoder
+    falls back to PyTorch; backend tells which one is used.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str,
+        quantize: bool = False,
+        backend: str = TORCH,
+        export_dir: str | None = None,
+        **kwargs,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.logger = LoggingUtility().get_logger(
+            "SentenceEncoder", log_level=logging.DEBUG, queue_handler=True
+        )
+        self._lock = threading.Lock()
+
+        self.model: SentenceTransformer | None = None
+        self.backend = TORCH
+        self.quantized = False
+        if backend == ONNX and device == "cpu":
+            self.model = self._load_onnx(export_dir, **kwargs)
+
+        if self.model is None:
+            self.model = SentenceTransformer(model_name, device=device, **kwargs)
+            if quantize and device == "cpu":
+                self.quantized = quantize_int8(self.model, self.logger)
+
+    def export_path(self, export_dir: str) -> str:
+        """The directory the ONNX export of the model is kept in."""
+        name = os.path.basename(os.path.normpath(self.model_name))
+        return os.path.join(export_dir, f"{name}-onnx")
+
+    def _load_onnx(self, export_dir: str | None, **kwargs) -> SentenceTransformer | None:
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        path = self.export_path(export_dir) if export_dir else None
+        try:
+            if path and os.path.isdir(path):
+                self.logger.debug(f"Loading the ONNX export of {self.model_name} from {path}")
+                model = SentenceTransformer(
+                    path, device="cpu", backend=ONNX, model_kwargs=model_kwargs, **kwargs
+                )
+            else:
+                self.logger.info(f"Exporting {self.model_name} to ONNX")
+                model = SentenceTransformer(
+                    self.model_name,
+                    device="cpu",
+                    backend=ONNX,
+                    model_kwargs=model_kwargs,
+                    **kwargs,
+                )
+                if path:
+                    self._save_export(model, path)
+        except Exception as e:
+            self.logger.warning(
+                f"Cannot run {self.model_name} with onnxruntime, using PyTorch: {e}"
+            )
+            return None
+
+        self.backend = ONNX
+        return model
+
+    def _save_export(self, model: SentenceTransformer, path: str):
+        # Saved to a temporary directory that is then renamed, so an interrupted
+        # save never leaves a partial export at path for later starts to load.
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        temp_path = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}-", dir=parent)
+        try:
+            model.save_pretrained(temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # includes another process having saved its export first
+            self.logger.warning(f"Cannot save the ONNX export of {self.model_name}: {e}")
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    def encode(self, sentences, **kwargs):
+        with self._lock, torch.inference_mode():
+            return self.model.encode(sentences, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int | None:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class SentenceEncoderRegistry(metaclass=Singleton):
+    """
+    Process-wide registry of SentenceEncoders keyed on (model name, device,
+    quantize, backend, export directory) and the other arguments of
+    SentenceTransformer, but for those in SOURCE_KWARGS.
+
+    Models are loaded on first request and then handed out to every caller that
+    asks for the same model, so their weights are only held in memory once.
+    Each model is loaded under its own lock, so loading (or exporting) one
+    model does not hold up callers asking for another.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encoders: dict[tuple, SentenceEncoder] = {}
+        self._loading: dict[tuple, threading.Lock] = {}
+
+    def get_encoder(
+        self,
+        model_name: str,
+        device: str,
+        quantize: bool = False,
+        backend: str = TORCH,
+        export_dir: str | None = None,
+        **kwargs,
+    ) -> SentenceEncoder:
+        """
+        Returns the shared encoder for model_name on device, loading it if needed.
+
+        Args:
+            model_name: str: name or path of the SentenceTransformer model
+            device: str: torch device to run the model on
+            quantize: bool: quantize the model's Linear layers to int8 (PyTorch on CPU only)
+            backend: str: "torch", or "onnx" to run the model with onnxruntime on the CPU
+            export_dir: str: directory to keep the ONNX export of the model in
+            kwargs: extra arguments passed to SentenceTransformer, e.g. tokenizer_kwargs
+        Returns:
+            SentenceEncoder: the shared encoder
+        """
+        if device != "cpu":
+            # both only apply on the CPU
+            quantize, backend = False, TORCH
+        elif backend == ONNX:
+            # onnxruntime runs the fp32 export
+            quantize = False
+        if backend != ONNX:
+            export_dir = None
+        model_kwargs = {name: value for name, value in kwargs.items() if name not in SOURCE_KWARGS}
+        key = (str(model_name), device, quantize, backend, export_dir, _freeze(model_kwargs))
+
+        with self._lock:
+            encoder = self._encoders.get(key)
+            if encoder is not None:
+                return encoder
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                encoder = self._encoders.get(key)
+            if encoder is None:
+                encoder = SentenceEncoder(
+                    str(model_name), device, quantize, backend, export_dir, **kwargs
+                )
+                with self._lock:
+                    self._encoders[key] = encoder
+                    self._loading.pop(key, None)
+            return encoder
+
+    def __len__(self):
+        return len(self._encoders)
+
+    def clear(self):
+        with self._lock:
+            self._encoders.clear()
@@ -0,0 +1,37 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import functools
+from typing import FrozenSet, Iterable
+
+from nltk import word_tokenize
+from nltk.stem.porter import PorterStemmer
+
+from convassist.utilities.singleton import Singleton
+
+
+class Stemmer(metaclass=Singleton):
+    """
+    A Porter stemmer shared by all predictors.
+
+    Stemming the same words over and over is the bulk of the work of comparing
+    sentences by their stems, so the stems of words and the stem sets of texts
+    are memoized in bounded LRU caches.
+    """
+
+    def __init__(self, max_words: int = 65536, max_texts: int = 4096):
+        self._stemmer = PorterStemmer()
+        self.stem = functools.lru_cache(maxsize=max_words)(self._stemmer.stem)
+        self.text_stems = functools.lru_cache(maxsize=max_texts)(self._text_stems)
+
+    def stems(self, words: Iterable[str]) -> FrozenSet[str]:
+        """The set of the stems of words."""
+        return frozenset(self.stem(word) for word in words)
+
+    def _text_stems(self, text: str) -> FrozenSet[str]:
+        """The set of the stems of the words of text."""
+        return self.stems(word_tokenize(text))
+
+    def clear(self):
+        self.stem.cache_clear()
+        self.text_stems.cache_clear()
@@ -1,4 +1,7 @@
 
+import threading
+from collections import OrderedDict
+
 from convassist.predictor.utilities.nlp import NLP
 
 
@@ -17,16 +20,55 @@ class SVOUtil:
 
     SUBJECT_DEPS = {"nsubj", "nsubjpass", "csubj", "agent", "expl"}
 
-    def __init__(self, stopwordsFile, nlp_path=""):
+    # The pipeline components SVO extraction needs: the tagger sets tag_, the
+    # attribute ruler maps it to pos_ and the parser sets dep_ and head.
+    PIPES = {"tok2vec", "tagger", "attribute_ruler", "parser"}
+
+    def __init__(self, stopwordsFile, nlp_path="", cache_size: int = 4096):
         self.nlp = NLP(nlp_path).get_nlp()
 
-        self.stopwords = []
         with open(stopwordsFile) as f:
-            self.stopwords = f.read().splitlines()
-            self.stopwords = [word.strip() for word in self.stopwords]
+            self.stopwords = frozenset(word.strip() for word in f.read().splitlines())
+
+        # LRU cache of the tokens extracted from each sentence; 0 disables it
+        self.cache_size = max(0, int(cache_size))
+        self._cache: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self._lock = threading.Lock()
 
     def extract_svo(self, sent) -> list[str]:
-        doc = self.nlp(sent)
+        return self.extract_svo_many([sent])[0]
+
+    def extract_svo_many(self, sents: list[str], batch_size: int = 64) -> list[list[str]]:
+        """
+        Extracts the important tokens of many sentences, running them through
+        the spaCy pipeline in batches and with the components SVO extraction
+        doesn't use disabled.  Only sentences that are not cached are parsed,
+        each of them once.
+        """
+        results: dict[str, tuple[str, ...]] = {}
+        with self._lock:
+            for sent in sents:
+                tokens = self._cache.get(sent)
+                if tokens is not None:
+                    self._cache.move_to_end(sent)
+                    results[sent] = tokens
+
+        missing = [sent for sent in dict.fromkeys(sents) if sent not in results]
+        if missing:
+            disable = [name for name in self.nlp.pipe_names if name not in self.PIPES]
+            docs = self.nlp.pipe(missing, batch_size=batch_size, disable=disable)
+            for sent, doc in zip(missing, docs):
+                results[sent] = tuple(self._svo_tokens(doc))
+
+            with self._lock:
+                for sent in missing:
+                    self._cache[sent] = results[sent]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [list(results[sent]) for sent in sents]
+
+    def _svo_tokens(self, doc) -> list[str]:
         sub = []
         at = []
         ve = []
@@ -0,0 +1,48 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from typing import Dict, Iterable, List, Tuple
+
+
+class ToxicWordFilter:
+    """
+    Finds blocked words and phrases in a text.
+
+    The effective blocklist, the blocked entries minus the allowed ones, is
+    computed once when the filter is built.  Single words are looked up in a
+    frozenset; multi-word phrases are indexed on their first word, so a text is
+    checked in a single pass over its words.  Entries are matched on whole,
+    lowercased words.
+    """
+
+    def __init__(self, blocked: Iterable[str], allowed: Iterable[str] = ()):
+        allowed_entries = {self._normalize(entry) for entry in allowed}
+        entries = {self._normalize(entry) for entry in blocked} - allowed_entries
+        entries.discard("")
+
+        self.words = frozenset(entry for entry in entries if " " not in entry)
+        self.phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        for entry in sorted(entries - self.words):
+            phrase = tuple(entry.split(" "))
+            self.phrases.setdefault(phrase[0], []).append(phrase)
+
+    def __len__(self):
+        return len(self.words) + sum(len(phrases) for phrases in self.phrases.values())
+
+    @staticmethod
+    def _normalize(entry: str) -> str:
+        return " ".join(entry.lower().split())
+
+    def find(self, text: str) -> List[str]:
+        """Returns the blocked words and phrases in text, in the order they first appear."""
+        tokens = text.lower().split()
+        found: Dict[str, None] = {}
+
+        for index, token in enumerate(tokens):
+            if token in self.words:
+                found.setdefault(token)
+            for phrase in self.phrases.get(token, ()):
+                if tuple(tokens[index : index + len(phrase)]) == phrase:
+                    found.setdefault(" ".join(phrase))
+
+        return list(found)
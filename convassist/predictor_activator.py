@@ -7,10 +7,12 @@ from configparser import ConfigParser
 from convassist.predictor_registry import PredictorRegistry
 
 from convassist.combiner.meritocrity_combiner import MeritocracyCombiner
-from convassist.predictor.spell_correct_predictor import SpellCorrectPredictor
 from convassist.predictor.utilities.prediction import UnknownCombinerException
 from convassist.utilities.logging_utility import LoggingUtility
 
+# Compared by name so that importing the activator doesn't import spellchecker
+SPELL_CORRECT_PREDICTOR = "SpellCorrectPredictor"
+
 
 class PredictorActivator:
     """
@@ -86,16 +88,22 @@ class PredictorActivator:
         self.logger.info("Predicting next words and sentences")
 
         for predictor in self.registry:
-            if type(predictor).__name__ == SpellCorrectPredictor.__name__:
+            if type(predictor).__name__ == SPELL_CORRECT_PREDICTOR:
+                continue
+            if not predictor.ready:
+                self.logger.info(
+                    f"Predictor {predictor.predictor_name} is still loading, skipping."
+                )
                 continue
             try:
                 self.logger.info(
                     f"Predictor {predictor.predictor_name} - Predicting next {self.max_partial_prediction_size} words and sentences"
                 )
                 # Get sentences and/or words from the predictor
-                sentences, words = predictor.predict(
-                    self.max_partial_prediction_size * multiplier, prediction_filter
-                )
+                with predictor.lock:
+                    sentences, words = predictor.predict(
+                        self.max_partial_prediction_size * multiplier, prediction_filter
+                    )
 
                 # Append the sentences to the sentence_predictions list
                 if sentences:
@@ -117,11 +125,12 @@ class PredictorActivator:
         # If the word predictor(s) return empty lists, use predictions from the spell predictor
         if word_predictions == []:
 
-            spellingPredictor = self.registry.get_predictor(SpellCorrectPredictor.__name__)
-            if spellingPredictor:
-                _, words = spellingPredictor.predict(
-                    self.max_partial_prediction_size * multiplier, prediction_filter
-                )
+            spellingPredictor = self.registry.get_predictor(SPELL_CORRECT_PREDICTOR)
+            if spellingPredictor and spellingPredictor.ready:
+                with spellingPredictor.lock:
+                    _, words = spellingPredictor.predict(
+                        self.max_partial_prediction_size * multiplier, prediction_filter
+                    )
 
                 if words:
                     word_predictions.append(words)
@@ -141,18 +150,42 @@ class PredictorActivator:
         )
         return (word_nextLetterProbs, word_result, sentence_nextLetterProbs, sentence_result)
 
+    # Predictors that are still loading in the background pick up the current
+    # databases, models and toxic word lists when their configure() runs, so
+    # they are skipped here.
+    # Each predictor's lock is held while it is used, as the learn queue learns
+    # on its own thread.
     def recreate_database(self):  # pragma: no cover
         for predictor in self.registry:
-            predictor.recreate_database()
+            if predictor.ready:
+                with predictor.lock:
+                    predictor.recreate_database()
 
     def update_params(self, test_gen_sentence_pred, retrieve_from_AAC):  # pragma: no cover
         for predictor in self.registry:
-            predictor.load_model()
+            if predictor.ready:
+                with predictor.lock:
+                    predictor.load_model()
 
     def read_updated_toxicWords(self):  # pragma: no cover
         for predictor in self.registry:
-            predictor.read_personalized_toxic_words()
+            if predictor.ready:
+                with predictor.lock:
+                    predictor.read_personalized_toxic_words()
 
     def learn_text(self, text):  # pragma: no cover
+        self.learn_texts([text])
+
+    def learn_texts(self, texts, wait=False):
+        """
+        Learns texts with every predictor.  Predictors still loading in the
+        background learn them once they have loaded, unless wait is True, in
+        which case this blocks until they have loaded and learned them.  The
+        learn queue waits, so that texts only leave the queue once learned.
+        """
         for predictor in self.registry:
-            predictor.learn(text)
+            if not wait:
+                predictor.learn_when_ready(texts)
+            elif predictor.wait_until_ready():
+                with predictor.lock:
+                    predictor.learn_many(texts)
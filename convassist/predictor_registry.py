@@ -1,34 +1,35 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import importlib
 import logging
 from configparser import ConfigParser
 from typing import Any
 
 from convassist.context_tracker import ContextTracker
-from convassist.predictor.canned_phrases_predictor import CannedPhrasesPredictor
-from convassist.predictor.sentence_completion_predictor import (
-    SentenceCompletionPredictor,
-)
-from convassist.predictor.spell_correct_predictor import SpellCorrectPredictor
-
-from convassist.predictor.smoothed_ngram_predictor.canned_word_predictor import CannedWordPredictor
-from convassist.predictor.smoothed_ngram_predictor.general_word_predictor import GeneralWordPredictor
-from convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor import (
-    SmoothedNgramPredictor,
-)
 
+# Predictor classes are resolved from their import path the first time they are
+# used, so that configurations which only need n-gram predictors never import
+# torch, transformers, sentence_transformers, hnswlib or spacy.
 predictors = {
-    "ShortHandPredictor": SmoothedNgramPredictor,
-    "SmoothedNgramPredictor": SmoothedNgramPredictor,
-    "CannedWordPredictor": CannedWordPredictor,
-    "GeneralWordPredictor": GeneralWordPredictor,
-    "SpellCorrectPredictor": SpellCorrectPredictor,
-    "SentenceCompletionPredictor": SentenceCompletionPredictor,
-    "CannedPhrasesPredictor": CannedPhrasesPredictor,
+    "ShortHandPredictor": "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.SmoothedNgramPredictor",
+    "SmoothedNgramPredictor": "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.SmoothedNgramPredictor",
+    "CannedWordPredictor": "convassist.predictor.smoothed_ngram_predictor.canned_word_predictor.CannedWordPredictor",
+    "GeneralWordPredictor": "convassist.predictor.smoothed_ngram_predictor.general_word_predictor.GeneralWordPredictor",
+    "SpellCorrectPredictor": "convassist.predictor.spell_correct_predictor.SpellCorrectPredictor",
+    "SentenceCompletionPredictor": "convassist.predictor.sentence_completion_predictor.SentenceCompletionPredictor",
+    "CannedPhrasesPredictor": "convassist.predictor.canned_phrases_predictor.CannedPhrasesPredictor",
 }
 
 
+def resolve_predictor_class(predictor_class: str) -> type:
+    """
+    Imports and returns the class registered for predictor_class in predictors.
+    """
+    module_name, _, class_name = predictors[predictor_class].rpartition(".")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
 class PredictorRegistry(list):
     """
     Manages instantiation and iteration through predictors and aids in
@@ -74,7 +75,7 @@ class PredictorRegistry(list):
         if predictor_class in predictors:
             try:
                 if predictor_class in predictors:
-                    predictor = predictors[predictor_class](
+                    predictor = resolve_predictor_class(predictor_class)(
                         config, context_tracker, predictor_name, logger
                     )
                 else:
@@ -104,17 +105,22 @@ class PredictorRegistry(list):
             return config.get(predictor_name, "predictor_class")
 
     def model_status(self) -> bool:
-        model_status = False
-
-        sentPredictor = self.get_predictor("SentenceCompletionPredictor")
-        if type(sentPredictor) is SentenceCompletionPredictor:
-            model_status = model_status and sentPredictor.model_loaded
-
-        cannedPredictor = self.get_predictor("CannedPhrasesPredictor")
-        if type(cannedPredictor) is CannedPhrasesPredictor:
-            model_status = model_status and cannedPredictor.model_loaded
-
-        return model_status
+        """
+        Reports whether every predictor has finished loading and can predict.
+        """
+        return all(self.predictor_status().values())
+
+    def predictor_status(self) -> dict[str, bool]:
+        """
+        Reports, per predictor, whether it has finished loading and can predict.
+
+        Predictors that load their models in the background report False until
+        loading has completed.
+        """
+        return {
+            predictor.predictor_name: predictor.ready and predictor.model_loaded
+            for predictor in self
+        }
 
     def get_predictor(self, predictor_name):
         for predictor in self:
@@ -9,6 +9,7 @@ from unittest.mock import patch
 
 from convassist.context_tracker import ContextTracker
 from convassist.predictor.canned_phrases_predictor import CannedPhrasesPredictor
+from convassist.predictor.utilities.exact_index import ExactIndex
 from convassist.tests import setup_utils
 from convassist.tests.predictors import TestPredictors
 
@@ -39,6 +40,8 @@ class TestCannedPhrasesPredictor(TestPredictors):
             "embedding_cache_path": "personalizedCannedPhrases_embeddings.pkl",
             "index_path": "hnswlib_canned.index",
             "sbertmodel": "sentence-transformers/multi-qa-MiniLM-L6-cos-v1",
+            # search the test phrases with HNSW, like a large corpus
+            "exact_search_threshold": "0",
         }
 
         self.config["ContextTracker"] = {"lowercase_mode": "True"}
@@ -75,6 +78,23 @@ class TestCannedPhrasesPredictor(TestPredictors):
         self.assertTrue(os.path.exists(self.predictor.stopwordsFile))
         self.assertTrue(os.path.exists(self.predictor.sentences_db_path))
 
+    @patch("torch.cuda.is_available", return_value=False)
+    @patch("torch.backends.mps.is_available", return_value=False)
+    def test_exact_search(self, mock_cuda, mock_mps):
+        self.config["test_predictor"]["exact_search_threshold"] = "100000"
+        self.config["test_predictor"]["index_path"] = "hnswlib_canned_exact.index"
+        predictor = CannedPhrasesPredictor(self.config, self.context_tracker, "test_predictor")
+
+        self.assertIsInstance(predictor.index, ExactIndex)
+        self.assertFalse(os.path.exists(predictor.index_path))
+
+        predictor.learn("This is a new sentence to learn.")
+        self.assertFalse(os.path.exists(predictor.index_path))
+
+        predictor.context_tracker.context = "This is a new "
+        sentences, _ = predictor.predict(1)
+        self.assertEqual(sentences[0].word, "This is a new sentence to learn.")
+
     def test_load_model(self):
 
         self.predictor.load_model()
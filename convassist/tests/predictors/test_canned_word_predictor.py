@@ -99,6 +99,20 @@ class TestCannedWordPredictor(TestPredictors):
         self.assertEqual(len(words), 1)
         self.assertEqual(words[0].word, "sentence")
 
+    def test_extract_svo_many(self):
+        sentences = ["I want to drink some water", "She is reading a book", ""]
+        self.assertEqual(
+            self.predictor.extract_svo_many(sentences),
+            [self.predictor.extract_svo(sentence) for sentence in sentences],
+        )
+
+    def test_learn_many(self):
+        self.predictor.learn_many(["This is a new sentence to learn.", "Another new sentence."])
+
+        self.predictor.context_tracker.context = self.predictor.extract_svo("This is a new ") + " "
+        _, words = self.predictor.predict(1, None)
+        self.assertEqual(words[0].word, "sentence")
+
     # TODO: Implement this test
     # def test_remove_canned_words(self):
 
@@ -3,6 +3,7 @@
 
 import configparser
 import os
+import threading
 import unittest
 from unittest.mock import patch
 
@@ -12,6 +13,7 @@ from convassist.context_tracker import ContextTracker
 from convassist.predictor.smoothed_ngram_predictor.general_word_predictor import (
     GeneralWordPredictor,
 )
+from convassist.utilities.ngram.kneser_ney import build_language_model, update_language_model
 from convassist.utilities.ngram.ngramutil import NGramUtil
 
 from convassist.tests import setup_utils
@@ -80,6 +82,167 @@ class TestGeneralWordPredictor(TestPredictors):
         # self.assertEqual(len(word_predictions), max_partial_prediction_size)
         self.assertEqual(word_predictions[0].word, expected_word)
 
+    @parameterized.expand(
+        [
+            ("3-gram_whole_word", "in the ", 5),
+            ("2-gram_partial_word", "the s", 5),
+            ("1-gram_partial_word", "s", 2),
+        ]
+    )
+    def test_predict_unique_and_bounded(self, name, context, max):
+        self.predictor.context_tracker.context = context
+        _, word_predictions = self.predictor.predict(max, None)
+
+        words = [p.word for p in word_predictions]
+        self.assertEqual(len(words), len(set(words)))
+        self.assertLessEqual(len(words), max)
+        probabilities = [p.probability for p in word_predictions]
+        self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+
+    def test_learn_many(self):
+        self.config["test_predictor"]["learn"] = "True"
+        predictor = GeneralWordPredictor(self.config, self.context_tracker, "test_predictor")
+
+        with NGramUtil(predictor.database, predictor.cardinality) as ngramutil:
+            before = ngramutil._ngram_count(["zebra", "crossing"])
+
+        predictor.learn_many(["Zebra crossing!", "a zebra crossing", "zebra"])
+
+        with NGramUtil(predictor.database, predictor.cardinality) as ngramutil:
+            self.assertEqual(ngramutil._ngram_count(["zebra", "crossing"]), before + 2)
+            self.assertEqual(ngramutil._ngram_count(["a", "zebra", "crossing"]), 1)
+
+    @parameterized.expand(
+        [
+            ("interpolated", "interpolated"),
+            ("kneser_ney", "kneser_ney"),
+        ]
+    )
+    def test_predict_while_typing(self, name, smoothing):
+        self.config["test_predictor"]["smoothing"] = smoothing
+        predictor = GeneralWordPredictor(self.config, self.context_tracker, "test_predictor")
+
+        for context in ["in the ", "in the s", "in the sq", "in the squ"]:
+            predictor.context_tracker.context = context
+            _, word_predictions = predictor.predict(3, None)
+
+            fresh = GeneralWordPredictor(self.config, self.context_tracker, "test_predictor")
+            _, expected = fresh.predict(3, None)
+            self.assertEqual(
+                [(p.word, p.probability) for p in word_predictions],
+                [(p.word, p.probability) for p in expected],
+            )
+
+        self.assertGreater(predictor.prefix_cache.hits, 0)
+
+    @parameterized.expand(
+        [
+            ("3-gram_whole_word", "in the ", "square"),
+            ("3-gram_partial_word", "in the sq", "square"),
+            ("2-gram_partial_word", "the sq", "square"),
+            ("1-gram_partial_word", "sq", "square"),
+        ]
+    )
+    def test_predict_kneser_ney(self, name, context, expected_word):
+        self.config["test_predictor"]["smoothing"] = "kneser_ney"
+        predictor = GeneralWordPredictor(self.config, self.context_tracker, "test_predictor")
+
+        predictor.context_tracker.context = context
+        _, word_predictions = predictor.predict(3, None)
+
+        self.assertEqual(word_predictions[0].word, expected_word)
+        self.assertLessEqual(sum(p.probability for p in word_predictions), 1.0)
+
+    def kneser_ney_learner(self, delay):
+        self.config["test_predictor"]["smoothing"] = "kneser_ney"
+        self.config["test_predictor"]["learn"] = "True"
+        self.config["test_predictor"]["lm_rebuild_delay"] = str(delay)
+        return GeneralWordPredictor(self.config, self.context_tracker, "test_predictor")
+
+    def test_learn_defers_kneser_ney_update(self):
+        predictor = self.kneser_ney_learner(delay=60)
+
+        with patch(
+            "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.build_language_model",
+            wraps=build_language_model,
+        ) as build, patch(
+            "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.update_language_model",
+            wraps=update_language_model,
+        ) as update:
+            predictor.learn_many(["yellow submarine", "a yellow submarine"])
+
+            update.assert_not_called()
+            with NGramUtil(predictor.database, predictor.cardinality) as ngramutil:
+                self.assertTrue(ngramutil.lm_stale)
+
+            predictor.update_language_model()
+            predictor.update_language_model()
+
+            update.assert_called_once()
+            # only the contexts of the learned n-grams are re-estimated
+            self.assertIn(("yellow",), update.call_args.args[1][1])
+            build.assert_not_called()
+
+        with NGramUtil(predictor.database, predictor.cardinality) as ngramutil:
+            self.assertFalse(ngramutil.lm_stale)
+
+        predictor.context_tracker.context = "yellow sub"
+        _, word_predictions = predictor.predict(1, None)
+        self.assertEqual(word_predictions[0].word, "submarine")
+
+    def test_learning_burst_updates_once(self):
+        predictor = self.kneser_ney_learner(delay=1)
+        updated = threading.Event()
+
+        def update(*args, **kwargs):
+            result = update_language_model(*args, **kwargs)
+            updated.set()
+            return result
+
+        with patch(
+            "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.update_language_model",
+            side_effect=update,
+        ) as mock_update:
+            for phrase in ["purple rain", "purple haze", "purple"]:
+                predictor.learn(phrase)
+
+            self.assertTrue(updated.wait(10))
+            self.assertEqual(mock_update.call_count, 1)
+            self.assertEqual(mock_update.call_args.args[1][1], {("purple",)})
+
+    def test_stale_model_is_rebuilt_on_start(self):
+        predictor = self.kneser_ney_learner(delay=60)
+        predictor.learn("blue moon")
+
+        # a new predictor on the database, as after a restart before the rebuild ran
+        restarted = self.kneser_ney_learner(delay=60)
+        self.assertTrue(restarted._lm_stale)
+        restarted.update_language_model()
+
+        with NGramUtil(restarted.database, restarted.cardinality) as ngramutil:
+            self.assertFalse(ngramutil.lm_stale)
+
+    def test_large_database_is_not_rebuilt_automatically(self):
+        self.config["test_predictor"]["lm_rebuild_max_mb"] = "1"
+
+        with patch("os.path.getsize", return_value=2 * 2**20), patch(
+            "convassist.predictor.smoothed_ngram_predictor.smoothed_ngram_predictor.build_language_model",
+            wraps=build_language_model,
+        ) as build:
+            predictor = self.kneser_ney_learner(delay=60)
+            build.assert_not_called()
+
+            # without a model, predictions interpolate the counts
+            predictor.context_tracker.context = "in the sq"
+            _, word_predictions = predictor.predict(3, None)
+            self.assertEqual(word_predictions[0].word, "square")
+
+            predictor.rebuild_language_model()
+            build.assert_called_once()
+
+        with NGramUtil(predictor.database, predictor.cardinality) as ngramutil:
+            self.assertTrue(ngramutil.lm_order)
+
 
 if __name__ == "__main__":
     unittest.main()
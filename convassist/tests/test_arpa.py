@@ -0,0 +1,94 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import tempfile
+import unittest
+
+from convassist.utilities.ngram.arpa import ArpaFormatError, import_arpa
+from convassist.utilities.ngram.kneser_ney import KneserNeyModel
+from convassist.utilities.ngram.ngramutil import NGramUtil
+
+ARPA = """
+\\data\\
+ngram 1=6
+ngram 2=4
+
+\\1-grams:
+-1.0\t<s>\t-0.3
+-0.7\t</s>
+-0.6\tI\t-0.2
+-0.8\twant\t-0.4
+-1.2\twater
+-1.5\twatch
+
+\\2-grams:
+-0.2\t<s> I
+-0.1\tI want
+-0.3\twant water
+-0.4\tWant water
+
+\\end\\
+"""
+
+
+class TestArpaImport(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "model.arpa")
+        with open(self.path, "w") as f:
+            f.write(ARPA)
+        self.ngramutil = NGramUtil(":memory:", 3)
+
+    def tearDown(self):
+        self.ngramutil.connection.close()
+        self.tempdir.cleanup()
+
+    def test_import(self):
+        counts = import_arpa(self.ngramutil, self.path)
+
+        self.assertEqual(counts, {1: 6, 2: 4})
+        self.assertEqual(self.ngramutil.lm_order, 2)
+        self.assertTrue(self.ngramutil.lm_source.startswith("arpa:"))
+        self.assertEqual(self.ngramutil.lm_backoff(["want"]), -0.4)
+
+    def test_score_backs_off(self):
+        import_arpa(self.ngramutil, self.path)
+        model = KneserNeyModel(self.ngramutil, 3)
+
+        scores = model.score(["i", "want"], ["water", "watch"])
+
+        self.assertAlmostEqual(scores["water"], -0.3)
+        # backoff(want) + P(watch)
+        self.assertAlmostEqual(scores["watch"], -0.4 + -1.5)
+
+    def test_lowercase_keeps_highest(self):
+        import_arpa(self.ngramutil, self.path, lowercase=True)
+        model = KneserNeyModel(self.ngramutil, 3)
+
+        self.assertAlmostEqual(model.score(["i"], ["want"])["want"], -0.1)
+        self.assertAlmostEqual(model.score(["want"], ["water"])["water"], -0.3)
+
+    def test_candidates_skip_special_tokens(self):
+        import_arpa(self.ngramutil, self.path, lowercase=True)
+        model = KneserNeyModel(self.ngramutil, 3)
+
+        self.assertEqual(model.candidates(["want"], "wat", 3), ["water", "watch"])
+        self.assertNotIn("</s>", model.candidates(["water"], "", 10))
+
+    def test_max_order(self):
+        counts = import_arpa(self.ngramutil, self.path, max_order=1)
+
+        self.assertEqual(counts, {1: 6})
+        self.assertEqual(self.ngramutil.lm_order, 1)
+
+    def test_invalid_file(self):
+        with open(self.path, "w") as f:
+            f.write("not an arpa file\n")
+
+        with self.assertRaises(ArpaFormatError):
+            import_arpa(self.ngramutil, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
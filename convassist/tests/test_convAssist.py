@@ -1,6 +1,8 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import tempfile
 import unittest
 from configparser import ConfigParser
 from unittest.mock import MagicMock
@@ -80,6 +82,21 @@ class TestConvAssist(unittest.TestCase):
 
         conv_assist.predictor_activator.learn_text.assert_called_with("This is a test sentence.")
 
+    def test_learn_queued(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            self.config["Common"] = {"personalized_resources_path": tempdir}
+            self.config["LearnQueue"] = {"enabled": "True", "database": "queue.db"}
+            conv_assist = ConvAssist(self.id_str, self.ini_file, config=self.config)
+            self.assertEqual(conv_assist.learn_queue.database, os.path.join(tempdir, "queue.db"))
+
+            conv_assist.learn_queue.learn = MagicMock()
+            conv_assist.learn_text("This is a test sentence.")
+
+            self.assertTrue(conv_assist.wait_for_learning(timeout=5))
+            conv_assist.learn_queue.learn.assert_called_with(["This is a test sentence."])
+            conv_assist.close()
+            self.assertIsNone(conv_assist.learn_queue)
+
     def test_check_model(self):
         conv_assist = ConvAssist(self.id_str, self.ini_file, config=self.config)
 
@@ -91,6 +108,17 @@ class TestConvAssist(unittest.TestCase):
 
         self.assertEqual(status, 1)
 
+    def test_predictor_status(self):
+        conv_assist = ConvAssist(self.id_str, self.ini_file, config=self.config)
+
+        # Mock the predictor_status method of predictor_registry
+        mock_predictor_status = MagicMock(return_value={"SpellCorrectPredictor": True})
+        conv_assist.predictor_registry.predictor_status = mock_predictor_status
+
+        status = conv_assist.predictor_status()
+
+        self.assertEqual(status, {"SpellCorrectPredictor": True})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,124 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import importlib.util
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import torch
+import transformers
+from parameterized import parameterized
+
+from convassist.predictor.utilities import cpu_inference
+from convassist.predictor.utilities.cpu_inference import (
+    configure_torch_threads,
+    quantize_int8,
+)
+
+
+class TestQuantizeInt8(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        config = transformers.GPT2Config(
+            vocab_size=50, n_positions=64, n_embd=32, n_layer=2, n_head=2
+        )
+        self.model = transformers.GPT2LMHeadModel(config).eval()
+        self.input_ids = torch.tensor([[1, 2, 3, 4, 5]])
+
+    @unittest.skipIf(importlib.util.find_spec("torchao") is None, "torchao is not installed")
+    def test_linear_layers_are_quantized(self):
+        self.assertTrue(quantize_int8(self.model))
+
+        layers = [type(module) for module in self.model.modules()]
+        self.assertNotIn(transformers.pytorch_utils.Conv1D, layers)
+        weights = [
+            module.weight for module in self.model.modules() if type(module) is torch.nn.Linear
+        ]
+        self.assertTrue(weights)
+        self.assertTrue(all(type(weight).__name__ == "Int8Tensor" for weight in weights))
+
+    @unittest.skipIf(importlib.util.find_spec("torchao") is None, "torchao is not installed")
+    def test_output_is_close(self):
+        with torch.inference_mode():
+            expected = self.model(self.input_ids).logits
+            quantize_int8(self.model)
+            actual = self.model(self.input_ids).logits
+
+        self.assertEqual(actual.shape, expected.shape)
+        self.assertLess((actual - expected).abs().max().item(), 0.1)
+
+    @unittest.skipIf(importlib.util.find_spec("torchao") is None, "torchao is not installed")
+    def test_generate(self):
+        quantize_int8(self.model)
+        with torch.inference_mode():
+            output = self.model.generate(
+                self.input_ids, max_new_tokens=4, do_sample=False, pad_token_id=0
+            )
+
+        self.assertEqual(output.shape, (1, 9))
+
+    @patch.dict(sys.modules, {"torchao.quantization": None})
+    def test_without_torchao_model_is_unchanged(self):
+        logger = MagicMock()
+        with torch.inference_mode():
+            expected = self.model(self.input_ids).logits
+
+            self.assertFalse(quantize_int8(self.model, logger))
+            actual = self.model(self.input_ids).logits
+
+        self.assertTrue(torch.equal(actual, expected))
+        logger.warning.assert_called_once()
+
+
+class TestConfigureTorchThreads(unittest.TestCase):
+    def setUp(self):
+        cpu_inference._threads_configured = False
+        set_threads = patch("convassist.predictor.utilities.cpu_inference.torch.set_num_threads")
+        set_interop = patch(
+            "convassist.predictor.utilities.cpu_inference.torch.set_num_interop_threads"
+        )
+        self.set_threads = set_threads.start()
+        self.set_interop = set_interop.start()
+        self.addCleanup(set_threads.stop)
+        self.addCleanup(set_interop.stop)
+
+    def tearDown(self):
+        cpu_inference._threads_configured = False
+
+    @parameterized.expand(
+        [
+            ("defaults", 0, 0, None, None),
+            ("num_threads", 2, 0, 2, None),
+            ("both", 2, 1, 2, 1),
+        ]
+    )
+    def test_sets_configured_threads(
+        self, name, num_threads, interop_threads, expected_threads, expected_interop
+    ):
+        self.assertTrue(configure_torch_threads(num_threads, interop_threads))
+
+        if expected_threads is None:
+            self.set_threads.assert_not_called()
+        else:
+            self.set_threads.assert_called_once_with(expected_threads)
+        if expected_interop is None:
+            self.set_interop.assert_not_called()
+        else:
+            self.set_interop.assert_called_once_with(expected_interop)
+
+    def test_only_first_call_applies(self):
+        self.assertTrue(configure_torch_threads(2))
+        self.assertFalse(configure_torch_threads(4))
+
+        self.set_threads.assert_called_once_with(2)
+
+    def test_interop_threads_already_in_use(self):
+        self.set_interop.side_effect = RuntimeError("parallel work has already started")
+
+        self.assertTrue(configure_torch_threads(2, 1))
+        self.set_threads.assert_called_once_with(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
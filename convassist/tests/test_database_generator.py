@@ -0,0 +1,135 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import itertools
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from convassist.utilities.ngram.ngramutil import SCHEMA_TEXT, SCHEMA_VOCAB, NGramUtil
+
+UTILS_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "3rd_party_resources", "utils"
+)
+# the generator is a script; its workers import it by name
+sys.path.insert(0, os.path.abspath(UTILS_DIR))
+import database_generator  # noqa: E402
+
+CORPUS = [
+    [
+        "i want some water",
+        "i want to go home",
+        "",
+        "can you open the door",
+        "i want some water please",
+    ],
+    [
+        "please open the door",
+        "i want to go to bed",
+        "can you turn on the light",
+        "i want some tea",
+    ],
+]
+CARDINALITY = 3
+
+
+class TestNgramDatabaseBuilder(unittest.TestCase):
+    def setUp(self):
+        # other tests leave threads running, which forked workers could deadlock on
+        patcher = patch.object(
+            database_generator, "Pool", multiprocessing.get_context("spawn").Pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.database = os.path.join(self.tempdir.name, "ngrams.db")
+
+        self.files = []
+        for index, lines in enumerate(CORPUS):
+            path = os.path.join(self.tempdir.name, f"corpus_{index}.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            self.files.append(path)
+
+    def expected_counts(self, card):
+        # what a single process counts over the whole corpus
+        lines = [line for line in itertools.chain(*CORPUS) if line]
+        return dict(NGramUtil.count_ngrams(lines, card))
+
+    def create_database(self, schema_version):
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            ngramutil.create_update_ngram_tables(schema_version)
+
+    def build(self, files, max_ngrams):
+        shards = itertools.chain(*(database_generator.read_shards(f, 2) for f in files))
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            database_generator.build_database(
+                ngramutil, shards, CARDINALITY, jobs=2, max_ngrams=max_ngrams
+            )
+
+    def assertCountsMatch(self):
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            for card in range(1, CARDINALITY + 1):
+                self.assertEqual(dict(ngramutil.ngram_counts(card)), self.expected_counts(card))
+
+    @parameterized.expand([("in_memory", 1000000), ("staged", 10)])
+    def test_counts_match_single_process(self, name, max_ngrams):
+        self.build(self.files, max_ngrams)
+
+        self.assertCountsMatch()
+
+    @parameterized.expand(
+        [
+            ("text_in_memory", SCHEMA_TEXT, 1000000),
+            ("text_staged", SCHEMA_TEXT, 10),
+            ("vocab_in_memory", SCHEMA_VOCAB, 1000000),
+            ("vocab_staged", SCHEMA_VOCAB, 10),
+        ]
+    )
+    def test_second_file_is_added_to_existing_counts(self, name, schema_version, max_ngrams):
+        self.create_database(schema_version)
+        self.build(self.files[:1], max_ngrams)
+        self.build(self.files[1:], max_ngrams)
+
+        self.assertCountsMatch()
+
+    @parameterized.expand([("in_memory", 1000000), ("staged", 10)])
+    def test_vocab_database_stores_vocab_ids(self, name, max_ngrams):
+        self.create_database(SCHEMA_VOCAB)
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            ngramutil.learn("i want some water")
+
+        self.build(self.files, max_ngrams)
+
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            self.assertEqual(ngramutil.schema_version, SCHEMA_VOCAB)
+            for card in range(1, CARDINALITY + 1):
+                types = ngramutil.connection.fetch_all(
+                    f"SELECT DISTINCT typeof(word) FROM _{card}_gram;"
+                )
+                self.assertEqual(types, [("integer",)])
+
+                expected = self.expected_counts(card)
+                for ngram, count in NGramUtil.count_ngrams(["i want some water"], card).items():
+                    expected[ngram] += count
+                self.assertEqual(dict(ngramutil.ngram_counts(card)), expected)
+
+    def test_indexes_are_built(self):
+        self.build(self.files, 10)
+
+        with NGramUtil(self.database, CARDINALITY) as ngramutil:
+            indexes = ngramutil.connection.fetch_all("PRAGMA index_list('_3_gram');")
+            names = [index[1] for index in indexes]
+            self.assertIn("idx_3_gram_unique", names)
+            self.assertIn("idx_3_gram_lower", names)
+
+
+if __name__ == "__main__":
+    unittest.main()
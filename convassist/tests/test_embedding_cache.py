@@ -0,0 +1,117 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+import numpy
+from parameterized import parameterized
+
+from convassist.predictor.utilities.embedding_cache import EmbeddingCache
+from convassist.utilities.singleton import Singleton
+
+
+class FakeEmbedder:
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, sentences, convert_to_numpy=True):
+        self.calls.append(sentences)
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        return numpy.vstack([self._embed(s) for s in sentences])
+
+    def _embed(self, sentence):
+        return numpy.full(self.dim, len(sentence), dtype=numpy.float32)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        Singleton._instances.pop(EmbeddingCache, None)
+        self.cache = EmbeddingCache(max_entries=3, max_mb=1)
+        self.embedder = FakeEmbedder()
+
+    def tearDown(self):
+        Singleton._instances.pop(EmbeddingCache, None)
+
+    def test_shared_instance(self):
+        self.assertIs(self.cache, EmbeddingCache())
+
+    def test_later_limits_are_ignored(self):
+        cache = EmbeddingCache(max_entries=100, max_mb=50)
+
+        self.assertEqual(cache.max_entries, 3)
+
+    @parameterized.expand(
+        [
+            ("first", [(10, 2)], 10, 2),
+            ("largest", [(10, 2), (5, 8), (7, 1)], 10, 8),
+            ("disabled", [(0, 0)], 0, 0),
+            ("one_disabled", [(0, 0), (10, 2)], 10, 2),
+        ]
+    )
+    def test_reserve(self, name, limits, max_entries, max_mb):
+        for entries, mb in limits:
+            self.cache.reserve(entries, mb)
+
+        self.assertEqual(self.cache.max_entries, max_entries)
+        self.assertEqual(self.cache.max_bytes, max_mb * 1024 * 1024)
+
+    def test_encode_single_hits_cache(self):
+        first = self.cache.encode(self.embedder, "model", "i am thirsty")
+        second = self.cache.encode(self.embedder, "model", "i am  thirsty ")
+
+        numpy.testing.assert_array_equal(first, second)
+        self.assertEqual(first.shape, (4,))
+        self.assertEqual(len(self.embedder.calls), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_encode_batch_only_encodes_misses(self):
+        self.cache.encode(self.embedder, "model", "hello")
+        result = self.cache.encode(self.embedder, "model", ["hello", "hi there", "hi there"])
+
+        self.assertEqual(result.shape, (3, 4))
+        self.assertEqual(self.embedder.calls[-1], ["hi there"])
+        self.assertEqual(result[0][0], len("hello"))
+
+    def test_model_name_is_part_of_key(self):
+        self.cache.encode(self.embedder, "model_a", "hello")
+        self.cache.encode(self.embedder, "model_b", "hello")
+
+        self.assertEqual(len(self.embedder.calls), 2)
+
+    def test_evicts_least_recently_used(self):
+        for text in ["a", "b", "c"]:
+            self.cache.encode(self.embedder, "model", text)
+        self.cache.encode(self.embedder, "model", "a")
+        self.cache.encode(self.embedder, "model", "d")
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get("model", "b"))
+        self.assertIsNotNone(self.cache.get("model", "a"))
+
+    def test_memory_limit(self):
+        self.cache.resize(max_entries=100, max_mb=0)
+        self.cache.encode(self.embedder, "model", "hello")
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_disabled(self):
+        self.cache.resize(max_entries=0, max_mb=1)
+        self.cache.encode(self.embedder, "model", "hello")
+        self.cache.encode(self.embedder, "model", "hello")
+
+        self.assertEqual(len(self.embedder.calls), 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_cached_embeddings_are_read_only(self):
+        embedding = self.cache.encode(self.embedder, "model", "hello")
+        embedding = self.cache.encode(self.embedder, "model", "hello")
+
+        with self.assertRaises(ValueError):
+            embedding[0] = 0
+
+
+if __name__ == "__main__":
+    unittest.main()
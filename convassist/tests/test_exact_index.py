@@ -0,0 +1,152 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import os
+import tempfile
+import unittest
+
+import hnswlib
+import numpy
+from parameterized import parameterized
+
+from convassist.predictor.canned_phrases_predictor import CannedPhrasesPredictor
+from convassist.predictor.utilities.exact_index import ExactIndex
+
+
+def cosine_distances(queries, embeddings):
+    queries = queries / numpy.linalg.norm(queries, axis=1, keepdims=True)
+    embeddings = embeddings / numpy.linalg.norm(embeddings, axis=1, keepdims=True)
+    return 1 - queries @ embeddings.T
+
+
+class TestExactIndex(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.default_rng(0)
+        self.embeddings = rng.standard_normal((100, 16)).astype(numpy.float32)
+        self.queries = rng.standard_normal((5, 16)).astype(numpy.float32)
+
+    @parameterized.expand([("one", 1), ("some", 10), ("all", 100)])
+    def test_matches_brute_force(self, name, k):
+        index = ExactIndex(16, self.embeddings)
+
+        labels, distances = index.knn_query(self.queries, k=k)
+
+        expected = cosine_distances(self.queries, self.embeddings)
+        self.assertEqual(labels.shape, (5, k))
+        numpy.testing.assert_array_equal(labels, numpy.argsort(expected, axis=1)[:, :k])
+        numpy.testing.assert_allclose(distances, numpy.sort(expected, axis=1)[:, :k], atol=1e-5)
+
+    def test_single_query(self):
+        index = ExactIndex(16, self.embeddings)
+
+        labels, distances = index.knn_query(self.embeddings[42], k=3)
+
+        self.assertEqual(labels.shape, (1, 3))
+        self.assertEqual(labels[0][0], 42)
+        self.assertAlmostEqual(float(distances[0][0]), 0.0, places=5)
+
+    def test_k_larger_than_index(self):
+        index = ExactIndex(16, self.embeddings[:4])
+
+        labels, distances = index.knn_query(self.queries, k=10)
+
+        self.assertEqual(labels.shape, (5, 4))
+        self.assertEqual(distances.shape, (5, 4))
+
+    def test_empty_index(self):
+        labels, distances = ExactIndex(16).knn_query(self.queries, k=10)
+
+        self.assertEqual(labels.shape, (5, 0))
+        self.assertEqual(distances.shape, (5, 0))
+
+    def test_add_items_with_ids(self):
+        index = ExactIndex(16, self.embeddings[:10])
+        index.add_items(self.embeddings[50], 50)
+
+        labels, _ = index.knn_query(self.embeddings[50], k=1)
+
+        self.assertEqual(index.get_current_count(), 11)
+        self.assertEqual(labels[0][0], 50)
+
+    def test_agrees_with_hnsw(self):
+        hnsw = hnswlib.Index(space="cosine", dim=16)
+        hnsw.init_index(max_elements=100, ef_construction=400, M=64)
+        hnsw.add_items(self.embeddings, numpy.arange(100))
+        hnsw.set_ef(100)
+
+        exact_labels, exact_distances = ExactIndex(16, self.embeddings).knn_query(
+            self.queries, k=5
+        )
+        hnsw_labels, hnsw_distances = hnsw.knn_query(self.queries, k=5)
+
+        numpy.testing.assert_array_equal(exact_labels, hnsw_labels)
+        numpy.testing.assert_allclose(exact_distances, hnsw_distances, atol=1e-5)
+
+
+class TestCannedPhrasesIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.embeddings = (
+            numpy.random.default_rng(0).standard_normal((30, 8)).astype(numpy.float32)
+        )
+
+        self.predictor = object.__new__(CannedPhrasesPredictor)
+        self.predictor.logger = logging.getLogger("test")
+        self.predictor._personalized_resources_path = self.tmpdir.name
+        self.predictor._index_path = "canned.index"
+        self.predictor._hnsw_ef = 50
+        self.predictor._hnsw_ef_construction = 100
+        self.predictor._hnsw_m = 16
+        self.predictor._exact_search_threshold = 20
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @parameterized.expand([("small", 10, ExactIndex, False), ("large", 20, hnswlib.Index, True)])
+    def test_index_chosen_by_corpus_size(self, name, count, index_class, saved):
+        self.predictor.corpus_embeddings = self.embeddings[:count]
+
+        index = self.predictor._build_index()
+
+        self.assertIsInstance(index, index_class)
+        self.assertEqual(index.get_current_count(), count)
+        self.assertEqual(os.path.exists(self.predictor.index_path), saved)
+
+    def test_learned_phrases_are_added(self):
+        self.predictor.corpus_embeddings = self.embeddings[:10]
+        index = self.predictor._build_index()
+
+        self.predictor.corpus_embeddings = self.embeddings[:15]
+        updated = self.predictor._update_index(index)
+
+        self.assertIs(updated, index)
+        self.assertEqual(updated.get_current_count(), 15)
+        self.assertFalse(os.path.exists(self.predictor.index_path))
+
+    def test_outgrowing_exact_search_builds_hnsw(self):
+        self.predictor.corpus_embeddings = self.embeddings[:19]
+        index = self.predictor._build_index()
+
+        self.predictor.corpus_embeddings = self.embeddings[:21]
+        index = self.predictor._update_index(index)
+
+        self.assertIsInstance(index, hnswlib.Index)
+        self.assertEqual(index.get_current_count(), 21)
+        self.assertTrue(os.path.exists(self.predictor.index_path))
+
+    def test_full_hnsw_index_grows(self):
+        self.predictor.corpus_embeddings = self.embeddings[:20]
+        index = self.predictor._build_index()
+
+        self.predictor.corpus_embeddings = self.embeddings
+        index = self.predictor._update_index(index)
+
+        self.assertEqual(index.get_current_count(), 30)
+        self.assertEqual(index.get_max_elements(), 40)
+        labels, _ = index.knn_query(self.embeddings[25], k=1)
+        self.assertEqual(labels[0][0], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
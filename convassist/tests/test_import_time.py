@@ -0,0 +1,47 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+import logging
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "hnswlib",
+    "spacy",
+    "spellchecker",
+    "nltk",
+]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import convassist.ConvAssist
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+class TestImportTime(unittest.TestCase):
+    def setUp(self):
+        # Import in a fresh interpreter so other tests can't have loaded anything
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], text=True)
+        self.result = json.loads(output.strip().splitlines()[-1])
+
+    def test_no_heavy_modules_imported(self):
+        # how long the import takes depends on the machine, so it is only reported
+        logging.getLogger(__name__).info(
+            f"import convassist.ConvAssist took {self.result['elapsed']:.3f}s"
+        )
+        self.assertEqual(self.result["loaded"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
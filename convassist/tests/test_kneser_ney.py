@@ -0,0 +1,155 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from parameterized import parameterized
+
+from convassist.utilities.ngram.kneser_ney import (
+    LOG10_ZERO,
+    KneserNeyModel,
+    build_kneser_ney,
+    build_language_model,
+    update_language_model,
+)
+from convassist.utilities.ngram.ngramutil import SCHEMA_TEXT, SCHEMA_VOCAB, NGramUtil
+
+PHRASES = [
+    "i want to go home",
+    "i want to eat",
+    "i want a drink",
+    "i need to go out",
+    "you want to go home",
+    "go home now",
+]
+
+
+class TestKneserNey(unittest.TestCase):
+    def setUp(self):
+        self.ngramutil = NGramUtil(":memory:", 3)
+        self.ngramutil.create_update_ngram_tables()
+        for phrase in PHRASES:
+            self.ngramutil.learn(phrase)
+
+        build_language_model(self.ngramutil, 3)
+        self.model = KneserNeyModel(self.ngramutil, 3)
+        self.vocab = [ngram[0] for ngram, _ in self.ngramutil.ngram_counts(1)]
+
+    def tearDown(self):
+        self.ngramutil.connection.close()
+
+    @parameterized.expand(
+        [
+            ("unigram", []),
+            ("seen_bigram_history", ["to"]),
+            ("seen_trigram_history", ["want", "to"]),
+            ("unseen_history", ["home", "i"]),
+        ]
+    )
+    def test_probabilities_sum_to_one(self, name, history):
+        scores = self.model.score(history, self.vocab)
+
+        self.assertAlmostEqual(sum(10**score for score in scores.values()), 1.0, places=6)
+
+    def test_seen_continuation_is_preferred(self):
+        scores = self.model.score(["want", "to"], ["go", "eat", "out"])
+
+        self.assertGreater(scores["go"], scores["eat"])
+        self.assertGreater(scores["eat"], scores["out"])
+
+    def test_unknown_word(self):
+        self.assertEqual(self.model.score(["want", "to"], ["zebra"])["zebra"], LOG10_ZERO)
+
+    def test_candidates(self):
+        self.assertEqual(self.model.candidates(["want", "to"], "", 2)[:2], ["go", "eat"])
+        self.assertEqual(self.model.candidates(["i", "want"], "d", 2), ["drink"])
+        # words from shorter histories follow, without duplicates
+        self.assertEqual(self.model.candidates(["want", "to"], "g", 2), ["go"])
+        self.assertEqual(self.model.candidates(["zebra"], "h", 1), ["home"])
+
+    def test_backoff_weights(self):
+        model = build_kneser_ney([{("a",): 2, ("b",): 1}, {("a", "b"): 1, ("a", "a"): 1}])
+
+        # histories get a backoff weight, n-grams that are never a history don't
+        self.assertLess(model[0][("a",)][1], 0)
+        self.assertEqual(model[0][("b",)][1], 0.0)
+
+
+class TestUpdateLanguageModel(unittest.TestCase):
+    def create(self, schema_version=SCHEMA_TEXT):
+        ngramutil = NGramUtil(":memory:", 3)
+        ngramutil.create_update_ngram_tables(schema_version)
+        self.addCleanup(ngramutil.connection.close)
+        for phrase in PHRASES:
+            ngramutil.learn(phrase)
+        build_language_model(ngramutil, 3)
+        return ngramutil
+
+    def learn(self, ngramutil, phrases):
+        ngramutil.update(phrases_toAdd=phrases, update_on_conflict=True)
+        ngramutil.mark_lm_stale()
+        return [
+            {ngram[:-1] for ngram in NGramUtil.count_ngrams(phrases, cardinality)}
+            for cardinality in range(1, 4)
+        ]
+
+    def model_rows(self, ngramutil):
+        return {
+            tuple(row[:-2]): (row[-2], row[-1])
+            for cardinality in range(1, 4)
+            for row in ngramutil.connection.fetch_all(f"SELECT * FROM _{cardinality}_lm;")
+        }
+
+    @parameterized.expand([("text", SCHEMA_TEXT), ("vocab", SCHEMA_VOCAB)])
+    def test_updating_every_history_reproduces_the_build(self, name, schema_version):
+        ngramutil = self.create(schema_version)
+        built = self.model_rows(ngramutil)
+        histories = [
+            {ngram[:-1] for ngram, _ in ngramutil.ngram_counts(cardinality)}
+            for cardinality in range(1, 4)
+        ]
+
+        self.assertTrue(update_language_model(ngramutil, histories))
+
+        updated = self.model_rows(ngramutil)
+        self.assertEqual(updated.keys(), built.keys())
+        for ngram, (prob, backoff) in built.items():
+            self.assertAlmostEqual(updated[ngram][0], prob, places=9)
+            self.assertAlmostEqual(updated[ngram][1], backoff, places=9)
+
+    @parameterized.expand([("text", SCHEMA_TEXT), ("vocab", SCHEMA_VOCAB)])
+    def test_update_after_learning(self, name, schema_version):
+        ngramutil = self.create(schema_version)
+        histories = self.learn(ngramutil, ["i want to go out now"])
+
+        self.assertTrue(update_language_model(ngramutil, histories))
+
+        self.assertFalse(ngramutil.lm_stale)
+        updated = self.model_rows(ngramutil)
+        self.assertIn(("out", "now"), updated)
+        self.assertIn(("go", "out", "now"), updated)
+
+        # the updated contexts are distributions again
+        model = KneserNeyModel(ngramutil, 3)
+        vocab = [ngram[0] for ngram, _ in ngramutil.ngram_counts(1)]
+        for history in [[], ["out"], ["go", "out"]]:
+            scores = model.score(history, vocab)
+            self.assertAlmostEqual(sum(10**score for score in scores.values()), 1.0, places=6)
+
+        # and close to a rebuilt model
+        build_language_model(ngramutil, 3)
+        for ngram, (prob, _) in self.model_rows(ngramutil).items():
+            self.assertAlmostEqual(updated[ngram][0], prob, delta=0.05)
+
+    def test_model_without_discounts_is_not_updated(self):
+        ngramutil = self.create()
+        ngramutil.connection.execute_query("DELETE FROM meta WHERE key = 'lm_discounts';")
+        ngramutil._meta = None
+        built = self.model_rows(ngramutil)
+
+        self.assertFalse(update_language_model(ngramutil, self.learn(ngramutil, ["go out"])))
+        self.assertEqual(self.model_rows(ngramutil), built)
+
+
+if __name__ == "__main__":
+    unittest.main()
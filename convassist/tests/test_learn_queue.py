@@ -0,0 +1,92 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import tempfile
+import threading
+import unittest
+
+from convassist.utilities.learn_queue import LearnQueue
+
+
+class TestLearnQueue(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tempdir.name, "learn_queue.db")
+        self.batches = []
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.stop(timeout=5)
+        self.tempdir.cleanup()
+
+    def make_queue(self, learn=None, batch_size=32):
+        queue = LearnQueue(self.database, learn or self.batches.append, batch_size)
+        self.queues.append(queue)
+        return queue
+
+    def test_learns_in_order(self):
+        queue = self.make_queue()
+        queue.start()
+        for text in ["one", "two", "three"]:
+            queue.put(text)
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(
+            [text for batch in self.batches for text in batch], ["one", "two", "three"]
+        )
+        self.assertEqual(len(queue), 0)
+
+    def test_batches(self):
+        queue = self.make_queue(batch_size=2)
+        for text in ["one", "two", "three"]:
+            queue.put(text)
+        queue.start()
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(self.batches, [["one", "two"], ["three"]])
+
+    def test_put_does_not_wait_for_learning(self):
+        release = threading.Event()
+        queue = self.make_queue(learn=lambda texts: release.wait(5))
+        queue.start()
+
+        queue.put("one")
+        queue.put("two")
+        self.assertFalse(queue.join(timeout=0.1))
+
+        release.set()
+        self.assertTrue(queue.join(timeout=5))
+
+    def test_queued_texts_survive_a_restart(self):
+        queue = self.make_queue()
+        queue.put("one")
+        queue.put("two")
+        queue.stop()
+
+        queue = self.make_queue()
+        self.assertEqual(len(queue), 2)
+        queue.start()
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(self.batches, [["one", "two"]])
+
+    def test_failed_batch_is_dropped(self):
+        def learn(texts):
+            self.batches.append(texts)
+            if texts == ["bad"]:
+                raise ValueError("bad")
+
+        queue = self.make_queue(learn=learn, batch_size=1)
+        queue.put("bad")
+        queue.put("good")
+        queue.start()
+
+        self.assertTrue(queue.join(timeout=5))
+        self.assertEqual(self.batches, [["bad"], ["good"]])
+        self.assertEqual(len(queue), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -45,3 +45,18 @@ class TestNgramMap(unittest.TestCase):
         self.assertEqual(ngram_map1.cardinality, card)
         self.assertEqual(ngram_map2.cardinality, card)
         self.assertListEqual(ngram_map1.all_items(), ngram_map2.all_items())
+
+    def testAccumulatePhrases(self):
+        ngram_map = NgramMap(2)
+        ngram_map.add_phrase("i want to go")
+        ngram_map.add_phrase("I want a drink")
+
+        self.assertEqual(len(ngram_map), 5)
+        self.assertEqual(ngram_map.ngrams[("i", "want")], 2)
+        self.assertIn(("i", "want", 2), list(ngram_map.rows()))
+
+    def testCutoff(self):
+        ngram_map = NgramMap(1, "to be or not to be")
+        ngram_map.cutoff(1)
+
+        self.assertEqual(ngram_map.all_items(), [(["to"], 2), (["be"], 2)])
@@ -6,7 +6,7 @@ import unittest
 from parameterized import parameterized
 
 from convassist.context_tracker import ContextTracker
-from convassist.utilities.ngram.ngramutil import NGramUtil
+from convassist.utilities.ngram.ngramutil import SCHEMA_VOCAB, NGramUtil
 
 
 class TestNGramUtil(unittest.TestCase):
@@ -81,6 +81,33 @@ class TestNGramUtil(unittest.TestCase):
 
             assert ngramutil.fetch_like(["test"], 2) == [("test", 3)]
 
+    def test_learn_adds_phrase_counts(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+
+            ngramutil.learn("test test")
+            ngramutil.learn("test test")
+
+            assert ngramutil._ngram_count(["test"]) == 4
+            assert ngramutil._ngram_count(["test", "test"]) == 2
+
+    def test_count_ngrams(self):
+        counts = NGramUtil.count_ngrams(["i want to go", "i want a drink"], 2)
+
+        assert counts[("i", "want")] == 2
+        assert counts[("want", "to")] == 1
+        assert len(counts) == 5
+
+    def test_update_keeps_existing_counts(self):
+        with NGramUtil(":memory:", 1) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+            ngramutil.learn("hello")
+
+            ngramutil.update(phrases_toAdd=["hello world", "world"])
+
+            assert ngramutil._ngram_count(["hello"]) == 1
+            assert ngramutil._ngram_count(["world"]) == 2
+
     @parameterized.expand(
         [
             ("all your bases are mine", "bases are ", "mine", 3),
@@ -108,5 +135,152 @@ class TestNGramUtil(unittest.TestCase):
             assert ngramutil.fetch_like(tokens) == [(expected, 1)]
 
 
+class TestCompactNGramUtil(unittest.TestCase):
+    def build(self, ngramutil, quantization_base=0):
+        ngramutil._create_meta_table()
+        ngramutil._create_vocab_table()
+        ngramutil._create_vocab_ngram_table(1)
+        ngramutil._create_vocab_ngram_table(2)
+
+        connection = ngramutil.connection
+        connection.execute_many(
+            "INSERT INTO vocab (id, word) VALUES (?, ?);", [(1, "i"), (2, "want"), (3, "water")]
+        )
+        connection.execute_many("INSERT INTO _1_gram VALUES (?, ?);", [(1, 4), (2, 3), (3, 2)])
+        connection.execute_many("INSERT INTO _2_gram VALUES (?, ?, ?);", [(1, 2, 3), (2, 3, 2)])
+        ngramutil._set_meta("schema_version", SCHEMA_VOCAB)
+        ngramutil._set_meta("count_sum_1", 9)
+        ngramutil._set_meta("quantization_base", quantization_base)
+
+    def test_count(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            self.build(ngramutil)
+
+            assert ngramutil.schema_version == SCHEMA_VOCAB
+            assert ngramutil.count(["i", "want"], 0, 2) == 3
+            assert ngramutil.count(["i", "want"], -1, 1) == 4
+            assert ngramutil.count(["i", "unknown"], 0, 2) == 0
+            assert ngramutil.unigram_counts_sum() == 9
+
+    def test_fetch_like(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            self.build(ngramutil)
+
+            assert ngramutil.fetch_like(["want", "wa"]) == [("water", 2)]
+            assert ngramutil.fetch_like(["i", ""]) == [("want", 3)]
+            assert ngramutil.fetch_like(["unknown", ""]) == []
+
+    def test_quantized_counts(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            self.build(ngramutil, quantization_base=2)
+
+            assert ngramutil.count(["i", "want"], 0, 2) == 8
+            assert ngramutil.fetch_like(["want", "wa"]) == [("water", 4)]
+
+    def test_quantized_is_read_only(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            self.build(ngramutil, quantization_base=2)
+
+            with self.assertRaises(Exception):
+                ngramutil.learn("i want water")
+
+    def test_learn(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            self.build(ngramutil)
+
+            ngramutil.learn("i want tea")
+
+            assert ngramutil.count(["i", "want"], 0, 2) == 4
+            assert ngramutil.count(["want", "tea"], 0, 2) == 1
+            # the stored sum is dropped once the database is written to
+            assert ngramutil.unigram_counts_sum() == 12
+
+    def test_create_vocab_schema(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            ngramutil.create_update_ngram_tables(SCHEMA_VOCAB)
+            ngramutil.learn("i want water")
+            ngramutil.learn("i want")
+
+            assert ngramutil.schema_version == SCHEMA_VOCAB
+            assert ngramutil.fetch_like(["i", "w"]) == [("want", 2)]
+            assert ngramutil.unigram_counts_sum() == 5
+
+    def test_migrate_text_schema(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+            ngramutil.learn("i want water")
+            ngramutil.learn("i want")
+
+            ngramutil.create_update_ngram_tables(SCHEMA_VOCAB)
+
+            assert ngramutil.schema_version == SCHEMA_VOCAB
+            assert ngramutil.count(["i", "want"], 0, 2) == 2
+            assert ngramutil.count(["want", "water"], 0, 2) == 1
+            assert ngramutil.unigram_counts_sum() == 5
+
+            # the schema of an existing database is kept by default
+            ngramutil.create_update_ngram_tables()
+            assert ngramutil.schema_version == SCHEMA_VOCAB
+
+
+class TestPrefixCase(unittest.TestCase):
+    """Prefix completion ignores the case of ASCII letters, as LIKE 'prefix%' did."""
+
+    WORDS = [("Hello", 4), ("HELP", 3), ("help", 2), ("helm", 1), ("hex", 5), ("hel_o", 1)]
+
+    def fetch_like(self, ngramutil, prefix):
+        return sorted(ngramutil.fetch_like([prefix]))
+
+    @parameterized.expand([("lower", "hel"), ("upper", "HEL"), ("mixed", "hEl")])
+    def test_text_schema(self, name, prefix):
+        with NGramUtil(":memory:", 1) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+            ngramutil.connection.execute_many("INSERT INTO _1_gram VALUES (?, ?);", self.WORDS)
+
+            assert self.fetch_like(ngramutil, prefix) == sorted(
+                word for word in self.WORDS if word[0] != "hex"
+            )
+            assert self.fetch_like(ngramutil, prefix + "p") == [("HELP", 3), ("help", 2)]
+            # _ is not a wildcard
+            assert self.fetch_like(ngramutil, prefix + "_") == [("hel_o", 1)]
+
+    def test_vocab_schema(self):
+        with NGramUtil(":memory:", 1) as ngramutil:
+            ngramutil.create_update_ngram_tables(SCHEMA_VOCAB)
+            ngramutil.connection.execute_many(
+                "INSERT INTO vocab (id, word) VALUES (?, ?);",
+                [(id, word) for id, (word, _) in enumerate(self.WORDS, start=1)],
+            )
+            ngramutil.connection.execute_many(
+                "INSERT INTO _1_gram VALUES (?, ?);",
+                [(id, count) for id, (_, count) in enumerate(self.WORDS, start=1)],
+            )
+
+            assert self.fetch_like(ngramutil, "HELP") == [("HELP", 3), ("help", 2)]
+
+    def test_language_model(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+            ngramutil.replace_lm_tables(
+                [
+                    {("Hello",): (-1.0, 0.0), ("help",): (-2.0, 0.0), ("hex",): (-1.5, 0.0)},
+                    {("say", "HELLO"): (-0.5, 0.0), ("say", "hi"): (-0.7, 0.0)},
+                ]
+            )
+
+            assert ngramutil.fetch_lm_like(["hel"]) == [("Hello", -1.0), ("help", -2.0)]
+            assert ngramutil.fetch_lm_like(["say", "He"]) == [("HELLO", -0.5)]
+
+    def test_index_added_to_existing_database(self):
+        with NGramUtil(":memory:", 2) as ngramutil:
+            ngramutil.create_update_ngram_tables()
+            ngramutil.connection.execute_query("DROP INDEX idx_2_gram_lower;")
+
+            ngramutil.create_update_ngram_tables()
+
+            indexes = ngramutil.connection.fetch_all("PRAGMA index_list('_2_gram');")
+            assert "idx_2_gram_lower" in [index[1] for index in indexes]
+
+
 if __name__ == "__main__":
     unittest.main()
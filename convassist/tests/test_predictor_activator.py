@@ -1,14 +1,23 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import tempfile
+import threading
+import time
 import unittest
 from configparser import ConfigParser
+from functools import partial
 from unittest.mock import MagicMock, patch
 
 from convassist.combiner.meritocrity_combiner import MeritocracyCombiner
+from convassist.context_tracker import ContextTracker
+from convassist.predictor.predictor import Predictor
 from convassist.predictor.spell_correct_predictor import SpellCorrectPredictor
+from convassist.predictor.utilities.prediction import Prediction
 from convassist.predictor_activator import PredictorActivator
 from convassist.predictor_registry import PredictorRegistry
+from convassist.utilities.learn_queue import LearnQueue
 
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
@@ -25,7 +34,7 @@ class TestPredictorActivator(unittest.TestCase):
         self.logger = MagicMock()
 
         self.activator = PredictorActivator(
-            self.config, self.registry, self.context_tracker, self.logger
+            "TEST", self.config, self.registry, self.context_tracker, self.logger
         )
 
     @patch.object(MeritocracyCombiner, "combine", return_value=([], []))
@@ -67,6 +76,7 @@ class TestPredictorActivator(unittest.TestCase):
 
         spell_predictor_mock = MagicMock(spec=SpellCorrectPredictor)
         spell_predictor_mock.predict.return_value = ([], ["corrected_word"])
+        spell_predictor_mock.lock = threading.RLock()
 
         self.registry.__len__.return_value = 1
         self.registry.__iter__.return_value = [predictor_mock]
@@ -82,6 +92,28 @@ class TestPredictorActivator(unittest.TestCase):
         self.assertEqual(result, ([], [], [], []))
         combiner_mock.combine.assert_called()
 
+    def test_predict_skips_predictor_still_loading(self):
+        loading_mock = MagicMock()
+        loading_mock.ready = False
+        loading_mock.predictor_name = "LoadingPredictor"
+
+        predictor_mock = MagicMock()
+        predictor_mock.predict.return_value = (["sentence"], ["word"])
+        predictor_mock.predictor_name = "MockPredictor"
+
+        self.registry.__len__.return_value = 2
+        self.registry.__iter__.return_value = [loading_mock, predictor_mock]
+
+        combiner_mock = MagicMock(spec=MeritocracyCombiner)
+        combiner_mock.combine.return_value = ([], [])
+        self.activator.combiner = combiner_mock
+
+        self.activator.predict()
+
+        loading_mock.predict.assert_not_called()
+        predictor_mock.predict.assert_called_once()
+        self.logger.info.assert_any_call("Predictor LoadingPredictor is still loading, skipping.")
+
     def test_predict_with_exception(self):
         predictor_mock = MagicMock()
         predictor_mock.predict.side_effect = Exception("Test Exception")
@@ -102,5 +134,162 @@ class TestPredictorActivator(unittest.TestCase):
         self.logger.critical.assert_called_with("Predictor MockPredictor: Test Exception", exc_info=True, stack_info=True)
 
 
+
+class ExclusivePredictor:
+    """A predictor that records whether it was ever used by two threads at once."""
+
+    predictor_name = "ExclusivePredictor"
+    ready = True
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.busy = False
+        self.overlapped = False
+        self.learned = []
+
+    def _use(self):
+        if self.busy:
+            self.overlapped = True
+        self.busy = True
+        time.sleep(0.001)
+        self.busy = False
+
+    def wait_until_ready(self, timeout=None):
+        return True
+
+    def predict(self, max_partial_prediction_size, filter):
+        self._use()
+        return [], []
+
+    def learn_many(self, texts):
+        self._use()
+        self.learned.extend(texts)
+
+
+class TestPredictorActivatorThreads(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        config = ConfigParser()
+        config.add_section("Selector")
+        config.set("Selector", "suggestions", "10")
+
+        self.predictor = ExclusivePredictor()
+        registry = MagicMock(spec=PredictorRegistry)
+        registry.__len__.return_value = 1
+        registry.__iter__.side_effect = lambda: iter([self.predictor])
+        registry.get_predictor.return_value = None
+
+        self.activator = PredictorActivator("TEST", config, registry, MagicMock(), MagicMock())
+        self.activator.combiner = MagicMock(spec=MeritocracyCombiner)
+        self.activator.combiner.combine.return_value = ([], [])
+        self.queue = LearnQueue(
+            os.path.join(self.tempdir.name, "learn_queue.db"),
+            partial(self.activator.learn_texts, wait=True),
+            batch_size=1,
+            logger=MagicMock(),
+        )
+
+    def tearDown(self):
+        self.queue.stop(timeout=5)
+        self.tempdir.cleanup()
+
+    def test_learning_from_the_queue_while_predicting(self):
+        texts = [f"text {i}" for i in range(50)]
+        self.queue.start()
+        for text in texts:
+            self.queue.put(text)
+
+        while len(self.predictor.learned) < len(texts):
+            self.activator.predict()
+
+        self.assertTrue(self.queue.join(timeout=5))
+        self.assertEqual(self.predictor.learned, texts)
+        self.assertFalse(self.predictor.overlapped)
+
+
+class LoadingPredictor(Predictor):
+    loads_models = True
+
+    def __init__(self, *args, fail=False, **kwargs):
+        self.release = threading.Event()
+        self.fail = fail
+        self.learned = []
+        super().__init__(*args, **kwargs)
+
+    def configure(self):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("model not found")
+
+    def predict(self, max_partial_prediction_size=None, filter=None):
+        return Prediction(), Prediction()
+
+    def learn_many(self, phrases):
+        self.learned.extend(phrases)
+
+
+class TestLearnWhileLoading(unittest.TestCase):
+    def setUp(self):
+        config = ConfigParser()
+        config["Selector"] = {"suggestions": "10"}
+        config["LoadingPredictor"] = {"background_load": "True"}
+        self.config = config
+
+        self.registry = MagicMock(spec=PredictorRegistry)
+        self.registry.__iter__.side_effect = lambda: iter(self.predictors)
+        self.activator = PredictorActivator(
+            "TEST", config, self.registry, MagicMock(), MagicMock()
+        )
+
+    def make_predictor(self, fail=False):
+        predictor = LoadingPredictor(self.config, ContextTracker(), "LoadingPredictor", fail=fail)
+        self.addCleanup(predictor.release.set)
+        self.predictors = [predictor]
+        return predictor
+
+    def test_learning_does_not_wait_for_loading(self):
+        predictor = self.make_predictor()
+
+        thread = threading.Thread(target=self.activator.learn_texts, args=(["one", "two"],))
+        thread.start()
+        thread.join(2)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(predictor.learned, [])
+
+        predictor.release.set()
+        predictor._loader.join(5)
+        self.assertEqual(predictor.learned, ["one", "two"])
+
+        self.activator.learn_texts(["three"])
+        self.assertEqual(predictor.learned, ["one", "two", "three"])
+
+    def test_texts_are_dropped_if_loading_fails(self):
+        predictor = self.make_predictor(fail=True)
+
+        self.activator.learn_texts(["one"])
+        predictor.release.set()
+        predictor._loader.join(5)
+        self.activator.learn_texts(["two"])
+
+        self.assertFalse(predictor.ready)
+        self.assertEqual(predictor.learned, [])
+
+    def test_wait_blocks_until_loaded(self):
+        predictor = self.make_predictor()
+
+        thread = threading.Thread(
+            target=self.activator.learn_texts, args=(["one"],), kwargs={"wait": True}
+        )
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+
+        predictor.release.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(predictor.learned, ["one"])
+
+
 if __name__ == "__main__":
     unittest.main()
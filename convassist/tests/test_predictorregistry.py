@@ -3,16 +3,33 @@
 
 import configparser
 import logging
+import threading
 import unittest
 from unittest.mock import mock_open, patch
 from parameterized import parameterized
 
 from convassist.context_tracker import ContextTracker
+from convassist.predictor.predictor import Predictor
+from convassist.predictor.utilities.prediction import Prediction
 from convassist.predictor_registry import PredictorRegistry
 
 # from unittest.mock import mock_open, patch
 
 
+class SlowPredictor(Predictor):
+    loads_models = True
+
+    def __init__(self, *args, **kwargs):
+        self.release = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def configure(self):
+        self.release.wait(5)
+
+    def predict(self, max_partial_prediction_size=None, filter=None):
+        return Prediction(), Prediction()
+
+
 class TestPredictorRegistry(unittest.TestCase):
     def setUp(self):
         self.config = configparser.ConfigParser()
@@ -51,7 +68,25 @@ class TestPredictorRegistry(unittest.TestCase):
         self.predictor_registry.set_predictors(
             self.config, self.context_tracker, logging.getLogger()
         )
-        self.assertFalse(self.predictor_registry.model_status())
+        self.assertTrue(self.predictor_registry.model_status())
+        self.assertEqual(
+            self.predictor_registry.predictor_status(), {"SpellCorrectPredictor": True}
+        )
+
+    def test_model_status_background_load(self):
+        self.config["SlowPredictor"] = {"background_load": "True"}
+
+        predictor = SlowPredictor(self.config, self.context_tracker, "SlowPredictor")
+        self.predictor_registry.append(predictor)
+
+        self.assertFalse(predictor.ready)
+        self.assertIs(self.predictor_registry.model_status(), False)
+        self.assertEqual(self.predictor_registry.predictor_status(), {"SlowPredictor": False})
+
+        predictor.release.set()
+        self.assertTrue(predictor.wait_until_ready(5))
+        self.assertIs(self.predictor_registry.model_status(), True)
+        self.assertEqual(self.predictor_registry.predictor_status(), {"SlowPredictor": True})
 
     @parameterized.expand(
         [
@@ -0,0 +1,113 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from parameterized import parameterized
+
+from convassist.predictor.utilities.prefix_cache import PrefixCache
+
+WORDS = {
+    ("the",): [("square", 5), ("sun", 4), ("squirrel", 3), ("same", 2), ("sea", 1)],
+    ("a",): [("square", 2), ("seat", 1)],
+}
+
+
+class FakeNGramUtil:
+    def __init__(self):
+        self.calls = []
+
+    def fetch_like(self, ngram, limit=-1):
+        self.calls.append((tuple(ngram), limit))
+        prefix = ngram[-1].lower()
+        rows = [row for row in WORDS.get(tuple(ngram[:-1]), []) if row[0].startswith(prefix)]
+        return rows if limit < 0 else rows[:limit]
+
+
+class TestPrefixCache(unittest.TestCase):
+    def setUp(self):
+        self.ngramutil = FakeNGramUtil()
+        self.cache = PrefixCache(rows=3)
+
+    def fetch(self, ngram, limit):
+        return self.cache.fetch_like(self.ngramutil.fetch_like, ngram, limit)
+
+    @parameterized.expand(
+        [
+            ("extended_prefix", ["the", "sq"], 2),
+            ("same_prefix", ["the", "s"], 2),
+            ("all_rows", ["the", "sq"], -1),
+        ]
+    )
+    def test_matches_database(self, name, ngram, limit):
+        self.fetch(["the", "s"], 2)
+        self.assertEqual(self.fetch(ngram, limit), self.ngramutil.fetch_like(ngram, limit))
+
+    def test_extended_prefix_is_filtered_in_memory(self):
+        self.fetch(["the", "s"], 2)
+        self.assertEqual(self.fetch(["the", "sq"], 2), [("square", 5), ("squirrel", 3)])
+        self.assertEqual(self.fetch(["the", "squ"], 2), [("square", 5), ("squirrel", 3)])
+
+        # the first query fetched the cache's rows, not just the limit
+        self.assertEqual(self.ngramutil.calls, [(("the", "s"), 3)])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_truncated_rows_are_exhausted(self):
+        self.fetch(["the", "s"], 2)
+        # only one of the three kept rows starts with "su", more may be in the database
+        self.assertEqual(self.fetch(["the", "su"], 2), [("sun", 4)])
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_case_is_ignored(self):
+        self.fetch(["the", "S"], 2)
+        self.assertEqual(self.fetch(["the", "sQ"], 2), [("square", 5), ("squirrel", 3)])
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_complete_rows_answer_any_extension(self):
+        self.fetch(["a", ""], 2)
+        self.assertEqual(self.fetch(["a", "se"], 2), [("seat", 1)])
+        self.assertEqual(self.fetch(["a", "x"], 2), [])
+        self.assertEqual(self.cache.misses, 1)
+
+    @parameterized.expand(
+        [
+            ("other_history", ["a", "sq"]),
+            ("shorter_prefix", ["the", ""]),
+            ("other_prefix", ["the", "t"]),
+        ]
+    )
+    def test_misses(self, name, ngram):
+        self.fetch(["the", "s"], 2)
+        self.fetch(ngram, 2)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_orders_are_kept_apart(self):
+        self.fetch(["the", "s"], 2)
+        self.fetch(["s"], 2)
+        self.fetch(["the", "sq"], 2)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_disabled(self):
+        cache = PrefixCache(rows=0)
+        for _ in range(2):
+            cache.fetch_like(self.ngramutil.fetch_like, ["the", "s"], 2)
+        self.assertEqual(len(self.ngramutil.calls), 2)
+
+    def test_scores_follow_history(self):
+        self.cache.scores(["the"])["square"] = 0.5
+        self.assertEqual(self.cache.scores(["the"]), {"square": 0.5})
+        self.assertEqual(self.cache.scores(["a"]), {})
+        self.assertEqual(self.cache.scores(["the"]), {})
+
+    def test_clear(self):
+        self.fetch(["the", "s"], 2)
+        self.cache.scores(["the"])["square"] = 0.5
+        self.cache.clear()
+
+        self.fetch(["the", "sq"], 2)
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.cache.scores(["the"]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from convassist.predictor.utilities.sentence_encoder import (
+    SentenceEncoder,
+    SentenceEncoderRegistry,
+)
+from convassist.utilities.singleton import Singleton
+
+
+@patch("convassist.predictor.utilities.sentence_encoder.SentenceTransformer")
+class TestSentenceEncoderRegistry(unittest.TestCase):
+    def setUp(self):
+        Singleton._instances.pop(SentenceEncoderRegistry, None)
+
+    def tearDown(self):
+        Singleton._instances.pop(SentenceEncoderRegistry, None)
+
+    def test_same_model_and_device_is_shared(self, mock_st):
+        encoder1 = SentenceEncoderRegistry().get_encoder("model", "cpu")
+        encoder2 = SentenceEncoderRegistry().get_encoder("model", "cpu")
+
+        self.assertIs(encoder1, encoder2)
+        self.assertIsInstance(encoder1, SentenceEncoder)
+        mock_st.assert_called_once_with("model", device="cpu")
+
+    def test_different_keys_load_different_models(self, mock_st):
+        registry = SentenceEncoderRegistry()
+        encoder1 = registry.get_encoder("model", "cpu")
+        encoder2 = registry.get_encoder("model", "cuda")
+        encoder3 = registry.get_encoder("other_model", "cpu")
+
+        self.assertIsNot(encoder1, encoder2)
+        self.assertIsNot(encoder1, encoder3)
+        self.assertEqual(len(registry), 3)
+        self.assertEqual(mock_st.call_count, 3)
+
+    def test_model_kwargs_are_part_of_key(self, mock_st):
+        registry = SentenceEncoderRegistry()
+        encoder1 = registry.get_encoder(
+            "model", "cpu", tokenizer_kwargs={"clean_up_tokenization_spaces": True}
+        )
+        encoder2 = registry.get_encoder(
+            "model", "cpu", tokenizer_kwargs={"clean_up_tokenization_spaces": True}
+        )
+        encoder3 = registry.get_encoder(
+            "model", "cpu", tokenizer_kwargs={"clean_up_tokenization_spaces": False}
+        )
+        encoder4 = registry.get_encoder("model", "cpu")
+
+        self.assertIs(encoder1, encoder2)
+        self.assertIsNot(encoder1, encoder3)
+        self.assertIsNot(encoder1, encoder4)
+        self.assertEqual(mock_st.call_count, 3)
+
+    def test_source_kwargs_are_not_part_of_key(self, mock_st):
+        registry = SentenceEncoderRegistry()
+        encoder1 = registry.get_encoder("model", "cpu", local_files_only=True)
+        encoder2 = registry.get_encoder("model", "cpu", local_files_only=False)
+
+        self.assertIs(encoder1, encoder2)
+        mock_st.assert_called_once_with("model", device="cpu", local_files_only=True)
+
+    def test_concurrent_requests_load_once(self, mock_st):
+        encoders = []
+
+        def get():
+            encoders.append(SentenceEncoderRegistry().get_encoder("model", "cpu"))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(mock_st.call_count, 1)
+        self.assertTrue(all(e is encoders[0] for e in encoders))
+
+    @patch("convassist.predictor.utilities.sentence_encoder.quantize_int8")
+    def test_quantized_model_is_loaded_separately(self, mock_quantize, mock_st):
+        registry = SentenceEncoderRegistry()
+        encoder = registry.get_encoder("model", "cpu")
+        quantized = registry.get_encoder("model", "cpu", quantize=True)
+
+        self.assertIsNot(encoder, quantized)
+        self.assertFalse(encoder.quantized)
+        self.assertTrue(quantized.quantized)
+        mock_quantize.assert_called_once_with(quantized.model, quantized.logger)
+
+    @patch("convassist.predictor.utilities.sentence_encoder.quantize_int8", return_value=False)
+    def test_quantize_without_torchao(self, mock_quantize, mock_st):
+        encoder = SentenceEncoderRegistry().get_encoder("model", "cpu", quantize=True)
+
+        self.assertFalse(encoder.quantized)
+        mock_quantize.assert_called_once()
+
+    @patch("convassist.predictor.utilities.sentence_encoder.quantize_int8")
+    def test_quantize_is_cpu_only(self, mock_quantize, mock_st):
+        encoder = SentenceEncoderRegistry().get_encoder("model", "cuda", quantize=True)
+
+        self.assertFalse(encoder.quantized)
+        mock_quantize.assert_not_called()
+
+    def test_onnx_model_is_exported_once(self, mock_st):
+        def save_pretrained(path):
+            open(os.path.join(path, "model.onnx"), "w").close()
+
+        mock_st.return_value.save_pretrained.side_effect = save_pretrained
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            encoder = SentenceEncoderRegistry().get_encoder(
+                "models/model", "cpu", backend="onnx", export_dir=export_dir
+            )
+            export_path = os.path.join(export_dir, "model-onnx")
+
+            self.assertEqual(encoder.backend, "onnx")
+            self.assertEqual(mock_st.call_args.args, ("models/model",))
+            self.assertEqual(mock_st.call_args.kwargs["backend"], "onnx")
+            mock_st.return_value.save_pretrained.assert_called_once()
+            self.assertEqual(os.listdir(export_dir), ["model-onnx"])
+            self.assertEqual(os.listdir(export_path), ["model.onnx"])
+
+            SentenceEncoderRegistry().clear()
+            SentenceEncoderRegistry().get_encoder(
+                "models/model", "cpu", backend="onnx", export_dir=export_dir
+            )
+
+            self.assertEqual(mock_st.call_args.args, (export_path,))
+            mock_st.return_value.save_pretrained.assert_called_once()
+
+    def test_interrupted_onnx_export_is_not_kept(self, mock_st):
+        def save_pretrained(path):
+            open(os.path.join(path, "config.json"), "w").close()
+            raise OSError("No space left on device")
+
+        mock_st.return_value.save_pretrained.side_effect = save_pretrained
+
+        with tempfile.TemporaryDirectory() as export_dir:
+            encoder = SentenceEncoderRegistry().get_encoder(
+                "model", "cpu", backend="onnx", export_dir=export_dir
+            )
+
+            # the exported model is used, but a later start exports it again
+            self.assertEqual(encoder.backend, "onnx")
+            self.assertEqual(os.listdir(export_dir), [])
+
+    def test_export_dir_is_part_of_key(self, mock_st):
+        registry = SentenceEncoderRegistry()
+        with tempfile.TemporaryDirectory() as dir1, tempfile.TemporaryDirectory() as dir2:
+            encoder1 = registry.get_encoder("model", "cpu", backend="onnx", export_dir=dir1)
+            encoder2 = registry.get_encoder("model", "cpu", backend="onnx", export_dir=dir2)
+            torch1 = registry.get_encoder("model", "cpu", export_dir=dir1)
+            torch2 = registry.get_encoder("model", "cpu", export_dir=dir2)
+
+        self.assertIsNot(encoder1, encoder2)
+        # only the onnx backend uses the export directory
+        self.assertIs(torch1, torch2)
+
+    def test_loading_does_not_block_other_models(self, mock_st):
+        loading = threading.Event()
+        release = threading.Event()
+
+        def load(model_name, **kwargs):
+            if model_name == "slow":
+                loading.set()
+                release.wait(10)
+            return MagicMock()
+
+        mock_st.side_effect = load
+        registry = SentenceEncoderRegistry()
+        slow = threading.Thread(target=registry.get_encoder, args=("slow", "cpu"))
+        fast = threading.Thread(target=registry.get_encoder, args=("fast", "cpu"))
+        slow.start()
+        loading.wait(10)
+
+        try:
+            fast.start()
+            fast.join(2)
+            self.assertFalse(fast.is_alive())
+        finally:
+            release.set()
+            slow.join()
+            fast.join()
+        self.assertEqual(len(registry), 2)
+
+    def test_onnx_falls_back_to_torch(self, mock_st):
+        def load(model_name, device, backend="torch", **kwargs):
+            if backend == "onnx":
+                raise Exception(
+                    "Using the ONNX backend requires installing Optimum and ONNX Runtime."
+                )
+            return MagicMock()
+
+        mock_st.side_effect = load
+
+        encoder = SentenceEncoderRegistry().get_encoder("model", "cpu", backend="onnx")
+
+        self.assertEqual(encoder.backend, "torch")
+        self.assertEqual(mock_st.call_count, 2)
+        self.assertEqual(mock_st.call_args.kwargs, {"device": "cpu"})
+
+    @patch("convassist.predictor.utilities.sentence_encoder.quantize_int8")
+    def test_onnx_ignores_quantize(self, mock_quantize, mock_st):
+        registry = SentenceEncoderRegistry()
+        encoder = registry.get_encoder("model", "cpu", backend="onnx")
+        quantized = registry.get_encoder("model", "cpu", quantize=True, backend="onnx")
+
+        self.assertIs(encoder, quantized)
+        self.assertEqual(len(registry), 1)
+        mock_quantize.assert_not_called()
+
+    def test_onnx_is_cpu_only(self, mock_st):
+        encoder = SentenceEncoderRegistry().get_encoder("model", "cuda", backend="onnx")
+
+        self.assertEqual(encoder.backend, "torch")
+        mock_st.assert_called_once_with("model", device="cuda")
+
+    def test_encode_delegates_to_model(self, mock_st):
+        model = MagicMock()
+        model.encode.return_value = [0.1, 0.2]
+        mock_st.return_value = model
+
+        encoder = SentenceEncoderRegistry().get_encoder("model", "cpu")
+        result = encoder.encode("hello", convert_to_numpy=True)
+
+        self.assertEqual(result, [0.1, 0.2])
+        model.encode.assert_called_once_with("hello", convert_to_numpy=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
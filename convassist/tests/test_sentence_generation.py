@@ -0,0 +1,233 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import configparser
+import json
+import logging
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import torch
+import transformers
+from parameterized import parameterized
+from transformers.convert_slow_tokenizer import bytes_to_unicode
+
+from convassist.predictor.sentence_completion_predictor import (
+    PromptCache,
+    SentenceCompletionPredictor,
+    SentenceEndCriteria,
+)
+
+
+class FakeTokenizer:
+    """Encodes every character as its code point."""
+
+    def __call__(self, text):
+        return {"input_ids": [ord(char) for char in text]}
+
+    def batch_decode(self, sequences):
+        return ["".join(chr(int(id)) for id in sequence) for sequence in sequences]
+
+
+def encode(texts):
+    return torch.tensor([[ord(char) for char in text] for text in texts])
+
+
+class TestSentenceEndCriteria(unittest.TestCase):
+    @parameterized.expand(
+        [
+            ("no_end", ["hi, how are"], [False]),
+            ("period", ["hi, go home."], [True]),
+            ("question", ["hi, why? no"], [True]),
+            ("eos_marker", ["hi, ok <eos>"], [True]),
+            ("per_sequence", ["hi, yes!", "hi, nope"], [True, False]),
+        ]
+    )
+    def test_call(self, name, texts, expected):
+        # the prompt "hi." ends a sentence itself, which must not stop generation
+        criteria = SentenceEndCriteria(FakeTokenizer(), prompt_length=3)
+        self.assertEqual(criteria(encode(texts), None).tolist(), expected)
+
+
+class TestGenerationKwargs(unittest.TestCase):
+    def setUp(self):
+        self.predictor = object.__new__(SentenceCompletionPredictor)
+        self.predictor.logger = logging.getLogger("test")
+        self.predictor.sentence_generator = SimpleNamespace(tokenizer=FakeTokenizer())
+        self.predictor._decoding = "beam"
+        self.predictor._max_new_tokens = 12
+        self.predictor._num_beams = 4
+        self.predictor._top_k = 5
+
+    @parameterized.expand(
+        [
+            (
+                "diverse_beam",
+                True,
+                {
+                    "num_beams": 4,
+                    "num_beam_groups": 4,
+                    "num_return_sequences": 4,
+                    "do_sample": False,
+                },
+            ),
+            (
+                "diverse_beam",
+                False,
+                {"num_beams": 4, "num_return_sequences": 4, "do_sample": False},
+            ),
+            ("beam", False, {"num_beams": 4, "num_return_sequences": 4, "do_sample": False}),
+            ("greedy", False, {"num_beams": 1, "num_return_sequences": 1, "do_sample": False}),
+            ("sample", False, {"top_k": 5, "num_return_sequences": 4, "do_sample": True}),
+            ("unknown", False, {"num_beams": 4, "num_return_sequences": 4, "do_sample": False}),
+        ]
+    )
+    def test_decoding(self, decoding, group_beam_search, expected):
+        self.predictor._decoding = decoding
+        with patch(
+            "convassist.predictor.sentence_completion_predictor.GROUP_BEAM_SEARCH_BUILTIN",
+            group_beam_search,
+        ):
+            kwargs = self.predictor._generation_kwargs(self.predictor._decoding_mode(), 10)
+
+        for key, value in expected.items():
+            self.assertEqual(kwargs[key], value)
+        if "num_beam_groups" not in expected:
+            self.assertNotIn("num_beam_groups", kwargs)
+        self.assertEqual(kwargs["max_new_tokens"], 12)
+        self.assertEqual(kwargs["stopping_criteria"][0].prompt_length, 10)
+
+
+class TestRunGenerator(unittest.TestCase):
+    """Generates with a tiny GPT-2 whose tokenizer has one token per byte."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        vocab = {char: id for id, char in enumerate(bytes_to_unicode().values())}
+        vocab["<|endoftext|>"] = len(vocab)
+        vocab_file = os.path.join(cls.tempdir.name, "vocab.json")
+        merges_file = os.path.join(cls.tempdir.name, "merges.txt")
+        with open(vocab_file, "w") as f:
+            json.dump(vocab, f)
+        with open(merges_file, "w") as f:
+            f.write("#version: 0.2\n")
+
+        tokenizer = transformers.GPT2Tokenizer(vocab_file, merges_file)
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+        torch.manual_seed(0)
+        config = transformers.GPT2Config(
+            vocab_size=len(vocab),
+            n_positions=128,
+            n_embd=32,
+            n_layer=2,
+            n_head=2,
+            bos_token_id=len(vocab) - 1,
+            eos_token_id=len(vocab) - 1,
+        )
+        model = transformers.GPT2LMHeadModel(config).eval()
+        cls.generator = transformers.pipeline(
+            "text-generation", model=model, tokenizer=tokenizer, device=-1
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        # the default options, without loading the configured models
+        patcher = patch.object(SentenceCompletionPredictor, "configure")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.predictor = SentenceCompletionPredictor(
+            config=configparser.ConfigParser(),
+            context_tracker=None,
+            predictor_name="SentenceCompletionPredictor",
+            logger=logging.getLogger("test"),
+        )
+        self.predictor._loaded.wait()
+        self.predictor.sentence_generator = self.generator
+
+    def generate(self, prompts):
+        results = []
+        for prompt in prompts:
+            torch.manual_seed(0)
+            results.append(self.predictor._run_generator(prompt))
+        return results
+
+    def test_default_decoding(self):
+        result = self.predictor._run_generator("<bos>hello")
+
+        self.assertEqual(len(result), self.predictor.num_beams)
+        for generated in result:
+            self.assertTrue(generated["generated_text"].startswith("<bos>hello"))
+
+    @parameterized.expand([("beam",), ("greedy",), ("sample",)])
+    def test_cache_reuse_matches_uncached_generation(self, decoding):
+        self.predictor._decoding = decoding
+        prompts = ["<bos>hello", "<bos>hello wor", "<bos>help"]
+
+        self.predictor._kv_cache_reuse = True
+        cached = self.generate(prompts)
+        self.predictor._kv_cache_reuse = False
+        uncached = self.generate(prompts)
+
+        self.assertGreater(self.predictor.prompt_cache.reused, 0)
+        self.assertEqual(cached, uncached)
+
+
+class TestPromptCache(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        config = transformers.GPT2Config(
+            vocab_size=64, n_positions=64, n_embd=16, n_layer=2, n_head=2
+        )
+        self.model = transformers.GPT2LMHeadModel(config).eval()
+        self.cache = PromptCache()
+
+    def generate(self, ids, past_key_values=None):
+        input_ids = torch.tensor([ids])
+        output = self.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            do_sample=False,
+            max_new_tokens=5,
+            pad_token_id=0,
+        )
+        return output[0].tolist()
+
+    @parameterized.expand(
+        [
+            ("extended", [1, 2, 3, 4], [1, 2, 3, 4, 5, 6], 3),
+            ("edited", [1, 2, 3, 4], [1, 2, 7, 8], 2),
+            ("unrelated", [1, 2, 3], [9, 8, 7], 0),
+            ("same", [1, 2, 3], [1, 2, 3], 2),
+        ]
+    )
+    def test_matches_uncached_generation(self, name, first, second, reused):
+        self.cache.extend(self.model, first)
+        past_key_values = self.cache.extend(self.model, second)
+
+        self.assertEqual(self.cache.reused, reused)
+        self.assertEqual(self.cache.ids, second[:-1])
+        self.assertEqual(self.generate(second, past_key_values), self.generate(second))
+
+    def test_copies_are_independent(self):
+        self.cache.extend(self.model, [1, 2, 3, 4])
+        self.generate([1, 2, 3, 4], self.cache.extend(self.model, [1, 2, 3, 4]))
+
+        self.assertEqual(self.cache.cache.get_seq_length(), 3)
+
+    def test_clear(self):
+        self.cache.extend(self.model, [1, 2, 3])
+        self.cache.clear()
+        self.assertIsNone(self.cache.cache)
+        self.assertEqual(self.cache.ids, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import unittest
+
+import hnswlib
+import numpy
+from parameterized import parameterized
+
+from convassist.predictor.sentence_completion_predictor import (
+    SentenceCompletionPredictor,
+)
+from convassist.predictor.utilities.embedding_cache import EmbeddingCache
+from convassist.utilities.singleton import Singleton
+
+
+class TestAddToIndex(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.default_rng(0)
+        self.embeddings = rng.standard_normal((50, 8)).astype(numpy.float32)
+
+        self.predictor = object.__new__(SentenceCompletionPredictor)
+        self.predictor.index = hnswlib.Index(space="cosine", dim=8)
+
+    def init_index(self, max_elements):
+        self.predictor.index.init_index(max_elements=max_elements, ef_construction=100, M=16)
+        self.predictor.index.set_ef(50)
+
+    def assertFindsEveryEmbedding(self, count):
+        ids, _ = self.predictor.index.knn_query(self.embeddings[:count], k=1)
+        self.assertEqual(ids[:, 0].tolist(), list(range(count)))
+
+    def test_whole_corpus_is_indexed(self):
+        self.init_index(40)
+        self.predictor._add_to_index(self.embeddings[:40], 0)
+
+        self.assertEqual(self.predictor.index.get_current_count(), 40)
+        self.assertEqual(self.predictor.index.get_max_elements(), 40)
+        self.assertFindsEveryEmbedding(40)
+
+    @parameterized.expand(
+        [
+            ("single_embedding", 30, 31, 45),
+            ("batch", 20, 40, 45),
+            ("batch_past_growth", 20, 50, 50),
+        ]
+    )
+    def test_full_index_grows(self, name, indexed, total, capacity):
+        self.init_index(30)
+        self.predictor._add_to_index(self.embeddings[:indexed], 0)
+
+        if total - indexed == 1:
+            # learn() adds one 1-D embedding at a time
+            self.predictor._add_to_index(self.embeddings[indexed], indexed)
+        else:
+            self.predictor._add_to_index(self.embeddings[indexed:total], indexed)
+
+        self.assertEqual(self.predictor.index.get_current_count(), total)
+        self.assertEqual(self.predictor.index.get_max_elements(), capacity)
+        self.assertFindsEveryEmbedding(total)
+
+
+class FakeEmbedder:
+    """Embeds every text as a fixed random vector."""
+
+    def __init__(self, texts, dim=8):
+        rng = numpy.random.default_rng(1)
+        self.vectors = {text: rng.standard_normal(dim).astype(numpy.float32) for text in texts}
+
+    def encode(self, sentences, convert_to_numpy=True):
+        if isinstance(sentences, str):
+            return self.vectors[sentences]
+        return numpy.vstack([self.vectors[sentence] for sentence in sentences])
+
+
+class TestTextsInCorpus(unittest.TestCase):
+    CORPUS = ["i am hungry", "i am thirsty", "open the door", "turn on the light"]
+    TEXTS = ["i am hungry", "close the door", "turn off the light", "i am tired"]
+
+    def setUp(self):
+        Singleton._instances.pop(EmbeddingCache, None)
+        self.addCleanup(Singleton._instances.pop, EmbeddingCache, None)
+
+        self.embedder = FakeEmbedder(self.CORPUS + self.TEXTS)
+        self.corpus_embeddings = self.embedder.encode(self.CORPUS)
+
+        self.predictor = object.__new__(SentenceCompletionPredictor)
+        self.predictor.logger = logging.getLogger("test")
+        self.predictor._sentence_transformer_model = "model"
+        self.predictor.embedder = self.embedder
+        self.predictor.embedding_cache = EmbeddingCache()
+        self.predictor.corpus_sentences = self.CORPUS
+        self.predictor.top_k_hits = 2
+        self.predictor.index = hnswlib.Index(space="cosine", dim=8)
+        self.predictor.index.init_index(max_elements=len(self.CORPUS), ef_construction=100, M=16)
+        self.predictor.index.add_items(self.corpus_embeddings)
+
+    def best_similarity(self, text):
+        corpus = self.corpus_embeddings / numpy.linalg.norm(
+            self.corpus_embeddings, axis=1, keepdims=True
+        )
+        vector = self.embedder.vectors[text]
+        return float(numpy.max(corpus @ (vector / numpy.linalg.norm(vector))))
+
+    def test_one_score_per_text_in_order(self):
+        scores = self.predictor._textsInCorpus(self.TEXTS)
+
+        self.assertEqual(len(scores), len(self.TEXTS))
+        for text, score in zip(self.TEXTS, scores):
+            self.assertAlmostEqual(score, self.best_similarity(text), places=5)
+        self.assertAlmostEqual(scores[0], 1.0, places=5)
+
+    def test_matches_scoring_each_text(self):
+        scores = self.predictor._textsInCorpus(self.TEXTS)
+        self.predictor.embedding_cache.clear()
+
+        for text, score in zip(self.TEXTS, scores):
+            self.assertAlmostEqual(score, self.predictor._textInCorpus(text), places=5)
+
+    def test_no_texts(self):
+        self.assertEqual(self.predictor._textsInCorpus([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import patch
+
+from convassist.predictor.utilities.stemmer import Stemmer
+from convassist.utilities.singleton import Singleton
+
+
+class TestStemmer(unittest.TestCase):
+    def setUp(self):
+        Singleton._instances.pop(Stemmer, None)
+        self.stemmer = Stemmer(max_words=2, max_texts=2)
+
+    def tearDown(self):
+        Singleton._instances.pop(Stemmer, None)
+
+    def test_shared_instance(self):
+        self.assertIs(self.stemmer, Stemmer())
+
+    def test_stem(self):
+        self.assertEqual(self.stemmer.stem("running"), "run")
+        self.assertEqual(self.stemmer.stem("running"), "run")
+        self.assertEqual(self.stemmer.stem.cache_info().hits, 1)
+
+    def test_stem_cache_is_bounded(self):
+        for word in ["running", "jumps", "walked"]:
+            self.stemmer.stem(word)
+        self.assertEqual(self.stemmer.stem.cache_info().currsize, 2)
+
+    def test_stems(self):
+        self.assertEqual(
+            self.stemmer.stems(["running", "runs", "cats"]), frozenset(["run", "cat"])
+        )
+
+    @patch("convassist.predictor.utilities.stemmer.word_tokenize", side_effect=str.split)
+    def test_text_stems(self, word_tokenize):
+        self.assertEqual(self.stemmer.text_stems("cats running"), frozenset(["cat", "run"]))
+        self.assertEqual(self.stemmer.text_stems("cats running"), frozenset(["cat", "run"]))
+        self.assertEqual(word_tokenize.call_count, 1)
+
+    def test_clear(self):
+        self.stemmer.stem("running")
+        self.stemmer.clear()
+        self.assertEqual(self.stemmer.stem.cache_info().currsize, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from convassist.predictor.utilities.svo_util import SVOUtil
+
+
+class FakeNLP:
+    """Tags every word ending in "s" as a verb and every other word as its subject."""
+
+    pipe_names = ["tok2vec", "tagger", "parser", "attribute_ruler", "ner"]
+
+    def __init__(self):
+        self.parsed = []
+        self.disabled = None
+
+    def pipe(self, sents, batch_size=None, disable=()):
+        self.disabled = list(disable)
+        for sent in sents:
+            self.parsed.append(sent)
+            yield [self._token(word) for word in sent.split()]
+
+    @staticmethod
+    def _token(word):
+        verb = word.endswith("s")
+        dep = "ROOT" if verb else "nsubj"
+        return SimpleNamespace(
+            text=word, pos_="VERB" if verb else "NOUN", dep_=dep, head=SimpleNamespace(dep_="ROOT")
+        )
+
+
+class TestSVOUtil(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        stopwords = os.path.join(self.tempdir.name, "stopwords.txt")
+        with open(stopwords, "w") as f:
+            f.write("i\nis \nthe\n")
+
+        self.nlp = FakeNLP()
+        with patch("convassist.predictor.utilities.svo_util.NLP") as nlp:
+            nlp.return_value.get_nlp.return_value = self.nlp
+            self.svo = SVOUtil(stopwords, cache_size=2)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_stopwords(self):
+        self.assertEqual(self.svo.stopwords, frozenset(["i", "is", "the"]))
+        self.assertEqual(self.svo.extract_svo("I likes the Cake"), ["likes", "cake"])
+
+    def test_unused_components_disabled(self):
+        self.svo.extract_svo("cat runs")
+        self.assertEqual(self.nlp.disabled, ["ner"])
+
+    def test_batch_parses_each_sentence_once(self):
+        tokens = self.svo.extract_svo_many(["cat runs", "dog sits", "cat runs"])
+
+        self.assertEqual(tokens, [["cat", "runs"], ["dog", "sits"], ["cat", "runs"]])
+        self.assertEqual(self.nlp.parsed, ["cat runs", "dog sits"])
+
+    def test_cached(self):
+        first = self.svo.extract_svo("cat runs")
+        first.append("changed")
+
+        self.assertEqual(self.svo.extract_svo("cat runs"), ["cat", "runs"])
+        self.assertEqual(self.nlp.parsed, ["cat runs"])
+
+    def test_cache_is_bounded(self):
+        self.svo.extract_svo_many(["cat runs", "dog sits"])
+        self.svo.extract_svo("cat runs")
+        self.svo.extract_svo("bird flies")
+
+        # "dog sits" was the least recently used sentence
+        self.svo.extract_svo_many(["cat runs", "bird flies", "dog sits"])
+        self.assertEqual(self.nlp.parsed, ["cat runs", "dog sits", "bird flies", "dog sits"])
+
+    def test_cache_disabled(self):
+        self.svo.cache_size = 0
+        self.svo.extract_svo("cat runs")
+        self.svo.extract_svo("cat runs")
+        self.assertEqual(self.nlp.parsed, ["cat runs", "cat runs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
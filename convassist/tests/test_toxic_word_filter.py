@@ -0,0 +1,42 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from parameterized import parameterized
+
+from convassist.predictor.utilities.toxic_word_filter import ToxicWordFilter
+
+
+class TestToxicWordFilter(unittest.TestCase):
+    def setUp(self):
+        blocked = ["darn\n", "Heck", "  ", "dang it", "son of a gun\n", "heck"]
+        self.filter = ToxicWordFilter(blocked, allowed=["heck\n"])
+
+    def test_blocklist(self):
+        self.assertEqual(self.filter.words, frozenset(["darn"]))
+        self.assertEqual(
+            self.filter.phrases,
+            {"dang": [("dang", "it")], "son": [("son", "of", "a", "gun")]},
+        )
+        self.assertEqual(len(self.filter), 3)
+
+    @parameterized.expand(
+        [
+            ("clean", "what a lovely day", []),
+            ("word", "oh darn that", ["darn"]),
+            ("case", "Oh DARN that", ["darn"]),
+            ("allowed", "oh heck", []),
+            ("partial_word", "darnation", []),
+            ("phrase", "well dang it all", ["dang it"]),
+            ("partial_phrase", "dang, it", []),
+            ("phrase_at_end", "you son of a gun", ["son of a gun"]),
+            ("several", "darn, dang it darn", ["dang it", "darn"]),
+        ]
+    )
+    def test_find(self, name, text, expected):
+        self.assertEqual(self.filter.find(text), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,7 @@ import sqlite3
 
 # import multiprocessing
 import threading
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterable, List, Optional, Tuple
 
 from convassist.utilities.databaseutils.dbconnector import DatabaseConnector, DatabaseError
 
@@ -27,27 +27,33 @@ class SQLiteDatabaseConnector(DatabaseConnector):
                 self.conn = sqlite3.connect(self.dbname, check_same_thread=False)
                 self.conn.execute("PRAGMA busy_timeout = 5000")  # 5 seconds
 
-    def execute_query(self, query: str, params: Optional[Tuple[Any, ...]] = None) -> None:
+    def execute_query(
+        self, query: str, params: Optional[Tuple[Any, ...]] = None, commit: bool = True
+    ) -> None:
         with self.lock:
             if not self.conn:
                 raise DatabaseError("Database connection is not established.")
             cursor = self.conn.cursor()
             try:
                 cursor.execute(query, params or ())
-                self.conn.commit()
+                if commit:
+                    self.conn.commit()
             except Exception as e:
                 raise DatabaseError(f"Error executing query: {e}")
             finally:
                 cursor.close()
 
-    def execute_many(self, query: str, params: List[Tuple[Any, ...]]) -> None:
+    def execute_many(
+        self, query: str, params: Iterable[Tuple[Any, ...]], commit: bool = True
+    ) -> None:
         with self.lock:
             if not self.conn:
                 raise DatabaseError("Database connection is not established.")
             cursor = self.conn.cursor()
             try:
                 cursor.executemany(query, params)
-                self.conn.commit()
+                if commit:
+                    self.conn.commit()
             except Exception as e:
                 self.conn.rollback()
                 raise DatabaseError(f"Error executing query: {e}")
@@ -0,0 +1,140 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import threading
+import time
+from typing import Callable, List
+
+from convassist.utilities.databaseutils.sqllite_dbconnector import (
+    SQLiteDatabaseConnector,
+)
+from convassist.utilities.logging_utility import LoggingUtility
+
+
+class LearnQueue:
+    """
+    A durable queue of texts to learn, drained by a background thread.
+
+    put() only appends the text to a table of a SQLite database and returns,
+    so the caller never waits for the predictors to learn.  The worker thread
+    takes up to batch_size texts at a time, oldest first, hands them to learn
+    and only then deletes them.  Texts still queued when the process stops,
+    or crashes, are learned the next time a queue is started on the database.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        learn: Callable[[List[str]], None],
+        batch_size: int = 32,
+        logger: logging.Logger | None = None,
+    ):
+        self.database = database
+        self.learn = learn
+        self.batch_size = max(1, int(batch_size))
+
+        if logger is None:
+            self.logger = LoggingUtility().get_logger(
+                "LearnQueue", log_level=logging.DEBUG, queue_handler=True
+            )
+        else:
+            self.logger = logger
+
+        self._connection = SQLiteDatabaseConnector(database)
+        # WAL keeps put() to a single append, without a full sync on every commit
+        self._connection.execute_query("PRAGMA journal_mode = WAL;")
+        self._connection.execute_query("PRAGMA synchronous = NORMAL;")
+        self._connection.create_table(
+            "learn_queue",
+            ["id INTEGER PRIMARY KEY AUTOINCREMENT", "text TEXT NOT NULL", "queued REAL NOT NULL"],
+        )
+
+        self._wakeup = threading.Event()
+        self._idle = threading.Condition()
+        self._busy = False
+        self._stopping = False
+        self._worker: threading.Thread | None = None
+
+    def __len__(self):
+        """The number of texts that are queued and not learned yet."""
+        result = self._connection.fetch_one("SELECT COUNT(*) FROM learn_queue;")
+        return result[0] if result else 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def put(self, text: str):
+        self._connection.execute_query(
+            "INSERT INTO learn_queue (text, queued) VALUES (?, ?);", (text, time.time())
+        )
+        self._wakeup.set()
+
+    def start(self):
+        if self.running:
+            return
+
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name="learn-queue", daemon=True)
+        self._worker.start()
+        # learn whatever a previous run left in the queue
+        self._wakeup.set()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stops the worker once it has learned the batch it is working on.
+        Texts that are still queued stay in the database.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            if self._worker.is_alive():
+                self.logger.info("The learn queue worker is still learning, leaving it running")
+                return
+        self._worker = None
+        self._connection.close()
+
+    def join(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every queued text has been learned.
+        Returns False if the timeout expired first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._busy and not len(self), timeout)
+
+    def _next_batch(self) -> list:
+        return self._connection.fetch_all(
+            "SELECT id, text FROM learn_queue ORDER BY id LIMIT ?;", (self.batch_size,)
+        )
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+            while not self._stopping:
+                with self._idle:
+                    batch = self._next_batch()
+                    self._busy = bool(batch)
+                    if not batch:
+                        self._idle.notify_all()
+                        break
+
+                ids = [row[0] for row in batch]
+                try:
+                    self.learn([row[1] for row in batch])
+                except Exception as e:
+                    # drop the batch, retrying it would block every later text
+                    self.logger.error(f"Exception learning {len(batch)} queued texts: {e}")
+
+                placeholders = ", ".join(["?"] * len(ids))
+                self._connection.execute_query(
+                    f"DELETE FROM learn_queue WHERE id IN ({placeholders});", tuple(ids)
+                )
+                self.logger.debug(f"Learned {len(batch)} queued texts")
+
+        with self._idle:
+            self._busy = False
+            self._idle.notify_all()
@@ -0,0 +1,123 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import gzip
+import re
+from typing import Dict, Iterator, TextIO, Tuple
+
+from convassist.utilities.ngram.ngramutil import NGramUtil
+
+re_ngram_count = re.compile(r"^ngram\s+(\d+)\s*=\s*(\d+)$")
+re_section = re.compile(r"^\\(\d+)-grams:$")
+
+
+class ArpaFormatError(Exception):
+    """Raised when a file does not follow the ARPA back-off language model format."""
+
+    pass
+
+
+def _open(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def read_arpa_header(lines: Iterator[str]) -> Dict[int, int]:
+    """
+    Reads the \\data\\ section and returns the number of n-grams of each order.
+    Leaves lines positioned after the header.
+    """
+    for line in lines:
+        if line.strip() == "\\data\\":
+            break
+    else:
+        raise ArpaFormatError("missing \\data\\ section")
+
+    counts: Dict[int, int] = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if counts:
+                return counts
+            continue
+        match = re_ngram_count.match(line)
+        if not match:
+            raise ArpaFormatError(f"unexpected line in \\data\\ section: {line}")
+        counts[int(match.group(1))] = int(match.group(2))
+
+    return counts
+
+
+def read_arpa_section(lines: Iterator[str], order: int, lowercase=False) -> Iterator[Tuple]:
+    """
+    Yields (*tokens, log10 probability, log10 backoff) for each n-gram of the
+    next section of an ARPA file, which must hold n-grams of the given order.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = re_section.match(line)
+        if not match or int(match.group(1)) != order:
+            raise ArpaFormatError(f"expected the \\{order}-grams: section, got {line}")
+        break
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            return
+        if lowercase:
+            line = line.lower()
+
+        fields = line.split()
+        if len(fields) == order + 1:
+            backoff = 0.0
+        elif len(fields) == order + 2:
+            backoff = float(fields[-1])
+        else:
+            raise ArpaFormatError(f"expected a {order}-gram, got {line}")
+
+        yield (*fields[1 : order + 1], float(fields[0]), backoff)
+
+
+def import_arpa(ngramutil: NGramUtil, path: str, max_order=0, lowercase=False) -> Dict[int, int]:
+    """
+    Imports the ARPA language model in path into the _N_lm tables of ngramutil's
+    database, replacing any model already there.  The file is streamed, so
+    models larger than memory can be imported.
+
+    Args:
+        ngramutil: NGramUtil: the database to import into
+        path: str: the ARPA file, optionally gzipped
+        max_order: int: import n-grams up to this order only, 0 for all
+        lowercase: bool: lowercase the tokens, keeping the highest probability
+            and backoff of n-grams that only differ in case
+    Returns:
+        Dict[int, int]: the number of n-grams of each order declared by the file
+    """
+    with _open(path) as f:
+        lines = iter(f)
+        counts = read_arpa_header(lines)
+        order = max(counts) if not max_order else min(max(counts), max_order)
+
+        connection = ngramutil.connection
+        ngramutil._create_meta_table()
+        connection.begin_transaction()
+        try:
+            for cardinality in range(1, order + 1):
+                ngramutil._create_lm_table(cardinality, commit=False)
+                ngramutil.insert_lm_rows(
+                    cardinality,
+                    read_arpa_section(lines, cardinality, lowercase),
+                    merge=lowercase,
+                    commit=False,
+                )
+                ngramutil._create_prefix_index(f"_{cardinality}_lm", cardinality, commit=False)
+            ngramutil._set_lm_meta(order, f"arpa:{path}", ngramutil.counts_version)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    return {cardinality: counts[cardinality] for cardinality in range(1, order + 1)}
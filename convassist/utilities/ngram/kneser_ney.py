@@ -0,0 +1,334 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import math
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from convassist.utilities.ngram.ngramutil import NGramUtil
+
+# log10 probability used for words the model has never seen (ARPA convention)
+LOG10_ZERO = -99.0
+
+# sentence markers and the unknown word of imported ARPA models are never suggested
+SPECIAL_TOKENS = frozenset(["<s>", "</s>", "<unk>"])
+
+Ngram = Tuple[str, ...]
+Discounts = Tuple[float, float, float]
+
+# the most words looked up in the model at once
+_SCORE_BATCH = 500
+
+
+def _discounts(counts: Iterable[int]) -> Tuple[float, float, float]:
+    """
+    The modified Kneser-Ney discounts D1, D2 and D3+ estimated from the counts
+    of counts (Chen & Goodman 1998).
+    """
+    n = Counter(min(count, 4) for count in counts)
+    n1, n2, n3, n4 = n[1], n[2], n[3], n[4]
+    if not (n1 and n2 and n3 and n4):
+        # too little data for the estimate, use the usual defaults
+        return 0.5, 1.0, 1.5
+
+    y = n1 / (n1 + 2 * n2)
+    d1 = 1 - 2 * y * n2 / n1
+    d2 = 2 - 3 * y * n3 / n2
+    d3 = 3 - 4 * y * n4 / n3
+    # keep every discount between 0 and the count it applies to
+    return min(max(d1, 0.0), 1.0), min(max(d2, 0.0), 2.0), min(max(d3, 0.0), 3.0)
+
+
+def _discount(count: int, discounts: Discounts) -> float:
+    d1, d2, d3 = discounts
+    return d1 if count == 1 else d2 if count == 2 else d3
+
+
+def _adjusted_counts(counts: List[Dict[Ngram, int]]) -> List[Dict[Ngram, int]]:
+    """
+    The counts modified Kneser-Ney estimates each order from: raw counts for the
+    highest order, and for lower orders the number of distinct words seen
+    before the n-gram (its continuation count).
+
+    The n-gram tables hold no sentence-start token, so when an n-gram occurs
+    more often than all of its longer extensions together, the remaining
+    occurrences are taken to start a sentence, which adds one to its
+    continuation count.
+    """
+    cardinality = len(counts)
+    adjusted = [dict() for _ in range(cardinality)]
+    adjusted[-1] = dict(counts[-1])
+
+    for n in range(1, cardinality):
+        extensions: Counter = Counter()
+        extended_counts: Counter = Counter()
+        for ngram, count in counts[n].items():
+            extensions[ngram[1:]] += 1
+            extended_counts[ngram[1:]] += count
+
+        table = adjusted[n - 1]
+        for ngram, count in counts[n - 1].items():
+            starts_sentence = count > extended_counts[ngram]
+            table[ngram] = extensions[ngram] + int(starts_sentence)
+        for ngram, count in extensions.items():
+            table.setdefault(ngram, count)
+
+    return adjusted
+
+
+def build_kneser_ney(counts: List[Dict[Ngram, int]]) -> List[Dict[Ngram, Tuple[float, float]]]:
+    """
+    Estimates an interpolated modified Kneser-Ney model from n-gram counts.
+
+    Args:
+        counts: one dict per cardinality, starting with unigrams, mapping each
+            n-gram's tuple of tokens to its count
+    Returns:
+        One dict per cardinality mapping every n-gram to its (log10 probability,
+        log10 backoff weight), with the same meaning as in an ARPA file: a word
+        not listed after a history h gets backoff(h) * P(word | h[1:]).
+    """
+    return _build_kneser_ney(counts)[0]
+
+
+def _build_kneser_ney(
+    counts: List[Dict[Ngram, int]],
+) -> Tuple[List[Dict[Ngram, Tuple[float, float]]], List[Discounts]]:
+    # build_kneser_ney(), also returning the discounts of every cardinality
+    adjusted = _adjusted_counts(counts)
+    vocab_size = len(adjusted[0]) or 1
+
+    probabilities: List[Dict[Ngram, float]] = []
+    gammas: List[Dict[Ngram, float]] = []
+    discounts: List[Discounts] = []
+
+    def lower_probability(ngram: Ngram) -> float:
+        # P(word | shorter history), backing off past n-grams the model lacks
+        if not ngram:
+            return 1 / vocab_size
+        order = len(ngram)
+        probability = probabilities[order - 1].get(ngram)
+        if probability is not None:
+            return probability
+        return gammas[order - 1].get(ngram[:-1], 1.0) * lower_probability(ngram[1:])
+
+    for n, table in enumerate(adjusted, start=1):
+        order_discounts = _discounts(table.values())
+        discounts.append(order_discounts)
+
+        totals: Counter = Counter()
+        discounted: Counter = Counter()
+        for ngram, count in table.items():
+            history = ngram[:-1]
+            totals[history] += count
+            discounted[history] += _discount(count, order_discounts)
+
+        gamma = {history: discounted[history] / total for history, total in totals.items()}
+        gammas.append(gamma)
+
+        order_probabilities = {}
+        for ngram, count in table.items():
+            history = ngram[:-1]
+            discount = _discount(count, order_discounts)
+            probability = max(count - discount, 0) / totals[history]
+            probability += gamma[history] * lower_probability(ngram[1:])
+            order_probabilities[ngram] = probability
+        probabilities.append(order_probabilities)
+
+    model = []
+    for n, order_probabilities in enumerate(probabilities, start=1):
+        next_gammas = gammas[n] if n < len(gammas) else {}
+        model.append(
+            {
+                ngram: (
+                    math.log10(probability) if probability > 0 else LOG10_ZERO,
+                    math.log10(next_gammas[ngram]) if next_gammas.get(ngram) else 0.0,
+                )
+                for ngram, probability in order_probabilities.items()
+            }
+        )
+    return model, discounts
+
+
+def build_language_model(ngramutil: NGramUtil, cardinality: int):
+    """
+    (Re)builds the Kneser-Ney model of the n-gram counts in ngramutil's
+    database and stores it in the database's _N_lm tables.
+
+    Every count of every cardinality is loaded into memory, which for a large
+    database takes a lot of memory and time; after learning,
+    update_language_model() only re-estimates what the learned n-grams changed.
+    """
+    # counts learned while the model is built leave it stale
+    counts_version = ngramutil.counts_version
+    counts = [dict(ngramutil.ngram_counts(n)) for n in range(1, cardinality + 1)]
+    model, discounts = _build_kneser_ney(counts)
+    del counts
+    ngramutil.replace_lm_tables(model, counts_version=counts_version, discounts=discounts)
+
+
+def _history_adjusted_counts(
+    ngramutil: NGramUtil, history: Ngram, highest: bool
+) -> Dict[str, int]:
+    # the counts _adjusted_counts() gives the n-grams history + (word,)
+    counts = dict(ngramutil.fetch_like([*history, ""]))
+    if highest:
+        return counts
+
+    extensions = ngramutil.continuation_counts(list(history))
+    adjusted = {}
+    for word, count in counts.items():
+        types, total = extensions.get(word, (0, 0))
+        adjusted[word] = types + int(count > total)
+    for word, (types, _) in extensions.items():
+        adjusted.setdefault(word, types)
+    return adjusted
+
+
+def _estimate_history(
+    adjusted: Dict[str, int], discounts: Discounts, lower: Dict[str, float]
+) -> Tuple[Dict[str, float], float]:
+    """
+    The log10 probability of every word following one history, given their
+    adjusted counts and their probabilities after the history's suffix, and
+    the history's log10 backoff weight, as build_kneser_ney() estimates them.
+    """
+    total = sum(adjusted.values())
+    gamma = sum(_discount(count, discounts) for count in adjusted.values()) / total
+
+    probabilities = {}
+    for word, count in adjusted.items():
+        probability = max(count - _discount(count, discounts), 0) / total
+        probability += gamma * lower[word]
+        probabilities[word] = math.log10(probability) if probability > 0 else LOG10_ZERO
+    return probabilities, math.log10(gamma) if gamma else 0.0
+
+
+def update_language_model(ngramutil: NGramUtil, histories: List[Set[Ngram]]) -> bool:
+    """
+    Updates the Kneser-Ney model stored in ngramutil's database after learning,
+    re-estimating only the contexts of the learned n-grams: for every
+    cardinality, the probabilities of the words following each of its
+    histories and the backoff weight of that history.  The unigrams have a
+    single, empty, history, so the unigram distribution is re-estimated as a
+    whole, with one pass over the bigram table.
+
+    The discounts of the last build_language_model() are kept, and contexts
+    that were not learned from keep their probabilities even where those of a
+    lower cardinality changed, so the model drifts slightly from a rebuilt one
+    until the next rebuild.
+
+    Args:
+        histories: one set per cardinality, starting with unigrams, of the
+            histories (n-gram[:-1]) of the n-grams learned since the model was
+            last built or updated
+    Returns:
+        False, leaving the model as it is, if it was not built by
+        build_language_model() for this cardinality and has to be rebuilt.
+    """
+    order = len(histories)
+    discounts = ngramutil.lm_discounts
+    if ngramutil.lm_source != "kneser_ney" or ngramutil.lm_order != order:
+        return False
+    if len(discounts) != order:
+        return False
+
+    # counts learned while the model is updated leave it stale
+    counts_version = ngramutil.counts_version
+    model = KneserNeyModel(ngramutil, order)
+
+    connection = ngramutil.connection
+    connection.begin_transaction()
+    try:
+        # lower cardinalities first, the higher ones back off to them
+        for n in range(1, order + 1):
+            for history in sorted(histories[n - 1]):
+                adjusted = _history_adjusted_counts(ngramutil, history, highest=n == order)
+                if not adjusted:
+                    continue
+
+                words = list(adjusted)
+                if n == 1:
+                    lower = dict.fromkeys(words, 1 / len(words))
+                else:
+                    lower = {}
+                    for start in range(0, len(words), _SCORE_BATCH):
+                        batch = words[start : start + _SCORE_BATCH]
+                        scores = model.score(list(history[1:]), batch)
+                        lower.update((word, 10**score) for word, score in scores.items())
+
+                probabilities, backoff = _estimate_history(adjusted, discounts[n - 1], lower)
+                ngramutil.update_lm_probabilities(list(history), probabilities)
+                if history:
+                    ngramutil.update_lm_backoff(list(history), backoff)
+
+        ngramutil._set_meta("lm_counts_version", counts_version, commit=False)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return True
+
+
+class KneserNeyModel:
+    """
+    Scores words with the language model stored in the _N_lm tables.
+
+    The model is precomputed, so scoring any number of candidates after a
+    history takes one lookup per cardinality for the words plus one per
+    cardinality for the history's backoff weights.
+    """
+
+    def __init__(self, ngramutil: NGramUtil, cardinality: int):
+        self.ngramutil = ngramutil
+        # an imported model may have fewer cardinalities than the predictor
+        self.cardinality = min(cardinality, ngramutil.lm_order or cardinality)
+
+    def candidates(
+        self,
+        history: List[str],
+        prefix: str,
+        limit: int,
+        fetch_lm_like: Optional[Callable[[list, int], list]] = None,
+    ) -> List[str]:
+        """
+        Returns the words starting with prefix that are most probable after each
+        length of history, up to limit per length, longest history first and
+        without duplicates.  A word seen after a shorter history can still
+        outscore one seen after the full history, so they all need scoring.
+
+        fetch_lm_like replaces NGramUtil.fetch_lm_like, e.g. to cache its rows.
+        """
+        fetch_lm_like = fetch_lm_like or self.ngramutil.fetch_lm_like
+        history = history[-(self.cardinality - 1) :] if self.cardinality > 1 else []
+        words: List[str] = []
+        for n in range(len(history) + 1, 0, -1):
+            rows = fetch_lm_like(history[len(history) - n + 1 :] + [prefix], limit)
+            for word, _ in rows:
+                if word not in words and word not in SPECIAL_TOKENS:
+                    words.append(word)
+        return words
+
+    def score(self, history: List[str], words: List[str]) -> Dict[str, float]:
+        """
+        Returns the log10 probability of every word following history.
+        """
+        history = history[-(self.cardinality - 1) :] if self.cardinality > 1 else []
+
+        scores: Dict[str, Optional[float]] = {word: None for word in words}
+        backoff = 0.0
+        for n in range(len(history) + 1, 0, -1):
+            context = history[len(history) - n + 1 :]
+            pending = [word for word, score in scores.items() if score is None]
+            if not pending:
+                break
+
+            probabilities = self.ngramutil.lm_probabilities(context, pending)
+            for word, probability in probabilities.items():
+                scores[word] = backoff + probability
+
+            if context:
+                backoff += self.ngramutil.lm_backoff(context)
+
+        return {word: LOG10_ZERO if score is None else score for word, score in scores.items()}
@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import collections
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # from nltk import word_tokenize
 
@@ -11,46 +11,46 @@ class NgramMap:
     """
     A memory efficient store for ngrams.
 
-    This class is optimized for memory consumption, it might be slower than
-    other ngram stores. It is also optimized for a three step process:
+    Ngrams are counted as tuples of tokens. Every distinct token string is
+    only stored once, however many ngrams and phrases it appears in. The
+    store is optimized for a three step process:
 
-    1) Add all ngrams.
+    1) Add all ngrams, from one or many phrases.
     2) Perform a cutoff opertation (optional).
     3) Read list of ngrams.
 
     It might not perform well for other use cases.
     """
 
-    def __init__(self, cardinality, phrase: str):
-        """Initialize internal data stores."""
-        self._strings = dict()
-        self.ngrams = collections.defaultdict(int)
-        self.next_index = 0
+    def __init__(self, cardinality, phrase: Optional[str] = None):
+        """Initialize internal data stores, counting the ngrams of phrase if given."""
+        self._strings: Dict[str, str] = dict()
+        self.ngrams: collections.Counter = collections.Counter()
         self.cardinality = cardinality
 
+        if phrase is not None:
+            self.add_phrase(phrase)
+
+    def add_phrase(self, phrase: str):
+        """
+        Add the ngrams of a phrase to the store.
+
+        Parameters
+        ----------
+        phrase : str
+            The phrase to count ngrams in. It is lowercased and split on spaces.
+        """
         # words = word_tokenize(phrase)
         # tokens = [word for word in words if word not in string.punctuation]
-        tokens = phrase.lower().split(" ")
-        ngrams = NgramMap.generateNgrams(tokens, cardinality)
-
-        for item in ngrams:
-            ngram_list = []
-            tokens = item.split(" ")
-            for token in tokens:
-                idx = self._add_token(token)
-                ngram_list.append(idx)
-            self._add(ngram_list)
+        tokens = [self._add_token(token) for token in phrase.lower().split(" ")]
+        self.ngrams.update(NgramMap.generateNgramTuples(tokens, self.cardinality))
 
     def _add_token(self, token):
         """
         Add a token to the internal string store.
 
-        This will only add the token to the internal strings store. It will
-        return an index that you can use to create your ngram.
-
-        The ngrams a are represented as strings of the indices, so we will
-        return a string here so that the consumer does not have to do the
-        conversion.
+        Returns the stored string equal to token, so that every ngram holding
+        the token shares one string object.
 
         Parameters
         ----------
@@ -60,30 +60,20 @@ class NgramMap:
         Returns
         -------
         str
-            The index of the token as a string.
+            The stored token.
         """
-        if token in self._strings:
-            return str(self._strings[token])
-        else:
-            self._strings[token] = self.next_index
-            old_index = self.next_index
-            self.next_index += 1
-            return str(old_index)
-
-    def _add(self, ngram_indices):
+        return self._strings.setdefault(token, token)
+
+    def _add(self, ngram):
         """
         Add an ngram to the store.
 
-        This will add a list of strings as an ngram to the ngram store. In our
-        standard use case the strings are the indices of the strings, you can
-        get those from the `add_token()` method.
-
         Parameters
         ----------
-        list of str
-            The indices of the ngram strings as string.
+        tuple of str
+            The tokens of the ngram.
         """
-        self.ngrams["\t".join(ngram_indices)] += 1
+        self.ngrams[tuple(self._add_token(token) for token in ngram)] += 1
 
     def cutoff(self, cutoff):
         """
@@ -98,12 +88,9 @@ class NgramMap:
             The cutoff value, we will remove all items with a frequency of the
             cutoff or lower.
         """
-        delete_keys = []
-        for k, count in self.ngrams.items():
-            if count <= cutoff:
-                delete_keys.append(k)
-        for k in delete_keys:
-            del self.ngrams[k]
+        self.ngrams = collections.Counter(
+            {ngram: count for ngram, count in self.ngrams.items() if count > cutoff}
+        )
 
     def __len__(self):
         """Return the number of ngrams in the store."""
@@ -120,19 +107,25 @@ class NgramMap:
         -------
         iterable of tokens, count
             The tokens are a list of strings, the real tokens that you added
-            to the store via `add_token()`. The count is the the count value
-            for that ngram.
+            to the store. The count is the the count value for that ngram.
+        """
+        for ngram, count in self.ngrams.items():
+            yield list(ngram), count
+
+    def rows(self) -> Iterable[Tuple]:
+        """
+        Get the ngrams from the store as (*tokens, count) rows, ready to be
+        passed to an INSERT statement.
         """
-        strings = {v: k for k, v in self._strings.items()}
-        for token_indices, count in self.ngrams.items():
-            tokens = [strings[int(idx)] for idx in token_indices.split("\t")]
-            yield tokens, count
+        for ngram, count in self.ngrams.items():
+            yield (*ngram, count)
 
     @staticmethod
-    def generateNgrams(tokens, cardinality):
-        cardinality = cardinality
+    def generateNgramTuples(tokens, cardinality):
         # Use the zip function to help us generate n-grams
+        return zip(*[tokens[i:] for i in range(cardinality)])
+
+    @staticmethod
+    def generateNgrams(tokens, cardinality):
         # Concatenate the tokens into ngrams and return
-        ngrams = zip(*[tokens[i:] for i in range(cardinality)])
-        returnobj = [" ".join(ngram) for ngram in ngrams]
-        return returnobj
+        return [" ".join(ngram) for ngram in NgramMap.generateNgramTuples(tokens, cardinality)]
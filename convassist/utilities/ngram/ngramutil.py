@@ -2,7 +2,9 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import re
-from typing import List, Optional
+import string
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from convassist.utilities.databaseutils.sqllite_dbconnector import (
     SQLiteDatabaseConnector,
@@ -11,6 +13,33 @@ from convassist.utilities.ngram.ngram_map import NgramMap
 
 re_escape_singlequote = re.compile("'")
 
+_ascii_lowercase = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def ascii_lower(text: str) -> str:
+    """Lowercases the ASCII letters of text only, as SQLite's lower() does."""
+    return text.translate(_ascii_lowercase)
+
+
+def prefix_range(prefix: str) -> tuple:
+    """
+    Returns the bounds [low, high) of lower(word) for the words starting with
+    prefix, ignoring the case of ASCII letters as LIKE 'prefix%' does.
+
+    Unlike LIKE, comparing lower(word) against these bounds lets SQLite answer
+    prefix queries with a range scan of the index on lower(word).
+    """
+    prefix = ascii_lower(prefix)
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# Schema versions of the n-gram tables.
+# 1: every _N_gram row stores its tokens as TEXT.
+# 2: tokens are stored once in a vocab table and _N_gram rows reference them
+#    by integer id.  Counts may be log-quantized (see database_compactor.py).
+SCHEMA_TEXT = 1
+SCHEMA_VOCAB = 2
+
 
 class NGramUtil:
     def __init__(self, database, cardinality=1, lowercase=False, normalize=False):
@@ -19,6 +48,8 @@ class NGramUtil:
         self._lowercase = lowercase
         self._normalize = normalize
         self._connection = SQLiteDatabaseConnector(database)
+        self._meta: Optional[Dict[str, str]] = None
+        self._word_ids: Dict[str, Optional[int]] = {}
 
     def __enter__(self):
         try:
@@ -36,8 +67,120 @@ class NGramUtil:
     def connection(self):
         return self._connection
 
+    # Schema metadata
+    @property
+    def meta(self) -> Dict[str, str]:
+        """The key/value pairs of the meta table, empty for databases without one."""
+        if self._meta is None:
+            self._meta = {}
+            if self._table_exists("meta"):
+                self._meta = dict(self._connection.fetch_all("SELECT key, value FROM meta;"))
+        return self._meta
+
+    @property
+    def schema_version(self) -> int:
+        return int(self.meta.get("schema_version", SCHEMA_TEXT))
+
+    @property
+    def quantization_base(self) -> float:
+        """The base of the log-quantized counts, or 0 if counts are stored as is."""
+        return float(self.meta.get("quantization_base", 0))
+
+    def _decode_count(self, count) -> int:
+        if count is None:
+            return 0
+        base = self.quantization_base
+        if base:
+            return int(round(base**count))
+        return int(count)
+
+    def _create_meta_table(self):
+        self._connection.create_table("meta", ["key TEXT PRIMARY KEY", "value TEXT"])
+
+    def _set_meta(self, key: str, value, commit=True):
+        self._connection.execute_query(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value;",
+            (key, str(value)),
+            commit=commit,
+        )
+        self._meta = None
+
+    def _create_vocab_table(self):
+        self._connection.create_table(
+            "vocab", ["id INTEGER PRIMARY KEY", "word TEXT NOT NULL UNIQUE"]
+        )
+        self._connection.execute_query(
+            "CREATE INDEX IF NOT EXISTS idx_vocab_lower ON vocab(lower(word));"
+        )
+
+    def _create_vocab_ngram_table(self, cardinality, commit=True) -> str:
+        """
+        Creates a schema version 2 table for n-grams of a given cardinality.
+
+        Every word column holds a vocab id.  The primary key starts with the
+        history, so looking up the words that follow a history is a range scan
+        of the table itself and no other index is needed.
+
+        Parameters
+        ----------
+        cardinality : int
+            The cardinality to create a table for.
+
+        """
+        words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+        columns = [f"{word} INTEGER NOT NULL" for word in words]
+        columns.append("count INTEGER NOT NULL")
+        columns.append(f"PRIMARY KEY({', '.join(words)})")
+
+        table_name = f"_{cardinality}_gram"
+        query = f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)}) WITHOUT ROWID"
+        self._connection.execute_query(query, commit=commit)
+        return table_name
+
+    def _lookup_word_ids(self, words) -> List[Optional[int]]:
+        """
+        Returns the vocab id of every word, or None for words not in the vocabulary.
+        """
+        missing = [word for word in set(words) if word not in self._word_ids]
+        if missing:
+            placeholders = ", ".join(["?"] * len(missing))
+            query = f"SELECT word, id FROM vocab WHERE word IN ({placeholders});"  # nosec
+            found = dict(self._connection.fetch_all(query, tuple(missing)))
+            for word in missing:
+                self._word_ids[word] = found.get(word)
+
+        return [self._word_ids[word] for word in words]
+
+    def _add_words(self, words) -> List[int]:
+        """
+        Adds words to the vocabulary and returns their vocab ids.
+        """
+        for word in words:
+            if self._word_ids.get(word, 0) is None:
+                del self._word_ids[word]
+
+        new_words = [(word,) for word in set(words) if word not in self._word_ids]
+        if new_words:
+            self._connection.execute_many(
+                "INSERT OR IGNORE INTO vocab (word) VALUES (?);", new_words, commit=False
+            )
+        return self._lookup_word_ids(words)  # type: ignore
+
+    def _check_writable(self):
+        if self.quantization_base:
+            raise Exception(
+                f"{__class__}{__name__} {self._database} stores quantized counts, "
+                "which is read-only"
+            )
+
+        # the stored sums of a compacted database go stale once it is written to
+        if any(key.startswith("count_sum_") for key in self.meta):
+            self._connection.execute_query("DELETE FROM meta WHERE key LIKE 'count_sum_%';")
+            self._meta = None
+
     # Implemented NGRAM Functionality
-    def _create_ngram_table(self, cardinality) -> str:
+    def _create_ngram_table(self, cardinality, unique=True) -> str:
         """
         Creates a table for n-gram of a given cardinality. The table name is
         constructed from this parameter, for example for cardinality `2` there
@@ -47,20 +190,26 @@ class NGramUtil:
         ----------
         cardinality : int
             The cardinality to create a table for.
+        unique : bool
+            Whether to create the table with its UNIQUE constraint. Bulk loads
+            create the table without it and call `_create_unique_index()` once
+            the rows are in, which is much faster than maintaining the
+            constraint's index row by row.
 
         """
         columns = []
-        unique = ""
+        unique_columns = ""
         for i in reversed(range(cardinality)):
             if i != 0:
                 columns.append(f"word_{i} TEXT")
-                unique = ", ".join([f"word_{i}", unique])
+                unique_columns = ", ".join([f"word_{i}", unique_columns])
             else:
                 columns.append("word TEXT")
-                unique = "".join([unique, "word"])
+                unique_columns = "".join([unique_columns, "word"])
         columns.append("count INTEGER")
 
-        columns.append(f"UNIQUE({unique})")
+        if unique:
+            columns.append(f"UNIQUE({unique_columns})")
 
         self._connection.create_table(f"_{cardinality}_gram", columns)
         return f"_{cardinality}_gram"
@@ -99,6 +248,45 @@ class NGramUtil:
                     )
                 )
                 self._connection.execute_query(query)
+        self._create_prefix_index(f"_{cardinality}_gram", cardinality)
+
+    def _create_prefix_index(self, table_name, cardinality, commit=True):
+        """
+        Create the index prefix completion scans: the history columns
+        followed by lower(word), in the order fetch_like() constrains them.
+
+        Parameters
+        ----------
+        table_name : str
+            The _N_gram or _N_lm table to index.
+        cardinality : int
+            The cardinality of the table.
+
+        """
+        columns = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["lower(word)"]
+        query = (
+            f"CREATE INDEX IF NOT EXISTS idx{table_name}_lower "
+            f"ON {table_name}({', '.join(columns)});"
+        )
+        self._connection.execute_query(query, commit=commit)
+
+    def _create_unique_index(self, cardinality):
+        """
+        Create the unique index that takes the place of the UNIQUE constraint
+        for tables created with `_create_ngram_table(cardinality, unique=False)`.
+
+        Parameters
+        ----------
+        cardinality : int
+            The cardinality to create the unique index for.
+
+        """
+        columns = ", ".join([f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"])
+        query = (
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{cardinality}_gram_unique "
+            f"ON _{cardinality}_gram({columns});"
+        )
+        self._connection.execute_query(query)
 
     def _delete_index(self, cardinality):
         """
@@ -114,6 +302,7 @@ class NGramUtil:
             if i != 0:
                 query = f"DROP INDEX IF EXISTS idx_{cardinality}_gram_{i};"
                 self._connection.execute_query(query)
+        self._connection.execute_query(f"DROP INDEX IF EXISTS idx_{cardinality}_gram_lower;")
 
     def _ngram_count(self, ngram):
         """
@@ -130,6 +319,16 @@ class NGramUtil:
             The count of the ngram.
 
         """
+        if self.schema_version == SCHEMA_VOCAB:
+            ids = self._lookup_word_ids(ngram)
+            if None in ids:
+                return 0
+            query = f"SELECT count FROM _{len(ngram)}_gram"  # nosec
+            query += self._build_where_clause(ngram, exact=True)
+            query += ";"
+            result = self._connection.fetch_all(query, tuple(ids))
+            return self._decode_count(result[0][0]) if result else 0
+
         query = f"SELECT count FROM _{len(ngram)}_gram"  # nosec
         query += self._build_where_clause(ngram)
         query += ";"
@@ -151,9 +350,16 @@ class NGramUtil:
         INSERT INTO _{N}_gram (word_{N}, word_{N-1}, word)
         VALUES ('V1', 'V2', 'V3', count)
         ON CONFLICT (word_{N}, word_{N-1}, word)
-        DO UPDATE SET count
+        DO UPDATE SET count = count + excluded.count
 
         """
+        if self.schema_version == SCHEMA_VOCAB:
+            self.insert_ngram_counts(
+                cardinality, Counter({tuple(ngram): count}), update_on_conflict
+            )
+            return
+
+        self._check_writable()
         query = self.generate_ngram_insert_query(cardinality, update_on_conflict)
 
         try:
@@ -175,11 +381,73 @@ class NGramUtil:
 
         query = f"INSERT INTO {table_name} ({columns}, count) VALUES ({placeholders}, ?)"
         if update_on_conflict:
-            query += f"ON CONFLICT ({unique_columns}) DO UPDATE SET count = count + 1;"
+            query += (
+                f"ON CONFLICT ({unique_columns}) DO UPDATE SET count = count + excluded.count;"
+            )
         else:
             query += f"ON CONFLICT ({unique_columns}) DO NOTHING;"
         return query
 
+    @staticmethod
+    def count_ngrams(phrases: Iterable[str], cardinality: int) -> Counter:
+        """
+        Counts the n-grams of the given cardinality across all phrases.
+
+        Parameters
+        ----------
+        phrases : iterable of str
+            The phrases to count n-grams in.
+        cardinality : int
+            The number of tokens in each n-gram.
+
+        Returns
+        -------
+        Counter
+            The total count of every n-gram, keyed on its tuple of tokens.
+
+        """
+        ngram_map = NgramMap(cardinality)
+        for phrase in phrases:
+            ngram_map.add_phrase(phrase)
+        return ngram_map.ngrams
+
+    def insert_ngram_counts(self, cardinality, counts: Counter, update_on_conflict=True):
+        """
+        Inserts n-gram counts into the database in a single batch.
+
+        Parameters
+        ----------
+        cardinality : int
+            The cardinality of the n-grams in counts.
+        counts : Counter
+            The count of every n-gram, keyed on its tuple of tokens, as
+            returned by `count_ngrams()`.
+        update_on_conflict : bool
+            Whether to add to the counts of n-grams already in the database,
+            or to leave them untouched.
+
+        """
+        if not counts:
+            return
+
+        self._check_writable()
+        query = self.generate_ngram_insert_query(cardinality, update_on_conflict)
+
+        try:
+            if self.schema_version == SCHEMA_VOCAB:
+                words = list({word for ngram in counts for word in ngram})
+                word_ids = dict(zip(words, self._add_words(words)))
+                rows = [
+                    (*[word_ids[word] for word in ngram], count) for ngram, count in counts.items()
+                ]
+            else:
+                rows = [(*ngram, count) for ngram, count in counts.items()]
+
+            self._connection.execute_many(query, rows)
+        except Exception as e:
+            self._connection.rollback()
+            raise Exception(f"{__class__}{__name__} failed to insert ngrams: {e}")
+
     def _remove_ngram(self, ngram):
         """
         Removes a given ngram from the database. The ngram has to be in the
@@ -191,6 +459,17 @@ class NGramUtil:
             A list, set or tuple of strings.
 
         """
+        self._check_writable()
+        if self.schema_version == SCHEMA_VOCAB:
+            ids = self._lookup_word_ids(ngram)
+            if None in ids:
+                return
+            query = f"DELETE FROM _{len(ngram)}_gram"  # nosec
+            query += self._build_where_clause(ngram, exact=True)
+            query += ";"
+            self._connection.execute_query(query, tuple(ids))
+            return
+
         query = f"DELETE FROM _{len(ngram)}_gram"  # nosec
         query += self._build_where_clause(ngram)
         query += ";"
@@ -214,11 +493,13 @@ class NGramUtil:
                 where_clause += f" word = {ngram[i]}"
         return where_clause
 
-    def _build_where_clause(self, ngram):
+    def _build_where_clause(self, ngram, exact=False):
         where_clause = " WHERE"
         for i in range(len(ngram)):
             if i < (len(ngram) - 1):
                 where_clause += f" word_{len(ngram) - i - 1} = ? AND"
+            elif exact:
+                where_clause += " word = ?"
             else:
                 where_clause += " word LIKE ?"
         return where_clause
@@ -233,16 +514,61 @@ class NGramUtil:
             count = 0
         return count
 
-    def create_update_ngram_tables(self):
-        
+    def create_update_ngram_tables(self, schema_version: Optional[int] = None):
+        """
+        Creates any missing n-gram tables and upgrades existing ones.
+
+        Parameters
+        ----------
+        schema_version : int, optional
+            The schema to create new tables with, SCHEMA_TEXT or SCHEMA_VOCAB.
+            Passing SCHEMA_VOCAB migrates the tables of a SCHEMA_TEXT database.
+            Databases are never migrated back, and by default the schema of
+            the database is kept.
+
+        """
+        if schema_version is None or schema_version < self.schema_version:
+            schema_version = self.schema_version
+
+        if schema_version == SCHEMA_VOCAB and self.schema_version != SCHEMA_VOCAB:
+            self._create_meta_table()
+            self._create_vocab_table()
+            migrated = False
+            for i in range(self._cardinality):
+                if self._table_exists(f"_{i + 1}_gram"):
+                    self._check_upgrade_table(i + 1, schema_version)
+                    migrated = True
+            self._set_meta("schema_version", SCHEMA_VOCAB)
+
+            if migrated:
+                # give the pages freed by the TEXT tables back to the file system
+                self._connection.execute_query("VACUUM;")
+
         for i in range(self._cardinality):
             if not self._table_exists(f"_{i + 1}_gram"):
-                self._create_ngram_table(i + 1)
-                self._create_index(i + 1)
-            else:
+                if schema_version == SCHEMA_VOCAB:
+                    self._create_vocab_ngram_table(i + 1)
+                else:
+                    self._create_ngram_table(i + 1)
+                    self._create_index(i + 1)
+            elif schema_version == SCHEMA_TEXT:
                 self._check_upgrade_table(i + 1)
+                # databases written before prefix completion used lower(word)
+                self._create_prefix_index(f"_{i + 1}_gram", i + 1)
+
+        if schema_version == SCHEMA_VOCAB:
+            self._create_vocab_table()
+        for i in range(self.lm_order):
+            self._create_prefix_index(f"_{i + 1}_lm", i + 1)
+
+    def _check_upgrade_table(self, cardinality, schema_version: int = SCHEMA_TEXT):
+        if schema_version == SCHEMA_VOCAB:
+            columns = self._connection.fetch_all(f"PRAGMA table_info('_{cardinality}_gram');")
+            # SCHEMA_TEXT tables declare their word columns as TEXT
+            if any(column[2].upper() == "TEXT" for column in columns):
+                self._upgrade_table_to_vocab(cardinality)
+            return
 
-    def _check_upgrade_table(self, cardinality):
         unique_count = 0
         query = f"PRAGMA index_list('_{cardinality}_gram');" # nosec
 
@@ -267,6 +593,47 @@ class NGramUtil:
         query = f"DROP TABLE {table_name}_temp" # nosec
         self._connection.execute_query(query)
 
+    def _upgrade_table_to_vocab(self, cardinality):
+        """
+        Migrates a SCHEMA_TEXT n-gram table to SCHEMA_VOCAB, adding its words
+        to the vocabulary. Duplicate rows left by old databases are summed.
+
+        Parameters
+        ----------
+        cardinality : int
+            The cardinality of the table to migrate.
+
+        """
+        table_name = f"_{cardinality}_gram"
+        words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+
+        self._connection.begin_transaction()
+        try:
+            for word in words:
+                query = f"INSERT OR IGNORE INTO vocab (word) SELECT DISTINCT {word} FROM {table_name} WHERE {word} IS NOT NULL;"  # nosec
+                self._connection.execute_query(query, commit=False)
+
+            # the old table's indexes go with it and are dropped along with it
+            query = f"ALTER TABLE {table_name} RENAME TO {table_name}_temp;"  # nosec
+            self._connection.execute_query(query, commit=False)
+            self._create_vocab_ngram_table(cardinality, commit=False)
+
+            ids = ", ".join([f"v_{word}.id" for word in words])
+            joins = " ".join(
+                [f"JOIN vocab v_{word} ON v_{word}.word = t.{word}" for word in words]
+            )
+            query = (
+                f"INSERT INTO {table_name} SELECT {ids}, SUM(t.count) "
+                f"FROM {table_name}_temp t {joins} GROUP BY {ids};"
+            )  # nosec
+            self._connection.execute_query(query, commit=False)
+
+            self._connection.execute_query(f"DROP TABLE {table_name}_temp;", commit=False)
+            self._connection.commit()
+        except Exception:
+            self._connection.rollback()
+            raise
+
     def count(self, tokens, offset, ngram_size):
         result = 0
         if ngram_size > 0:
@@ -285,6 +652,11 @@ class NGramUtil:
         return self.counts_sum(1)
 
     def counts_sum(self, ngram_size):
+        # compacted databases store the sums, which saves a full table scan
+        count_sum = self.meta.get(f"count_sum_{ngram_size}")
+        if count_sum is not None:
+            return int(count_sum)
+
         query = f"SELECT SUM(count) from _{ngram_size}_gram;"
         result = self._connection.fetch_all(query)
         if result == [(None,)]:
@@ -301,13 +673,9 @@ class NGramUtil:
 
         # Add phrases_toAdd to the ngram database
         if phrases_toAdd:
-            for phrase in phrases_toAdd:
-                for curr_card in range(1, self._cardinality + 1):
-                    ngram_map = NgramMap(curr_card, phrase)
-
-                    # for every ngram, get db count, update or insert
-                    for ngram, count in ngram_map.items():
-                        self._insert_ngram(curr_card, ngram, count, update_on_conflict)
+            for curr_card in range(1, self._cardinality + 1):
+                counts = self.count_ngrams(phrases_toAdd, curr_card)
+                self.insert_ngram_counts(curr_card, counts, update_on_conflict)
 
         if phrases_toRemove:
             for phrase in phrases_toRemove:
@@ -323,19 +691,99 @@ class NGramUtil:
         assert self._connection is not None
 
         for card in range(1, self._cardinality + 1):
-            ngram_map = NgramMap(card, phrase)
+            counts = self.count_ngrams([phrase], card)
+            self.insert_ngram_counts(card, counts, True)
+
+    def count_many(self, history: list, words: list) -> Dict[str, int]:
+        """
+        Gets the counts of the n-grams history + [word] for many words at once.
+
+        Parameters
+        ----------
+        history : list of str
+            The tokens before the word, may be empty.
+        words : list of str
+            The words to count after history.
 
-            # write this ngram_map to LM ...
-            # for every ngram, get db count, update or insert
-            for ngram, count in ngram_map.items():
-                self._insert_ngram(card, ngram, count, True)
+        Returns
+        -------
+        dict
+            The count of each word that has been seen after history.
+
+        """
+        if not words:
+            return {}
+
+        table_name = f"_{len(history) + 1}_gram"
+        conditions = [f"word_{len(history) - index} = ?" for index in range(len(history))]
+        placeholders = ", ".join(["?"] * len(words))
+
+        if self.schema_version == SCHEMA_VOCAB:
+            history_ids = self._lookup_word_ids(history)
+            if None in history_ids:
+                return {}
+            conditions = [f"g.{condition}" for condition in conditions]
+            conditions.append(f"v.word IN ({placeholders})")
+            query = (
+                f"SELECT v.word, g.count FROM {table_name} g JOIN vocab v ON v.id = g.word "
+                f"WHERE {' AND '.join(conditions)};"
+            )  # nosec
+            result = self._connection.fetch_all(query, (*history_ids, *words))
+            return {word: self._decode_count(count) for word, count in result}
+
+        conditions.append(f"word IN ({placeholders})")
+        query = f"SELECT word, count FROM {table_name} WHERE {' AND '.join(conditions)};"  # nosec
+        return dict(self._connection.fetch_all(query, (*history, *words)))
+
+    def continuation_counts(self, history: list) -> Dict[str, Tuple[int, int]]:
+        """
+        Counts, for every word seen after history, the distinct words seen
+        before history + [word], from the table one cardinality up.
+
+        Parameters
+        ----------
+        history : list of str
+            The tokens before the word, may be empty.
+
+        Returns
+        -------
+        dict
+            The number of distinct words seen before each n-gram history + [word]
+            and the total count of those longer n-grams, keyed on the word.
+
+        """
+        table_name = f"_{len(history) + 2}_gram"
+        conditions = [f"word_{len(history) - index} = ?" for index in range(len(history))]
+
+        if self.schema_version == SCHEMA_VOCAB:
+            history_ids = self._lookup_word_ids(history)
+            if None in history_ids:
+                return {}
+            where_clause = " AND ".join([f"g.{condition}" for condition in conditions]) or "1"
+            query = (
+                f"SELECT v.word, COUNT(*), SUM(g.count) FROM {table_name} g "
+                f"JOIN vocab v ON v.id = g.word WHERE {where_clause} GROUP BY g.word;"
+            )  # nosec
+            result = self._connection.fetch_all(query, tuple(history_ids))
+        else:
+            where_clause = " AND ".join(conditions) or "1"
+            query = (
+                f"SELECT word, COUNT(*), SUM(count) FROM {table_name} "
+                f"WHERE {where_clause} GROUP BY word;"
+            )  # nosec
+            result = self._connection.fetch_all(query, tuple(history))
+
+        return {word: (types, total) for word, types, total in result}
 
     def fetch_like(self, ngram: list, limit=-1):
         assert self._connection is not None
 
+        if self.schema_version == SCHEMA_VOCAB:
+            return self._fetch_like_vocab(ngram, limit)
+
         try:
             query: str = ""
-            table_name = f"_{self._cardinality}_gram"
+            table_name = f"_{len(ngram)}_gram"
             conditions = []
             params = []
 
@@ -343,13 +791,14 @@ class NGramUtil:
                 inverse_index = len(ngram) - 1 - index
 
                 if index == len(ngram) - 1:
-                    conditions.append("word LIKE ?")
-                    params.append(f"{ngram[index]}%") if ngram[index] else params.append("%")
+                    if ngram[index]:
+                        conditions.append("lower(word) >= ? AND lower(word) < ?")
+                        params.extend(prefix_range(ngram[index]))
                 else:
                     conditions.append(f"word_{inverse_index} = ?")
                     params.append(ngram[index])
 
-            where_clause = " AND ".join(conditions)
+            where_clause = " AND ".join(conditions) or "1"
             query = (
                 f"SELECT word, count from {table_name} WHERE {where_clause} ORDER BY count DESC"
             )
@@ -364,3 +813,232 @@ class NGramUtil:
             raise Exception(f"{__class__}{__name__} failed to fetch ngram: {e}")
 
         return result
+
+    def ngram_counts(self, cardinality) -> Iterable[tuple]:
+        """
+        Yields (tuple of tokens, count) for every n-gram of the given cardinality.
+        """
+        words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+        if self.schema_version == SCHEMA_VOCAB:
+            columns = ", ".join([f"v_{word}.word" for word in words])
+            joins = " ".join([f"JOIN vocab v_{word} ON v_{word}.id = g.{word}" for word in words])
+            query = f"SELECT {columns}, g.count FROM _{cardinality}_gram g {joins};"  # nosec
+        else:
+            query = f"SELECT {', '.join(words)}, count FROM _{cardinality}_gram;"  # nosec
+
+        for row in self._connection.fetch_all(query):
+            yield tuple(row[:-1]), self._decode_count(row[-1])
+
+    # Precomputed language model (see kneser_ney.py and arpa.py)
+    @property
+    def lm_order(self) -> int:
+        """The highest cardinality of the stored language model, 0 if there is none."""
+        return int(self.meta.get("lm_order", 0))
+
+    @property
+    def lm_source(self) -> str:
+        """Where the stored language model came from: kneser_ney, or arpa:<file>."""
+        return self.meta.get("lm_source", "")
+
+    @property
+    def lm_discounts(self) -> List[Tuple[float, float, float]]:
+        """The discounts D1, D2 and D3+ of each cardinality of a built Kneser-Ney model."""
+        discounts = self.meta.get("lm_discounts", "")
+        return [tuple(map(float, order.split())) for order in discounts.split(";") if order]
+
+    @property
+    def counts_version(self) -> int:
+        """Incremented by mark_lm_stale() whenever the n-gram counts were learned from."""
+        return int(self.meta.get("counts_version", 0))
+
+    @property
+    def lm_stale(self) -> bool:
+        """True if the counts changed since the stored language model was built from them."""
+        return bool(self.lm_order) and self.counts_version != int(
+            self.meta.get("lm_counts_version", 0)
+        )
+
+    def mark_lm_stale(self):
+        """Records that the n-gram counts changed, so the language model needs rebuilding."""
+        self._create_meta_table()
+        self._set_meta("counts_version", self.counts_version + 1)
+
+    def _create_lm_table(self, cardinality, commit=True):
+        """
+        (Re)creates the table of the language model's n-grams of a given
+        cardinality.  Prefix completion scans the index made by
+        _create_prefix_index(), which is best created once the rows are in.
+        """
+        table_name = f"_{cardinality}_lm"
+        words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+        columns = [f"{word} TEXT NOT NULL" for word in words]
+        self._connection.execute_query(f"DROP TABLE IF EXISTS {table_name};", commit=commit)
+        self._connection.execute_query(
+            f"CREATE TABLE {table_name} ({', '.join(columns)}, prob REAL NOT NULL, "
+            f"backoff REAL NOT NULL, PRIMARY KEY({', '.join(words)})) WITHOUT ROWID;",
+            commit=commit,
+        )
+
+    def insert_lm_rows(self, cardinality, rows: Iterable[tuple], merge=False, commit=True):
+        """
+        Inserts (*tokens, log10 probability, log10 backoff) rows into the
+        language model.  With merge, rows for an n-gram already present keep the
+        higher probability and backoff instead of failing.
+        """
+        placeholders = ", ".join(["?"] * (cardinality + 2))
+        query = f"INSERT INTO _{cardinality}_lm VALUES ({placeholders})"
+        if merge:
+            words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+            query += (
+                f" ON CONFLICT ({', '.join(words)}) DO UPDATE SET "
+                "prob = max(prob, excluded.prob), backoff = max(backoff, excluded.backoff)"
+            )
+        self._connection.execute_many(query + ";", rows, commit=commit)
+
+    def update_lm_probabilities(self, history: list, probabilities: Dict[str, float]):
+        """
+        Stores the log10 probabilities of words following history in the
+        language model, keeping the backoff weights of the n-grams it has.
+        """
+        cardinality = len(history) + 1
+        words = [f"word_{i}" for i in reversed(range(1, cardinality))] + ["word"]
+        placeholders = ", ".join(["?"] * (cardinality + 1))
+        query = (
+            f"INSERT INTO _{cardinality}_lm VALUES ({placeholders}, 0.0) "
+            f"ON CONFLICT ({', '.join(words)}) DO UPDATE SET prob = excluded.prob;"
+        )  # nosec
+        self._connection.execute_many(
+            query,
+            ((*history, word, prob) for word, prob in probabilities.items()),
+            commit=False,
+        )
+
+    def update_lm_backoff(self, history: list, backoff: float):
+        """Stores the log10 backoff weight of history in the language model."""
+        query = f"UPDATE _{len(history)}_lm SET backoff = ?"  # nosec
+        query += self._build_where_clause(history, exact=True)
+        query += ";"
+        self._connection.execute_query(query, (backoff, *history), commit=False)
+
+    def _set_lm_meta(
+        self,
+        order: int,
+        source: str,
+        counts_version: int = 0,
+        discounts: Optional[List[Tuple[float, float, float]]] = None,
+    ):
+        self._set_meta("lm_order", order, commit=False)
+        self._set_meta("lm_source", source, commit=False)
+        self._set_meta("lm_counts_version", counts_version, commit=False)
+        self._set_meta(
+            "lm_discounts",
+            ";".join(" ".join(map(repr, order_discounts)) for order_discounts in discounts or []),
+            commit=False,
+        )
+
+    def replace_lm_tables(
+        self,
+        model: List[Dict[tuple, tuple]],
+        source="kneser_ney",
+        counts_version: int = 0,
+        discounts: Optional[List[Tuple[float, float, float]]] = None,
+    ):
+        """
+        Replaces the _N_lm tables with model, in one transaction.
+
+        Parameters
+        ----------
+        model : list of dict
+            One dict per cardinality mapping each n-gram's tuple of tokens to
+            its (log10 probability, log10 backoff weight).
+        source : str
+            What the model was built from, stored in the meta table.
+        counts_version : int
+            The counts_version of the counts the model was built from.
+        discounts : list of tuple, optional
+            The Kneser-Ney discounts of each cardinality, which later updates
+            of the model reuse.
+
+        """
+        self._create_meta_table()
+        self._connection.begin_transaction()
+        try:
+            for cardinality, table in enumerate(model, start=1):
+                self._create_lm_table(cardinality, commit=False)
+                self.insert_lm_rows(
+                    cardinality,
+                    ((*ngram, prob, backoff) for ngram, (prob, backoff) in table.items()),
+                    commit=False,
+                )
+                self._create_prefix_index(f"_{cardinality}_lm", cardinality, commit=False)
+            self._set_lm_meta(len(model), source, counts_version, discounts)
+            self._connection.commit()
+        except Exception as e:
+            self._connection.rollback()
+            raise Exception(f"{__class__}{__name__} failed to store language model: {e}")
+
+    def fetch_lm_like(self, ngram: list, limit=-1):
+        """
+        fetch_like() for the language model: the words that follow the history
+        ngram[:-1] and start with ngram[-1], most probable first.
+        """
+        conditions = [f"word_{len(ngram) - 1 - index} = ?" for index in range(len(ngram) - 1)]
+        params = [*ngram[:-1]]
+        if ngram[-1]:
+            conditions.append("lower(word) >= ? AND lower(word) < ?")
+            params.extend(prefix_range(ngram[-1]))
+
+        query = f"SELECT word, prob FROM _{len(ngram)}_lm"  # nosec
+        query += f" WHERE {' AND '.join(conditions) or '1'} ORDER BY prob DESC"
+        query += ";" if limit < 0 else f" LIMIT {limit};"
+
+        return self._connection.fetch_all(query, tuple(params))
+
+    def lm_probabilities(self, history: list, words: list) -> Dict[str, float]:
+        """Returns the log10 probability of each of words the model has after history."""
+        table_name = f"_{len(history) + 1}_lm"
+        conditions = [f"word_{len(history) - index} = ?" for index in range(len(history))]
+        conditions.append(f"word IN ({', '.join(['?'] * len(words))})")
+        query = f"SELECT word, prob FROM {table_name} WHERE {' AND '.join(conditions)};"  # nosec
+
+        return dict(self._connection.fetch_all(query, (*history, *words)))
+
+    def lm_backoff(self, history: list) -> float:
+        """Returns the log10 backoff weight of history, 0 if the model lacks it."""
+        query = f"SELECT backoff FROM _{len(history)}_lm"  # nosec
+        query += self._build_where_clause(history, exact=True)
+        query += ";"
+        result = self._connection.fetch_all(query, tuple(history))
+
+        return result[0][0] if result else 0.0
+
+    def _fetch_like_vocab(self, ngram: list, limit=-1):
+        """fetch_like() for schema version 2 databases."""
+        try:
+            history_ids = self._lookup_word_ids(ngram[:-1])
+            if None in history_ids:
+                return []
+
+            table_name = f"_{len(ngram)}_gram"
+            conditions = [
+                f"g.word_{len(ngram) - 1 - index} = ?" for index in range(len(history_ids))
+            ]
+            params = [*history_ids]
+            if ngram[-1]:
+                conditions.append("lower(v.word) >= ? AND lower(v.word) < ?")
+                params.extend(prefix_range(ngram[-1]))
+
+            query = (
+                f"SELECT v.word, g.count FROM {table_name} g JOIN vocab v ON v.id = g.word "
+                f"WHERE {' AND '.join(conditions) or '1'} ORDER BY g.count DESC"
+            )
+            if limit < 0:
+                query += ";"
+            else:
+                query += f" LIMIT {limit};"
+
+            result = self._connection.fetch_all(query, tuple(params))
+        except Exception as e:
+            raise Exception(f"{__class__}{__name__} failed to fetch ngram: {e}")
+
+        return [(word, self._decode_count(count)) for word, count in result]
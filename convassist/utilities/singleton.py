@@ -1,13 +1,20 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import threading
+
 
 class Singleton(type):
     _instances = {}
+    # Predictors may be configured on background threads, so creating the
+    # instance must be atomic.  Re-entrant so one singleton can create another.
+    _lock = threading.RLock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
-            cls._instances[cls] = super().__call__(*args, **kwargs)
+            with Singleton._lock:
+                if cls not in cls._instances:
+                    cls._instances[cls] = super().__call__(*args, **kwargs)
 
         return cls._instances[cls]
 
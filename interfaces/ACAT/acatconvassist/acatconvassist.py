@@ -322,6 +322,15 @@ class ACATConvAssistInterface(threading.Thread):
 
             self.logger.info("Handle incoming message finished.")
 
+        # Stop background learning; texts not learned yet stay queued on disk
+        for conv_assist in [
+            self.conv_normal,
+            self.conv_shorthand,
+            self.conv_sentence,
+            self.conv_canned_phrases,
+        ]:
+            conv_assist.close()
+
     def next_word_prediction(self, PredictionResponse, messageReceived):
         words_count = 10
         next_word_letter_count = 20